@@ -1,7 +1,12 @@
 ﻿# GameMediaTool/ai/cnn/__init__.py
 from .cnn_model import (
     create_pytorch_model,
+    architecture_of,
+    ARCHITECTURES,
+    MultiHeadClassifier,
+    CachedImageFolder,
     train_pytorch_model,
     classify_image_pytorch,
     build_class_map,
+    inference_transform,
 )
@@ -1,17 +1,47 @@
 ﻿# GameMediaTool/ai/cnn/cnn_model.py (النسخة النهائية الكاملة والمصححة)
 
 import os
+import copy
 import json
+import hashlib
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import DataLoader
+from concurrent.futures import ThreadPoolExecutor
+from torch.utils.data import DataLoader, Dataset
 from torchvision import datasets, models, transforms
 from PIL import Image
 from tools.logger import get_logger
 
+try:
+    import timm
+
+    TIMM_AVAILABLE = True
+except ImportError:
+    timm = None
+    TIMM_AVAILABLE = False
+
 logger = get_logger("CNN_Model (PyTorch)")
 
+FEATURE_CACHE_DIRNAME = "feature_cache"
+IMAGE_CACHE_DIRNAME = "image_cache"
+FEATURE_BATCH_SIZE = 64
+# Shorter side of the images in the decoded-image cache (the val transform's Resize(256)).
+IMAGE_CACHE_SIZE = 256
+# Longest aspect ratio the image cache keeps whole; wider images lose their outer edges.
+IMAGE_CACHE_MAX_ASPECT = 2
+DEFAULT_LOADER_OPTIONS = {"num_workers": 2, "persistent_workers": False, "pin_memory": False}
+
+DEFAULT_ARCHITECTURE = "resnet18"
+# Classifier tiers (ai.cnn.architecture): the module path of the linear head that is
+# trained, and a state-dict key only checkpoints of that architecture contain.
+ARCHITECTURES = {
+    "resnet18": {"head": "fc", "signature": "layer1.0.conv1.weight"},
+    "mobilenet_v3_small": {"head": "classifier.3", "signature": "classifier.3.weight"},
+    "efficientnet_lite0": {"head": "classifier", "signature": "conv_stem.weight"},
+}
+
 
 def is_valid_image_file(filename: str):
     """Checks if a file has a common image extension."""
@@ -46,35 +76,475 @@ def build_class_map(train_dir: str, map_save_path: str) -> dict:
         return None
 
 
-def create_pytorch_model(num_classes: int):
+def cnn_int8_path(model_path: str) -> str:
+    """Path of the INT8 TorchScript variant of a classifier (see ai.quantization)."""
+    return f"{os.path.splitext(model_path)[0]}_int8.pt"
+
+
+def inference_transform():
+    """The preprocessing the Pipeline applies to RGB numpy images before classification."""
+    return transforms.Compose(
+        [
+            transforms.ToTensor(),
+            transforms.Resize((224, 224), antialias=True),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+        ]
+    )
+
+
+def _imagenet_model(architecture: str, pretrained: bool) -> nn.Module:
+    if architecture == "resnet18":
+        return models.resnet18(weights="IMAGENET1K_V1" if pretrained else None)
+    if architecture == "mobilenet_v3_small":
+        return models.mobilenet_v3_small(weights="IMAGENET1K_V1" if pretrained else None)
+    if architecture == "efficientnet_lite0":
+        # torchvision has no EfficientNet-Lite; timm's port of the TF weights is used.
+        if not TIMM_AVAILABLE:
+            raise ImportError(
+                "The efficientnet_lite0 classifier needs timm (pip install .[model-tiers])."
+            )
+        return timm.create_model("tf_efficientnet_lite0", pretrained=pretrained)
+    raise ValueError(f"Unknown classifier architecture '{architecture}'.")
+
+
+def architecture_of(state_dict: dict) -> str:
+    """The ARCHITECTURES entry a checkpoint was trained with (resnet18 if none matches)."""
+    for name, spec in ARCHITECTURES.items():
+        if spec["signature"] in state_dict:
+            return name
+    return DEFAULT_ARCHITECTURE
+
+
+def classifier_head(model: nn.Module) -> nn.Module:
+    """The trainable linear head of a model built by create_pytorch_model."""
+    architecture = getattr(model, "architecture", DEFAULT_ARCHITECTURE)
+    return model.get_submodule(ARCHITECTURES[architecture]["head"])
+
+
+def _with_child(module: nn.Module, path: str, child: nn.Module) -> nn.Module:
+    # Shallow copy of module with the submodule at path replaced; all weights stay shared.
+    name, _, rest = path.partition(".")
+    clone = copy.copy(module)
+    clone._modules = dict(module._modules)
+    clone._modules[name] = _with_child(module._modules[name], rest, child) if rest else child
+    return clone
+
+
+def replace_classifier_head(model: nn.Module, head: nn.Module) -> nn.Module:
+    """Puts head in place of the model's classifier head (in place) and returns the old one."""
+    architecture = getattr(model, "architecture", DEFAULT_ARCHITECTURE)
+    parent_path, _, name = ARCHITECTURES[architecture]["head"].rpartition(".")
+    parent = model.get_submodule(parent_path) if parent_path else model
+    previous = getattr(parent, name)
+    setattr(parent, name, head)
+    return previous
+
+
+def feature_extractor(model: nn.Module) -> nn.Module:
     """
-    Creates a ResNet-18 model with a modified final layer for transfer learning.
+    A view of a create_pytorch_model classifier that returns the head's input
+    features instead of logits. It shares the classifier's weights.
     """
-    model = models.resnet18(weights="IMAGENET1K_V1")
+    architecture = getattr(model, "architecture", DEFAULT_ARCHITECTURE)
+    return _with_child(model, ARCHITECTURES[architecture]["head"], nn.Identity())
+
+
+def create_pytorch_model(
+    num_classes: int, pretrained: bool = True, architecture: str = DEFAULT_ARCHITECTURE
+):
+    """
+    Creates a frozen ImageNet classifier of the given architecture (see
+    ARCHITECTURES) with a new linear head for transfer learning.
+    Pass pretrained=False when a checkpoint is loaded right after, to skip
+    loading (and possibly downloading) the ImageNet weights.
+    """
+    model = _imagenet_model(architecture, pretrained)
+    model.architecture = architecture
 
     for param in model.parameters():
         param.requires_grad = False
 
-    num_ftrs = model.fc.in_features
-    model.fc = nn.Linear(num_ftrs, num_classes)
+    num_ftrs = classifier_head(model).in_features
+    replace_classifier_head(model, nn.Linear(num_ftrs, num_classes))
 
-    logger.info(f"Created PyTorch model with {num_classes} output classes.")
+    logger.info(f"Created {architecture} model with {num_classes} output classes.")
     return model
 
 
+def _freeze_batchnorm(model):
+    # The backbone is frozen, so its BatchNorm statistics must stay the ImageNet ones too:
+    # the head then learns on the same features it gets at inference, and the backbones
+    # of all classifiers stay identical, so MultiHeadClassifier can share them.
+    for module in model.modules():
+        if isinstance(module, nn.BatchNorm2d):
+            module.eval()
+
+
+class MultiHeadClassifier(nn.Module):
+    """
+    One frozen backbone (any of ARCHITECTURES) with several linear heads. forward() runs the
+    backbone once and returns {head name: logits}; head_model(name) is a
+    standalone classifier sharing the backbone, with the same output as the
+    per-task model built by create_pytorch_model.
+    """
+
+    def __init__(self, head_classes: dict, architecture: str = DEFAULT_ARCHITECTURE):
+        super().__init__()
+        self.architecture = architecture
+        self.backbone = _imagenet_model(architecture, pretrained=False)
+        self.backbone.architecture = architecture
+        num_ftrs = replace_classifier_head(self.backbone, nn.Identity()).in_features
+        for param in self.backbone.parameters():
+            param.requires_grad = False
+        self.heads = nn.ModuleDict(
+            {name: nn.Linear(num_ftrs, num_classes) for name, num_classes in head_classes.items()}
+        )
+
+    def features(self, x):
+        return self.backbone(x)
+
+    def forward(self, x):
+        features = self.backbone(x)
+        return {name: head(features) for name, head in self.heads.items()}
+
+    def head_model(self, name: str) -> nn.Module:
+        return nn.Sequential(self.backbone, self.heads[name])
+
+    @classmethod
+    def from_checkpoints(cls, checkpoints: dict, map_location="cpu"):
+        """
+        Builds the model from per-task .pth files saved by train_pytorch_model.
+        checkpoints maps a head name to (model_path, num_classes). The backbone is
+        the checkpoints' own, so every head gives the same output as its standalone
+        model. Raises ValueError if the checkpoints are of different architectures
+        or do not share the same backbone weights.
+        """
+        states = {
+            name: torch.load(path, map_location=map_location)
+            for name, (path, _) in checkpoints.items()
+        }
+        architecture = architecture_of(next(iter(states.values())))
+        model = cls(
+            {name: num_classes for name, (_, num_classes) in checkpoints.items()}, architecture
+        )
+
+        head_prefix = ARCHITECTURES[architecture]["head"] + "."
+        backbone_state = None
+        for name, state in states.items():
+            if architecture_of(state) != architecture:
+                raise ValueError(f"The {name} checkpoint is not a {architecture} classifier.")
+            head_state = {
+                k[len(head_prefix) :]: v for k, v in state.items() if k.startswith(head_prefix)
+            }
+            state_backbone = {k: v for k, v in state.items() if not k.startswith(head_prefix)}
+            if backbone_state is None:
+                backbone_state = state_backbone
+            else:
+                # Checkpoints trained before _freeze_batchnorm carry BatchNorm statistics
+                # of their own training data.
+                drifted = [
+                    k
+                    for k, v in state_backbone.items()
+                    if k not in backbone_state
+                    or not torch.allclose(v.float(), backbone_state[k].float())
+                ]
+                if drifted or state_backbone.keys() != backbone_state.keys():
+                    raise ValueError(
+                        f"The {name} checkpoint has a different backbone "
+                        f"({len(drifted)} tensors differ, e.g. {drifted[:1]})."
+                    )
+            model.heads[name].load_state_dict(head_state)
+
+        model.backbone.load_state_dict(backbone_state)
+        return model
+
+
+def _dataset_key(dataset, salt: str) -> str:
+    """Fingerprint of an ImageFolder dataset (files, sizes, mtimes, labels) and salt."""
+    digest = hashlib.sha1(salt.encode())
+    for path, label in dataset.samples:
+        stat = os.stat(path)
+        digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}|{label}\n".encode())
+    return digest.hexdigest()
+
+
+def _data_loader(dataset, batch_size, shuffle, loader_options=None):
+    """DataLoader with the num_workers / persistent_workers / pin_memory of loader_options."""
+    options = {**DEFAULT_LOADER_OPTIONS, **(loader_options or {})}
+    num_workers = max(0, int(options["num_workers"] or 0))
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=shuffle,
+        num_workers=num_workers,
+        # Workers survive between epochs instead of being restarted for every pass.
+        persistent_workers=bool(options["persistent_workers"]) and num_workers > 0,
+        pin_memory=bool(options["pin_memory"]) and torch.cuda.is_available(),
+    )
+
+
+def _decode_landscape(path: str, size: int):
+    """
+    Decodes path with its shorter side resized to size (as Resize(size)), turned
+    landscape (portrait images are transposed) and zero-padded on the right to
+    size x (IMAGE_CACHE_MAX_ASPECT * size); longer images keep their centered part.
+    Returns (array, width of the image in it, whether it was transposed).
+    """
+    max_width = IMAGE_CACHE_MAX_ASPECT * size
+    with Image.open(path) as image:
+        image = image.convert("RGB")
+        width, height = image.size
+        scale = size / min(width, height)
+        image = image.resize(
+            (max(size, round(width * scale)), max(size, round(height * scale))),
+            Image.BILINEAR,
+        )
+        pixels = np.asarray(image, dtype=np.uint8)
+    transposed = pixels.shape[0] > pixels.shape[1]
+    if transposed:
+        pixels = pixels.transpose(1, 0, 2)
+    width = min(pixels.shape[1], max_width)
+    left = (pixels.shape[1] - width) // 2
+    padded = np.zeros((size, max_width, 3), dtype=np.uint8)
+    padded[:, :width] = pixels[:size, left : left + width]
+    return padded, width, transposed
+
+
+def build_image_cache(dataset, cache_prefix: str, size: int = IMAGE_CACHE_SIZE, num_threads=None):
+    """
+    Decodes every image of an ImageFolder dataset once, with its shorter side resized
+    to size and its aspect ratio kept (up to IMAGE_CACHE_MAX_ASPECT, see
+    _decode_landscape), into a memory-mapped uint8 array <cache_prefix>.npy of shape
+    (N, size, IMAGE_CACHE_MAX_ASPECT * size, 3), indexed by <cache_prefix>_index.json
+    (fingerprint, size, the (path, label) and the (width, transposed) of each row).
+    A cache with the same fingerprint is reused as is. Returns the .npy path.
+    """
+    key = _dataset_key(dataset, f"size={size} aspect<={IMAGE_CACHE_MAX_ASPECT}")
+    images_path, index_path = f"{cache_prefix}.npy", f"{cache_prefix}_index.json"
+    if os.path.exists(images_path) and os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            if json.load(f).get("key") == key:
+                logger.info(f"Reusing decoded images from {images_path}")
+                return images_path
+
+    os.makedirs(os.path.dirname(cache_prefix) or ".", exist_ok=True)
+    paths = [path for path, _ in dataset.samples]
+    images = np.lib.format.open_memmap(
+        images_path,
+        mode="w+",
+        dtype=np.uint8,
+        shape=(len(paths), size, IMAGE_CACHE_MAX_ASPECT * size, 3),
+    )
+    layouts = []
+    # PIL releases the GIL while decoding and resizing, so threads scale here.
+    with ThreadPoolExecutor(max_workers=num_threads or min(8, os.cpu_count() or 1)) as executor:
+        decoded = executor.map(lambda p: _decode_landscape(p, size), paths)
+        for row, (pixels, width, transposed) in enumerate(decoded):
+            images[row] = pixels
+            layouts.append((width, transposed))
+    images.flush()
+    del images
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "size": size, "samples": dataset.samples, "layouts": layouts}, f)
+    logger.info(f"Cached {len(paths)} decoded images (shorter side {size}) to {images_path}")
+    return images_path
+
+
+class CachedImageFolder(Dataset):
+    """
+    An ImageFolder served from its build_image_cache array: items are
+    (transform(PIL image), label) like ImageFolder's, without decoding any file.
+    The memmap is opened lazily in each DataLoader worker, never pickled.
+    """
+
+    def __init__(self, image_folder, cache_prefix: str, transform=None, size=IMAGE_CACHE_SIZE):
+        self.samples = image_folder.samples
+        self.targets = image_folder.targets
+        self.classes = image_folder.classes
+        self.class_to_idx = image_folder.class_to_idx
+        self.transform = transform
+        self.images_path = build_image_cache(image_folder, cache_prefix, size)
+        with open(f"{cache_prefix}_index.json", "r", encoding="utf-8") as f:
+            self.layouts = json.load(f)["layouts"]
+        self._images = None
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_images"] = None
+        return state
+
+    def __getitem__(self, index):
+        if self._images is None:
+            self._images = np.load(self.images_path, mmap_mode="r")
+        width, transposed = self.layouts[index]
+        pixels = self._images[index, :, :width]
+        if transposed:
+            pixels = pixels.transpose(1, 0, 2)
+        image = Image.fromarray(np.ascontiguousarray(pixels))
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, self.samples[index][1]
+
+
+def extract_feature_cache(
+    backbone,
+    dataset,
+    views,
+    cache_prefix: str,
+    device,
+    batch_size=FEATURE_BATCH_SIZE,
+    loader_options=None,
+    seed=0,
+):
+    """
+    Runs the frozen backbone once over each (transform, count) view of dataset and
+    stores the pooled features in a memory-mapped <cache_prefix>.npy, with the labels
+    in <cache_prefix>_labels.npy. A cache with the same fingerprint (files, views and
+    seed) is reused as is. Returns (features, labels); features is a read-only np.memmap
+    of (N, num_ftrs).
+    """
+    total_views = sum(count for _, count in views)
+    view_specs = ";".join(f"{count}x{transform!r}" for transform, count in views)
+    key = _dataset_key(dataset, f"views={view_specs} seed={seed}")
+    features_path, labels_path = f"{cache_prefix}.npy", f"{cache_prefix}_labels.npy"
+    key_path = f"{cache_prefix}.key"
+    if os.path.exists(key_path) and os.path.exists(features_path) and os.path.exists(labels_path):
+        with open(key_path, "r") as f:
+            if f.read() == key:
+                logger.info(f"Reusing cached features from {features_path}")
+                return np.load(features_path, mmap_mode="r"), np.load(labels_path)
+
+    os.makedirs(os.path.dirname(cache_prefix) or ".", exist_ok=True)
+    num_samples = len(dataset) * total_views
+    labels = np.empty(num_samples, dtype=np.int64)
+    features = None
+    row = 0
+    backbone.eval()
+    # Seeded so the augmented views (and so the cache) are reproducible.
+    torch.manual_seed(seed)
+    with torch.no_grad():
+        for transform, count in views:
+            dataset.transform = transform
+            loader = _data_loader(dataset, batch_size, False, loader_options)
+            for _ in range(count):
+                for inputs, targets in loader:
+                    outputs = backbone(inputs.to(device)).cpu().numpy()
+                    if features is None:
+                        features = np.lib.format.open_memmap(
+                            features_path,
+                            mode="w+",
+                            dtype=np.float32,
+                            shape=(num_samples, outputs.shape[1]),
+                        )
+                    features[row : row + len(outputs)] = outputs
+                    labels[row : row + len(outputs)] = targets.numpy()
+                    row += len(outputs)
+
+    if features is None:
+        features = np.lib.format.open_memmap(
+            features_path, mode="w+", dtype=np.float32, shape=(0, 0)
+        )
+    features.flush()
+    del features
+    np.save(labels_path, labels)
+    with open(key_path, "w") as f:
+        f.write(key)
+    logger.info(f"Cached {num_samples} feature vectors ({total_views} view(s)) to {features_path}")
+    return np.load(features_path, mmap_mode="r"), labels
+
+
+def _train_head_on_features(model, feature_sets, num_epochs, batch_size, device):
+    """
+    Trains the classifier head on cached features, with the same optimizer and batches
+    as image training. Returns the validation accuracy of the last epoch.
+    """
+    head = classifier_head(model)
+    val_acc = None
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.SGD(head.parameters(), lr=0.001, momentum=0.9)
+
+    logger.info(f"Starting feature training for {num_epochs} epochs on device: {device}")
+    for epoch in range(num_epochs):
+        logger.info(f"Epoch {epoch+1}/{num_epochs}")
+
+        for phase in ["train", "val"]:
+            features, labels = feature_sets[phase]
+            num_samples = len(labels)
+            if num_samples == 0:
+                continue
+            head.train(phase == "train")
+            if phase == "train":
+                order = np.random.permutation(num_samples)
+            else:
+                order = np.arange(num_samples)
+
+            running_loss = 0.0
+            running_corrects = 0
+            for start in range(0, num_samples, batch_size):
+                # Sorted indices keep the reads from the memory-mapped cache sequential.
+                indices = np.sort(order[start : start + batch_size])
+                inputs = torch.from_numpy(np.asarray(features[indices])).to(device)
+                targets = torch.from_numpy(labels[indices]).to(device)
+
+                optimizer.zero_grad()
+                with torch.set_grad_enabled(phase == "train"):
+                    outputs = head(inputs)
+                    _, preds = torch.max(outputs, 1)
+                    loss = criterion(outputs, targets)
+                    if phase == "train":
+                        loss.backward()
+                        optimizer.step()
+
+                running_loss += loss.item() * inputs.size(0)
+                running_corrects += torch.sum(preds == targets).item()
+
+            epoch_loss = running_loss / num_samples
+            epoch_acc = running_corrects / num_samples
+            if phase == "val":
+                val_acc = epoch_acc
+            logger.info(f"{phase.capitalize():<5} Loss: {epoch_loss:.4f} Acc: {epoch_acc:.4f}")
+    return val_acc
+
+
 def train_pytorch_model(
-    data_dir: str, model_save_path: str, map_save_path: str, num_epochs=25, batch_size=4
+    data_dir: str,
+    model_save_path: str,
+    map_save_path: str,
+    num_epochs=25,
+    batch_size=4,
+    precompute_features=False,
+    feature_augmentations=2,
+    feature_cache_dir=None,
+    architecture=DEFAULT_ARCHITECTURE,
+    cache_images=False,
+    image_cache_dir=None,
+    loader_options=None,
 ):
     """
     The main training function. Handles train/val splitting, data loading,
-    the training loop, and the validation loop.
+    the training loop, and the validation loop. architecture selects the
+    classifier tier (see ARCHITECTURES). Returns the validation accuracy of
+    the last epoch, or None if training could not start.
+
+    With precompute_features, the frozen backbone runs once per image (plus
+    feature_augmentations randomly augmented views of each training image) into
+    a memory-mapped cache under feature_cache_dir (default data_dir/feature_cache),
+    and only the linear head is trained on the cached features.
+
+    With cache_images, each split is decoded once (shorter side IMAGE_CACHE_SIZE,
+    aspect ratio kept) into a memory-mapped uint8 array under image_cache_dir (default
+    data_dir/image_cache) and the transforms run on that instead of the image files.
+    loader_options overrides the DataLoader num_workers / persistent_workers / pin_memory.
     """
     train_dir = os.path.join(data_dir, "train")
     val_dir = os.path.join(data_dir, "val")
 
     class_map = build_class_map(train_dir, map_save_path)
     if not class_map:
-        return
+        return None
 
     num_classes = len(class_map)
 
@@ -106,13 +576,17 @@ def train_pytorch_model(
                 val_dir, data_transforms["val"], is_valid_file=is_valid_image_file
             ),
         }
+        if cache_images:
+            images_dir = image_cache_dir or os.path.join(data_dir, IMAGE_CACHE_DIRNAME)
+            image_datasets = {
+                phase: CachedImageFolder(
+                    dataset, os.path.join(images_dir, phase), data_transforms[phase]
+                )
+                for phase, dataset in image_datasets.items()
+            }
         dataloaders = {
-            "train": DataLoader(
-                image_datasets["train"], batch_size=batch_size, shuffle=True, num_workers=2
-            ),
-            "val": DataLoader(
-                image_datasets["val"], batch_size=batch_size, shuffle=False, num_workers=2
-            ),
+            "train": _data_loader(image_datasets["train"], batch_size, True, loader_options),
+            "val": _data_loader(image_datasets["val"], batch_size, False, loader_options),
         }
         dataset_sizes = {x: len(image_datasets[x]) for x in ["train", "val"]}
         logger.info(
@@ -122,23 +596,55 @@ def train_pytorch_model(
         logger.error(
             f"Failed to create datasets. Check data paths and folder structure. Error: {e}"
         )
-        return
+        return None
 
-    model = create_pytorch_model(num_classes)
+    model = create_pytorch_model(num_classes, architecture=architecture)
     device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
     model = model.to(device)
 
+    if precompute_features:
+        head = replace_classifier_head(model, nn.Identity())
+        # Features differ per architecture, so each has its own cache.
+        cache_dir = os.path.join(
+            feature_cache_dir or os.path.join(data_dir, FEATURE_CACHE_DIRNAME), architecture
+        )
+        feature_sets = {
+            "train": extract_feature_cache(
+                model,
+                image_datasets["train"],
+                [(data_transforms["val"], 1), (data_transforms["train"], feature_augmentations)],
+                os.path.join(cache_dir, "train"),
+                device,
+                loader_options=loader_options,
+            ),
+            "val": extract_feature_cache(
+                model,
+                image_datasets["val"],
+                [(data_transforms["val"], 1)],
+                os.path.join(cache_dir, "val"),
+                device,
+                loader_options=loader_options,
+            ),
+        }
+        replace_classifier_head(model, head)
+        val_acc = _train_head_on_features(model, feature_sets, num_epochs, batch_size, device)
+        torch.save(model.state_dict(), model_save_path)
+        logger.info(f"Training complete. Model saved to {model_save_path}")
+        return val_acc
+
     criterion = nn.CrossEntropyLoss()
-    optimizer = optim.SGD(model.fc.parameters(), lr=0.001, momentum=0.9)
+    optimizer = optim.SGD(classifier_head(model).parameters(), lr=0.001, momentum=0.9)
 
     logger.info(f"Starting training for {num_epochs} epochs on device: {device}")
 
+    val_acc = None
     for epoch in range(num_epochs):
         logger.info(f"Epoch {epoch+1}/{num_epochs}")
 
         for phase in ["train", "val"]:
             if phase == "train":
                 model.train()
+                _freeze_batchnorm(model)
             else:
                 model.eval()
 
@@ -165,11 +671,14 @@ def train_pytorch_model(
 
             epoch_loss = running_loss / dataset_sizes[phase]
             epoch_acc = running_corrects.double() / dataset_sizes[phase]
+            if phase == "val":
+                val_acc = epoch_acc.item()
 
             logger.info(f"{phase.capitalize():<5} Loss: {epoch_loss:.4f} Acc: {epoch_acc:.4f}")
 
     torch.save(model.state_dict(), model_save_path)
     logger.info(f"Training complete. Model saved to {model_save_path}")
+    return val_acc
 
 
 def classify_image_pytorch(model, image, class_map: dict, device):
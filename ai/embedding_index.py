@@ -0,0 +1,208 @@
+# GameMediaTool/ai/embedding_index.py
+
+import os
+import json
+import threading
+
+import numpy as np
+from tools.logger import get_logger
+from tools.extraction_cache import app_root
+from utils.file_ops import ensure_folder
+
+logger = get_logger("EmbeddingIndex")
+
+DEFAULT_DUPLICATE_THRESHOLD = 0.95
+INITIAL_CAPACITY = 1024
+
+
+def normalize(vectors) -> np.ndarray:
+    """L2-normalizes the rows of vectors (float32), so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    """
+    Index of normalized image embeddings (the Pipeline's classifier backbone
+    features) for similar-asset search and duplicate detection. The vectors
+    live in a memory-mapped float32 matrix index_dir/vectors.npy that grows in
+    place, with one key (e.g. a file path) per row in index_dir/keys.json.
+    Queries are answered with one matrix product against all rows. With
+    index_dir=None the index is in-memory only.
+
+    Vectors of another size than the stored ones (a different backbone) find no
+    matches, and adding them resets the index.
+    """
+
+    def __init__(
+        self, index_dir: str = None, duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD
+    ):
+        self.index_dir = index_dir
+        self.duplicate_threshold = duplicate_threshold
+        self.keys = []
+        self._vectors = None
+        self._lock = threading.RLock()
+        if self.index_dir:
+            self._open()
+
+    @classmethod
+    def from_config(cls, embeddings_config: dict):
+        """
+        Creates the index from ai.embeddings.index_dir / duplicate_threshold. A relative
+        index_dir lives under app_root(), like the extraction cache.
+        """
+        index_dir = embeddings_config.get("index_dir")
+        return cls(
+            os.path.join(app_root(), index_dir) if index_dir else None,
+            embeddings_config.get("duplicate_threshold", DEFAULT_DUPLICATE_THRESHOLD),
+        )
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.index_dir, "vectors.npy")
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.index_dir, "keys.json")
+
+    def _open(self):
+        if not (os.path.exists(self._vectors_path) and os.path.exists(self._keys_path)):
+            return
+        try:
+            with open(self._keys_path, "r", encoding="utf-8") as f:
+                keys = json.load(f)
+            vectors = np.load(self._vectors_path, mmap_mode="r+")
+        except Exception as e:
+            logger.error(f"Could not open embedding index {self.index_dir}, starting empty: {e}")
+            return
+        if len(keys) > len(vectors):
+            logger.error(f"Embedding index {self.index_dir} is inconsistent, starting empty.")
+            return
+        self.keys, self._vectors = keys, vectors
+        logger.info(f"Embedding index opened with {len(self.keys)} vectors.")
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The (len, dim) matrix of stored normalized vectors."""
+        if self._vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._vectors[: len(self.keys)]
+
+    def _other_backbone(self, dim: int) -> bool:
+        """True if the stored vectors have another size, i.e. came from another backbone."""
+        return self._vectors is not None and self._vectors.shape[1] != dim
+
+    def _reserve(self, rows: int, dim: int):
+        if self._other_backbone(dim):
+            # Switching classifier tiers changes the embedding size (512 for resnet18,
+            # 1024 for mobilenet_v3_small, whose extractor keeps the classifier's hidden
+            # layer); the old vectors cannot be compared with the new ones, so the index
+            # starts over.
+            logger.warning(
+                f"Embedding size changed from {self._vectors.shape[1]} to {dim}; "
+                f"resetting the embedding index ({len(self.keys)} vectors dropped)."
+            )
+            self.keys = []
+            self._vectors = None
+        capacity = 0 if self._vectors is None else len(self._vectors)
+        needed = len(self.keys) + rows
+        if needed <= capacity:
+            return
+        new_capacity = max(INITIAL_CAPACITY, capacity * 2, needed)
+        if self.index_dir:
+            ensure_folder(self.index_dir)
+            temp_path = f"{self._vectors_path}.tmp"
+            grown = np.lib.format.open_memmap(
+                temp_path, mode="w+", dtype=np.float32, shape=(new_capacity, dim)
+            )
+            if self.keys:
+                grown[: len(self.keys)] = self.vectors
+            grown.flush()
+            del grown
+            self._vectors = None
+            os.replace(temp_path, self._vectors_path)
+            self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+        else:
+            grown = np.zeros((new_capacity, dim), dtype=np.float32)
+            if self.keys:
+                grown[: len(self.keys)] = self.vectors
+            self._vectors = grown
+
+    def add(self, keys, vectors):
+        """Adds one vector per key (normalized here) and saves the index."""
+        vectors = normalize(vectors)
+        keys = list(keys)
+        if len(keys) != len(vectors):
+            raise ValueError("add() needs one vector per key.")
+        if not keys:
+            return
+        with self._lock:
+            self._reserve(len(keys), vectors.shape[1])
+            start = len(self.keys)
+            self._vectors[start : start + len(keys)] = vectors
+            self.keys.extend(keys)
+            self.save()
+
+    def prune(self, keep) -> int:
+        """
+        Drops the rows whose key fails keep(key), e.g. files that no longer exist,
+        compacting the matrix in place. Returns the number of dropped rows.
+        """
+        with self._lock:
+            rows = [i for i, key in enumerate(self.keys) if keep(key)]
+            removed = len(self.keys) - len(rows)
+            if removed:
+                self._vectors[: len(rows)] = self.vectors[rows]
+                self.keys = [self.keys[i] for i in rows]
+                self.save()
+        if removed:
+            logger.info(f"Pruned {removed} stale vectors from the embedding index.")
+        return removed
+
+    def save(self):
+        if not self.index_dir or self._vectors is None:
+            return
+        with self._lock:
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            temp_path = f"{self._keys_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.keys, f)
+            os.replace(temp_path, self._keys_path)
+
+    def search(self, vectors, k: int = 5):
+        """
+        Returns, for each query vector, up to k (key, cosine similarity) pairs,
+        most similar first.
+        """
+        queries = normalize(vectors)
+        with self._lock:
+            stored = self.vectors
+            if len(stored) == 0 or self._other_backbone(queries.shape[1]):
+                return [[] for _ in queries]
+            similarities = queries @ stored.T
+            keys = list(self.keys)
+        k = min(k, similarities.shape[1])
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(similarities, top):
+            order = candidates[np.argsort(-row[candidates])]
+            results.append([(keys[i], float(row[i])) for i in order])
+        return results
+
+    def find_duplicates(self, vectors, threshold: float = None):
+        """
+        Returns, for each query vector, the (key, similarity) of the most similar
+        stored vector at or above threshold (duplicate_threshold by default), or None.
+        """
+        threshold = self.duplicate_threshold if threshold is None else threshold
+        return [
+            matches[0] if matches and matches[0][1] >= threshold else None
+            for matches in self.search(vectors, k=1)
+        ]
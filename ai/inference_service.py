@@ -0,0 +1,379 @@
+# GameMediaTool/ai/inference_service.py
+
+import os
+import sys
+import time
+import secrets
+import threading
+import subprocess
+from multiprocessing.connection import Client, Listener
+
+from tools.logger import get_logger
+from .yolo.inference_backends import to_detection_result
+
+logger = get_logger("InferenceService")
+
+DEFAULT_ADDRESS = "127.0.0.1:50765"
+# Seconds without any connected client after which the service exits by itself.
+DEFAULT_IDLE_TIMEOUT = 600
+# Per-install secret of the service, outside the repository and readable by its owner
+# only. connection.recv() unpickles, so whoever holds the key can run code in the service.
+AUTHKEY_FILE = os.path.join("~", ".gamemediatool", "inference_service.key")
+# Pipeline methods a client may call, each taking a list of BGR images and a batch size.
+CLASSIFY_METHODS = ("classify_assets", "suggest_actions", "embed")
+
+
+def parse_address(address: str):
+    """ "host:port" -> (host, port); anything else (a pipe or socket path) is kept as is."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and not address.startswith("\\\\"):
+        return host, int(port)
+    return address
+
+
+def load_authkey(path: str = AUTHKEY_FILE, create: bool = False):
+    """
+    Returns the service authkey stored at path. If the file does not exist it is
+    created with a random key (owner-only permissions) when create is set;
+    otherwise None is returned.
+    """
+    path = os.path.expanduser(path)
+    try:
+        with open(path, "rb") as f:
+            key = f.read().strip()
+        if key:
+            return key
+    except FileNotFoundError:
+        pass
+    if not create:
+        return None
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Created by another process in the meantime.
+        return load_authkey(path)
+    key = secrets.token_hex(32).encode("ascii")
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    logger.info(f"Created the inference service key {path}.")
+    return key
+
+
+class InferenceServer:
+    """
+    Loads the Pipeline models once and serves batched requests from any number of
+    local clients over a multiprocessing.connection socket. A request is a dict
+    {"op": ..., "images": [...], "batch_size": ..., "conf": ...}; the reply is
+    {"ok": True, "result": ...} or {"ok": False, "error": message}. Requests run
+    one at a time on the shared models.
+
+    Clients never stop the service: it stops itself once no client has been
+    connected for idle_timeout seconds (never if idle_timeout is None or 0).
+
+    ops: "info" (class names and model ids), "detect" (YOLO, one DetectionResult
+    or None per image) and the Pipeline methods in CLASSIFY_METHODS.
+    """
+
+    def __init__(
+        self,
+        ai_config: dict,
+        authkey: bytes,
+        address: str = DEFAULT_ADDRESS,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    ):
+        from .pipeline import Pipeline
+
+        # The service runs the models itself and leaves the embedding index to its clients.
+        service_config = {**ai_config, "service": {"enabled": False}, "embeddings": {}}
+        self.pipeline = Pipeline(None, service_config)
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._listener = None
+        self._clients = 0
+        self._idle_since = time.monotonic()
+        self._clients_lock = threading.Lock()
+
+    @property
+    def clients(self) -> int:
+        return self._clients
+
+    def _info(self) -> dict:
+        yolo_model = self.pipeline.yolo_model
+        return {
+            "pid": os.getpid(),
+            "yolo": None
+            if yolo_model is None
+            else {
+                "class_names": yolo_model.class_names,
+                "weights_id": yolo_model.weights_id,
+                "backend": yolo_model.backend,
+            },
+            "asset_class_map": self.pipeline.asset_class_map,
+            "action_class_map": self.pipeline.action_class_map,
+        }
+
+    def handle(self, request: dict):
+        """Runs one request and returns its result (raises on bad requests)."""
+        op = request.get("op")
+        images = request.get("images", [])
+        batch_size = request.get("batch_size")
+        with self._lock:
+            if op == "info":
+                return self._info()
+            if op == "detect":
+                yolo_model = self.pipeline.yolo_model
+                if yolo_model is None:
+                    return [None] * len(images)
+                results = yolo_model.predict_batch(
+                    images, batch_size=batch_size or 16, conf=request.get("conf")
+                )
+                return [to_detection_result(result) for result in results]
+            if op in CLASSIFY_METHODS:
+                return getattr(self.pipeline, op)(images, batch_size=batch_size)
+        raise ValueError(f"Unknown inference op: {op!r}")
+
+    def _serve_client(self, connection):
+        with self._clients_lock:
+            self._clients += 1
+        try:
+            self._serve_connection(connection)
+        finally:
+            with self._clients_lock:
+                self._clients -= 1
+                if self._clients == 0:
+                    self._idle_since = time.monotonic()
+
+    def _serve_connection(self, connection):
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return
+                start = time.perf_counter()
+                try:
+                    reply = {"ok": True, "result": self.handle(request)}
+                except Exception as e:
+                    logger.error(
+                        f"Inference request {request.get('op')!r} failed: {e}", exc_info=True
+                    )
+                    reply = {"ok": False, "error": str(e)}
+                logger.debug(
+                    f"{request.get('op')} x{len(request.get('images', []))} served in "
+                    f"{time.perf_counter() - start:.3f}s"
+                )
+                try:
+                    connection.send(reply)
+                except OSError:
+                    return
+
+    def idle_expired(self) -> bool:
+        """True once no client has been connected for idle_timeout seconds."""
+        if not self.idle_timeout:
+            return False
+        with self._clients_lock:
+            return (
+                self._clients == 0 and time.monotonic() - self._idle_since >= self.idle_timeout
+            )
+
+    def _watch_idle(self):
+        while self._listener is not None:
+            time.sleep(min(self.idle_timeout, 5.0))
+            if self.idle_expired():
+                logger.info(
+                    f"No inference client for {self.idle_timeout}s, stopping the service."
+                )
+                self.close()
+                return
+
+    def serve_forever(self):
+        self.pipeline.load_models()
+        self._listener = Listener(self.address, authkey=self.authkey)
+        logger.info(f"Inference service listening on {self.address} (pid {os.getpid()}).")
+        self._idle_since = time.monotonic()
+        if self.idle_timeout:
+            threading.Thread(target=self._watch_idle, daemon=True).start()
+        while True:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                break
+            except Exception as e:
+                # e.g. a client with the wrong authkey.
+                logger.warning(f"Rejected inference client: {e}")
+                continue
+            threading.Thread(target=self._serve_client, args=(connection,), daemon=True).start()
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+
+
+class InferenceClient:
+    """
+    Thread-safe client of an InferenceServer; connects on first request.
+    server_process is the service process this client started, if any. Other
+    app instances may be using it too, so close() only disconnects; the service
+    exits by itself once it has no clients (see InferenceServer).
+    """
+
+    def __init__(self, authkey: bytes, address: str = DEFAULT_ADDRESS):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.server_process = None
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        with self._lock:
+            if self._connection is None:
+                self._connection = Client(self.address, authkey=self.authkey)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stop_server(self, timeout: float = 5.0):
+        """
+        Closes the connection and stops the service process this client started.
+        Only for a service that never became ready, so no other client can use it.
+        """
+        self.close()
+        process, self.server_process = self.server_process, None
+        if process is None or process.poll() is not None:
+            return
+        logger.info(f"Stopping the inference service (pid {process.pid}).")
+        process.terminate()
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def request(self, op: str, images=(), batch_size=None, conf=None):
+        """Sends one batched request. Raises ConnectionError / RuntimeError on failure."""
+        self.connect()
+        with self._lock:
+            try:
+                self._connection.send(
+                    {"op": op, "images": list(images), "batch_size": batch_size, "conf": conf}
+                )
+                reply = self._connection.recv()
+            except (EOFError, OSError) as e:
+                self._connection = None
+                raise ConnectionError(f"Inference service connection lost: {e}") from e
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "Inference service error"))
+        return reply["result"]
+
+
+class RemoteYOLOModel:
+    """
+    Stands in for YOLOModel in a client Pipeline; detection runs in the service.
+    If a request fails, fallback() is called and must return a local YOLOModel
+    (or None) to run the batch instead.
+    """
+
+    shards = None
+
+    def __init__(self, client: InferenceClient, info: dict, fallback=None):
+        self.client = client
+        self.class_names = info["class_names"]
+        self.weights_id = info["weights_id"]
+        self.backend = f"service:{info['backend']}"
+        self.model = True
+        self.fallback = fallback
+
+    def predict(self, image):
+        return self.predict_batch([image], batch_size=1)
+
+    def predict_batch(self, images, batch_size=16, conf=None):
+        try:
+            return self.client.request("detect", images, batch_size=batch_size, conf=conf)
+        except Exception as e:
+            logger.error(f"Remote YOLO inference failed, running in-process: {e}")
+            local_model = self.fallback() if self.fallback is not None else None
+            if local_model is None:
+                return [None] * len(images)
+            return local_model.predict_batch(images, batch_size=batch_size, conf=conf)
+
+
+def connect_to_service(service_config: dict):
+    """
+    Connects to the inference service of ai.service and returns (client, info),
+    starting the service first when autostart is set. An autostarted service
+    writes its stderr to logs/inference_service.log. Returns (None, None) if no
+    service is reachable.
+    """
+    # A frozen build cannot run "-m", the service then has to be started separately.
+    autostart = service_config.get("autostart", True) and not getattr(sys, "frozen", False)
+    authkey = load_authkey(service_config.get("authkey_file", AUTHKEY_FILE), create=autostart)
+    if authkey is None:
+        logger.warning(
+            "No inference service key yet; start the service (python -m ai.inference_service) "
+            "once to create it."
+        )
+        return None, None
+    client = InferenceClient(authkey, service_config.get("address", DEFAULT_ADDRESS))
+    try:
+        return client, client.request("info")
+    except (ConnectionError, OSError):
+        pass
+    except Exception as e:
+        logger.error(f"Inference service is not usable: {e}")
+        return None, None
+
+    if not autostart:
+        return None, None
+    logger.info("Starting the inference service...")
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    log_dir = os.path.join(repo_root, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, "inference_service.log")
+    with open(log_path, "ab") as log_file:
+        client.server_process = subprocess.Popen(
+            [sys.executable, "-m", "ai.inference_service"],
+            cwd=repo_root,
+            stdout=subprocess.DEVNULL,
+            stderr=log_file,
+        )
+    deadline = time.monotonic() + service_config.get("startup_timeout", 120)
+    while time.monotonic() < deadline:
+        time.sleep(0.5)
+        try:
+            return client, client.request("info")
+        except (ConnectionError, OSError):
+            pass
+        except Exception as e:
+            logger.error(f"Inference service is not usable: {e}")
+            break
+        exit_code = client.server_process.poll()
+        if exit_code is not None:
+            logger.error(
+                f"Inference service exited with code {exit_code} while starting; "
+                f"see {log_path}."
+            )
+            break
+    else:
+        logger.warning("Inference service did not start in time.")
+    client.stop_server()
+    return None, None
+
+
+if __name__ == "__main__":
+    from utils.config_loader import load_config
+
+    ai_config = load_config().get("ai", {})
+    service_config = ai_config.get("service", {})
+    InferenceServer(
+        ai_config,
+        load_authkey(service_config.get("authkey_file", AUTHKEY_FILE), create=True),
+        service_config.get("address", DEFAULT_ADDRESS),
+        service_config.get("idle_timeout", DEFAULT_IDLE_TIMEOUT),
+    ).serve_forever()
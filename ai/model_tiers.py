@@ -0,0 +1,139 @@
+# GameMediaTool/ai/model_tiers.py
+
+"""
+Latency / accuracy report of the classifier tiers (ai.cnn.architecture).
+
+Run python -m ai.model_tiers: every available architecture is timed on the CPU and,
+when CNN training data exists, trained on it (head only, on cached features) to
+compare validation accuracy. The report is written to ai/models/model_tiers_report.json;
+the deployed classifiers are not touched.
+
+resnet18 and mobilenet_v3_small come with torchvision; efficientnet_lite0 needs timm
+(the model-tiers extra: pip install .[model-tiers]) and is left out of the report
+without it.
+"""
+
+import os
+import json
+import time
+
+import numpy as np
+import torch
+
+from .cnn.cnn_model import (
+    ARCHITECTURES,
+    TIMM_AVAILABLE,
+    create_pytorch_model,
+    train_pytorch_model,
+)
+from tools.logger import get_logger
+
+logger = get_logger("ModelTiers")
+
+REPORT_FILE_NAME = "model_tiers_report.json"
+TIERS_DIRNAME = "tiers"
+LATENCY_BATCH_SIZE = 32
+
+
+def benchmark_latency(model, batch_size: int = 1, runs: int = 20, warmup: int = 3) -> float:
+    """Median CPU time of one forward pass of a (batch_size, 3, 224, 224) batch, in ms."""
+    model = model.cpu().eval()
+    batch = torch.rand(batch_size, 3, 224, 224)
+    timings = []
+    with torch.no_grad():
+        for run in range(warmup + runs):
+            start = time.perf_counter()
+            model(batch)
+            if run >= warmup:
+                timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000.0)
+
+
+def available_architectures() -> list:
+    return [name for name in ARCHITECTURES if name != "efficientnet_lite0" or TIMM_AVAILABLE]
+
+
+def compare_tiers(
+    data_dir: str = None,
+    output_dir: str = None,
+    architectures=None,
+    num_epochs: int = 5,
+    feature_cache_dir: str = None,
+    runs: int = 20,
+) -> dict:
+    """
+    Benchmarks (and, with data_dir holding train/ and val/ class folders, trains into
+    output_dir) each architecture. Returns {architecture: metrics}: parameters,
+    latency_ms (one image), batch_latency_ms (LATENCY_BATCH_SIZE images),
+    images_per_second (batched), val_accuracy (None without data) and path.
+    """
+    architectures = architectures or available_architectures()
+    has_data = bool(data_dir) and all(
+        os.path.isdir(os.path.join(data_dir, split)) for split in ("train", "val")
+    )
+    num_classes = 2
+    if has_data:
+        train_dir = os.path.join(data_dir, "train")
+        num_classes = max(num_classes, len([d for d in os.scandir(train_dir) if d.is_dir()]))
+    else:
+        logger.warning(f"No training data in {data_dir}; reporting latency only.")
+
+    report = {}
+    for architecture in architectures:
+        try:
+            model = create_pytorch_model(num_classes, pretrained=False, architecture=architecture)
+        except Exception as e:
+            logger.warning(f"Skipping {architecture}: {e}")
+            continue
+        batch_latency = benchmark_latency(model, LATENCY_BATCH_SIZE, runs)
+        metrics = {
+            "parameters": sum(param.numel() for param in model.parameters()),
+            "latency_ms": benchmark_latency(model, 1, runs),
+            "batch_latency_ms": batch_latency,
+            "images_per_second": LATENCY_BATCH_SIZE * 1000.0 / batch_latency,
+            "val_accuracy": None,
+            "path": None,
+        }
+        if has_data and output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            model_path = os.path.join(output_dir, f"{architecture}_classifier.pth")
+            try:
+                metrics["val_accuracy"] = train_pytorch_model(
+                    data_dir,
+                    model_path,
+                    os.path.join(output_dir, f"{architecture}_class_map.json"),
+                    num_epochs=num_epochs,
+                    precompute_features=True,
+                    feature_cache_dir=feature_cache_dir,
+                    architecture=architecture,
+                )
+                metrics["path"] = model_path
+            except Exception as e:
+                logger.error(f"Training the {architecture} tier failed: {e}", exc_info=True)
+        report[architecture] = metrics
+        logger.info(f"{architecture}: {metrics}")
+    return report
+
+
+def write_report(config: dict) -> dict:
+    """Compares the tiers on training.cnn_data_dir and writes model_tiers_report.json."""
+    from .pipeline import ASSET_MODEL_PATH
+
+    training_config = config.get("training", {})
+    models_dir = os.path.dirname(ASSET_MODEL_PATH)
+    report = compare_tiers(
+        training_config.get("cnn_data_dir", "assets/cnn_training_data"),
+        os.path.join(models_dir, TIERS_DIRNAME),
+        feature_cache_dir=training_config.get("cnn_feature_cache_dir", "cache/cnn_features"),
+    )
+    report_path = os.path.join(models_dir, REPORT_FILE_NAME)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    logger.info(f"Model tier report saved to {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    from utils.config_loader import load_config
+
+    write_report(load_config())
@@ -3,15 +3,25 @@
 import os
 import sys
 import json
+import threading
 from typing import Dict, Any
 
 import cv2
 import numpy as np
 import torch
-from torchvision import transforms
 
+from .embedding_index import EmbeddingIndex, normalize
+from .inference_service import RemoteYOLOModel, connect_to_service
+from .sharded_inference import ShardedInference
 from .yolo.yolo_model import YOLOModel
-from .cnn.cnn_model import create_pytorch_model
+from .cnn.cnn_model import (
+    MultiHeadClassifier,
+    architecture_of,
+    cnn_int8_path,
+    create_pytorch_model,
+    feature_extractor,
+    inference_transform,
+)
 from tools.logger import get_logger
 
 logger = get_logger("AIPipeline")
@@ -30,53 +40,220 @@ ASSET_CLASS_MAP_PATH = os.path.join(model_base, "asset_class_map.json")
 ACTION_MODEL_PATH = os.path.join(model_base, "action_classifier.pth")
 ACTION_CLASS_MAP_PATH = os.path.join(model_base, "action_class_map.json")
 
+# Set by Pipeline.load_models(); reading one of them before that loads the models.
+MODEL_ATTRIBUTES = frozenset(
+    {
+        "yolo_model",
+        "shared_classifier",
+        "asset_classifier",
+        "asset_class_map",
+        "action_classifier",
+        "action_class_map",
+    }
+)
+
 
 class Pipeline:
-    def __init__(self, tag_manager):
+    """
+    YOLO detection plus the asset / action classifiers. Creating a Pipeline is
+    cheap: the models are loaded by load_models(), which MainWindow runs on a
+    background thread at startup, or on first use of a model attribute.
+
+    With ai.sharding enabled, inputs spanning several batches run on worker
+    processes that hold their own model copies (see ShardedInference).
+
+    With ai.service enabled, the Pipeline is a client of the inference service
+    (see ai.inference_service), which holds the models once for every process;
+    when the service is unreachable or a request fails, the models are loaded
+    and run in-process instead.
+    """
+
+    shards = None
+    service = None
+    _use_service = False
+
+    def __init__(self, tag_manager, ai_config=None):
         self.tag_manager = tag_manager
+        self.ai_config = ai_config or {}
+        self.precision = self.ai_config.get("precision", "fp32")
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         logger.info(f"Pipeline initialized. Using device: {self.device}")
+        # The INT8 classifiers are quantized for the CPU.
+        self.cnn_device = torch.device("cpu") if self.precision == "int8" else self.device
+        self.cnn_batch_size = self.ai_config.get("cnn", {}).get("batch_size", 32)
+        self.transform = inference_transform()
+        self._load_lock = threading.Lock()
+        self._models_loaded = False
+        # Embeddings of collected assets, shared by the exporter and the workshop.
+        self.embedding_index = EmbeddingIndex.from_config(self.ai_config.get("embeddings", {}))
+        self.shards = ShardedInference.from_config(self.ai_config)
+        self._use_service = self.ai_config.get("service", {}).get("enabled", False)
 
-        # Load all models
-        self.yolo_model = self._load_yolo_model(YOLO_MODEL_PATH)
-        self.asset_classifier, self.asset_class_map = self._load_cnn_model(
-            ASSET_MODEL_PATH, ASSET_CLASS_MAP_PATH, "Asset Classifier"
-        )
-        self.action_classifier, self.action_class_map = self._load_cnn_model(
-            ACTION_MODEL_PATH, ACTION_CLASS_MAP_PATH, "Action Classifier"
-        )
+    def __getattr__(self, name):
+        # Only reached for attributes that are not set yet: load the models on first use.
+        if name in MODEL_ATTRIBUTES and "_load_lock" in self.__dict__:
+            self.load_models()
+            return self.__dict__[name]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
 
-        self.transform = transforms.Compose(
-            [
-                transforms.ToTensor(),
-                transforms.Resize((224, 224), antialias=True),
-                transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-            ]
+    @property
+    def models_loaded(self) -> bool:
+        return self._models_loaded
+
+    def load_models(self):
+        """Loads YOLO and the classifiers once. Thread-safe; later calls return at once."""
+        with self._load_lock:
+            if self._models_loaded:
+                return
+            if self._use_service and self._connect_service():
+                self._models_loaded = True
+                return
+            self.yolo_model = self._load_yolo_model(YOLO_MODEL_PATH)
+            if self.yolo_model is not None:
+                self.yolo_model.shards = self.shards
+            # Both classifiers share the frozen ImageNet backbone; load it once when possible.
+            self.shared_classifier = None
+            cnn_config = self.ai_config.get("cnn", {})
+            if cnn_config.get("shared_backbone", True) and self.precision != "int8":
+                self._load_shared_classifiers()
+            if self.shared_classifier is None:
+                self.asset_classifier, self.asset_class_map = self._load_cnn_model(
+                    ASSET_MODEL_PATH, ASSET_CLASS_MAP_PATH, "Asset Classifier"
+                )
+                self.action_classifier, self.action_class_map = self._load_cnn_model(
+                    ACTION_MODEL_PATH, ACTION_CLASS_MAP_PATH, "Action Classifier"
+                )
+            self._models_loaded = True
+            logger.info("AI models loaded.")
+
+    def _connect_service(self) -> bool:
+        """Uses the inference service for all models if it is reachable."""
+        client, info = connect_to_service(self.ai_config.get("service", {}))
+        if client is None:
+            logger.warning("Inference service unavailable, loading the models in-process.")
+            return False
+        self.service = client
+        self.yolo_model = (
+            RemoteYOLOModel(client, info["yolo"], fallback=self._local_yolo_model)
+            if info["yolo"] is not None
+            else None
         )
+        self.shared_classifier = self.asset_classifier = self.action_classifier = None
+        self.asset_class_map = info["asset_class_map"]
+        self.action_class_map = info["action_class_map"]
+        logger.info(f"Using the inference service (pid {info['pid']}).")
+        return True
+
+    def _fall_back_to_local(self):
+        """Drops the inference service and loads the models in-process (once)."""
+        with self._load_lock:
+            if self.service is None:
+                return
+            self.service.close()
+            self.service = None
+            self._use_service = False
+            self._models_loaded = False
+        self.load_models()
+
+    def _local_yolo_model(self):
+        self._fall_back_to_local()
+        return self.yolo_model
+
+    def _run_remote(self, op, images, batch_size):
+        """
+        Runs op in the inference service if the Pipeline uses it. Returns None to
+        run in-process instead, falling back for good when the request fails.
+        """
+        if self._use_service and not self.models_loaded:
+            self.load_models()
+        if self.service is None:
+            return None
+        try:
+            return self.service.request(op, images, batch_size=batch_size)
+        except Exception as e:
+            logger.error(f"Remote {op} failed, running in-process: {e}")
+            self._fall_back_to_local()
+            return None
 
     def _load_yolo_model(self, path):
         logger.info(f"Loading YOLO model from {path}...")
-        yolo_wrapper = YOLOModel(path)
+        yolo_config = self.ai_config.get("yolo", {})
+        yolo_wrapper = YOLOModel(
+            path,
+            backend=yolo_config.get("backend", "torch"),
+            num_threads=yolo_config.get("cpu_threads"),
+            imgsz=yolo_config.get("imgsz", 640),
+            precision=self.precision,
+        )
         if yolo_wrapper.model:
             return yolo_wrapper
         else:
             logger.error("YOLO model loading failed. Predictions will be disabled.")
             return None
 
+    @staticmethod
+    def _load_class_map(class_map_path, model_name):
+        logger.info(f"Loading {model_name} class map from {class_map_path}...")
+        with open(class_map_path, "r") as f:
+            # [THE FIX] Swap the key and value to match the JSON format {class_name: index}
+            # and create a dictionary of {index: class_name}
+            json_data = json.load(f)
+            return {int(v): k for k, v in json_data.items()}
+
+    def _load_shared_classifiers(self):
+        """
+        Loads the asset and action heads on one shared backbone. Leaves
+        shared_classifier as None (separate models are loaded) if the checkpoints
+        are missing or were trained with different backbones.
+        """
+        try:
+            asset_class_map = self._load_class_map(ASSET_CLASS_MAP_PATH, "Asset Classifier")
+            action_class_map = self._load_class_map(ACTION_CLASS_MAP_PATH, "Action Classifier")
+            model = MultiHeadClassifier.from_checkpoints(
+                {
+                    "asset": (ASSET_MODEL_PATH, len(asset_class_map)),
+                    "action": (ACTION_MODEL_PATH, len(action_class_map)),
+                },
+                map_location=self.cnn_device,
+            )
+        except Exception as e:
+            logger.warning(
+                f"Could not load the shared-backbone classifier, loading separate models: {e}"
+            )
+            return
+        model.to(self.cnn_device)
+        model.eval()
+        self.shared_classifier = model
+        self.asset_classifier = model.head_model("asset")
+        self.action_classifier = model.head_model("action")
+        self.asset_class_map = asset_class_map
+        self.action_class_map = action_class_map
+        logger.info("Asset and action classifiers loaded on a shared backbone.")
+
     def _load_cnn_model(self, model_path, class_map_path, model_name):
         try:
-            logger.info(f"Loading {model_name} class map from {class_map_path}...")
-            with open(class_map_path, "r") as f:
-                # [THE FIX] Swap the key and value to match the JSON format {class_name: index}
-                # and create a dictionary of {index: class_name}
-                json_data = json.load(f)
-                class_map = {int(v): k for k, v in json_data.items()}
+            class_map = self._load_class_map(class_map_path, model_name)
 
             num_classes = len(class_map)
-            logger.info(f"Loading {model_name} model for {num_classes} classes...")
-            model = create_pytorch_model(num_classes)
-            model.load_state_dict(torch.load(model_path, map_location=self.device))
-            model.to(self.device)
+            int8_path = cnn_int8_path(model_path)
+            if self.precision == "int8" and os.path.exists(int8_path):
+                logger.info(f"Loading INT8 {model_name} from {int8_path}...")
+                model = torch.jit.load(int8_path, map_location="cpu")
+                model.eval()
+                return model, class_map
+            if self.precision == "int8":
+                logger.warning(
+                    f"INT8 {model_name} not found at {int8_path} (run python -m ai.quantization); "
+                    "using the float model."
+                )
+
+            state = torch.load(model_path, map_location=self.cnn_device)
+            architecture = architecture_of(state)
+            logger.info(f"Loading {model_name} model ({architecture}) for {num_classes} classes...")
+            # The checkpoint holds the backbone too, so skip the ImageNet download.
+            model = create_pytorch_model(num_classes, pretrained=False, architecture=architecture)
+            model.load_state_dict(state)
+            model.to(self.cnn_device)
             model.eval()
             logger.info(f"{model_name} model loaded successfully.")
             return model, class_map
@@ -84,34 +261,188 @@ class Pipeline:
             logger.error(f"Failed to load {model_name} model from {model_path}: {e}", exc_info=True)
             return None, None
 
-    def classify_asset(self, image: np.ndarray) -> str:
-        if self.asset_classifier is None:
-            logger.warning("Asset classifier not loaded")
-            return "unknown_asset"
+    def _tensor_batches(self, images, batch_size=None):
+        """Yields preprocessed tensor batches of up to batch_size (ai.cnn.batch_size) images."""
+        batch_size = max(1, batch_size or self.cnn_batch_size)
+        for start in range(0, len(images), batch_size):
+            tensors = [
+                self.transform(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+                for image in images[start : start + batch_size]
+            ]
+            yield torch.stack(tensors).to(self.cnn_device)
 
-        logger.debug("Classifying asset")
+    @staticmethod
+    def _labels(probabilities, class_map, unknown_tag):
+        return [class_map.get(int(i), unknown_tag) for i in probabilities.argmax(axis=1)]
+
+    def _classify_batches(self, model, class_map, images, unknown_tag, batch_size=None):
+        """
+        Runs a classifier over BGR images in batches of batch_size (ai.cnn.batch_size).
+        Returns (labels, probabilities) with one label per image and an
+        (N, num_classes) float32 array of softmax probabilities.
+        """
+        if model is None:
+            return [unknown_tag] * len(images), np.zeros((len(images), 0), dtype=np.float32)
+
+        probabilities = []
         with torch.no_grad():
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            tensor = self.transform(image_rgb).unsqueeze(0).to(self.device)
-            outputs = self.asset_classifier(tensor)
-            _, predicted = torch.max(outputs, 1)
-            class_idx = predicted.item()
-            tag = self.asset_class_map.get(class_idx, "unknown_asset")
-            logger.debug(f"Asset classified as: {tag}")
-            return tag
+            for batch in self._tensor_batches(images, batch_size):
+                probabilities.append(torch.softmax(model(batch).float(), dim=1).cpu().numpy())
 
-    def suggest_action(self, image: np.ndarray) -> str:
+        if not probabilities:
+            return [], np.zeros((0, len(class_map)), dtype=np.float32)
+        probabilities = np.concatenate(probabilities)
+        return self._labels(probabilities, class_map, unknown_tag), probabilities
+
+    def close(self):
+        """
+        Stops the sharded inference worker processes, if any, and disconnects from
+        the service, which keeps running for other clients until its idle timeout.
+        """
+        if self.shards is not None:
+            self.shards.close()
+        if self.service is not None:
+            self.service.close()
+
+    def _run_sharded(self, method, images, batch_size):
+        """
+        Runs method on the worker processes if sharding is enabled and the images
+        span several batches. Returns None to run in-process instead.
+        """
+        batch_size = max(1, batch_size or self.cnn_batch_size)
+        if self.shards is None or len(images) <= batch_size:
+            return None
+        try:
+            return self.shards.classify(method, images, batch_size)
+        except Exception as e:
+            logger.error(f"Sharded {method} failed, running in-process: {e}", exc_info=True)
+            return None
+
+    def classify_assets(self, images, batch_size=None):
+        """Classifies a list of BGR images. Returns (labels, probabilities)."""
+        remote = self._run_remote("classify_assets", images, batch_size)
+        if remote is not None:
+            return remote
+        sharded = self._run_sharded("classify_assets", images, batch_size)
+        if sharded is not None:
+            return sharded
+        if self.asset_classifier is None:
+            logger.warning("Asset classifier not loaded")
+        labels, probabilities = self._classify_batches(
+            self.asset_classifier, self.asset_class_map, images, "unknown_asset", batch_size
+        )
+        logger.debug(f"Classified {len(images)} asset(s)")
+        return labels, probabilities
+
+    def suggest_actions(self, images, batch_size=None):
+        """Suggests an action for each of a list of BGR images. Returns (labels, probabilities)."""
+        remote = self._run_remote("suggest_actions", images, batch_size)
+        if remote is not None:
+            return remote
+        sharded = self._run_sharded("suggest_actions", images, batch_size)
+        if sharded is not None:
+            return sharded
         if self.action_classifier is None:
             logger.warning("Action classifier not loaded")
-            return "unknown_action"
+        labels, probabilities = self._classify_batches(
+            self.action_classifier, self.action_class_map, images, "unknown_action", batch_size
+        )
+        logger.debug(f"Suggested actions for {len(images)} image(s)")
+        return labels, probabilities
 
-        logger.debug("Suggesting action")
+    def classify_and_suggest(self, images, batch_size=None):
+        """
+        Classifies assets and suggests actions for the same BGR images. With the
+        shared backbone each batch goes through the backbone once for both heads.
+        Returns ((asset_labels, asset_probabilities), (action_labels, action_probabilities)).
+        """
+        if self.shared_classifier is None:
+            return (
+                self.classify_assets(images, batch_size),
+                self.suggest_actions(images, batch_size),
+            )
+
+        probabilities = {"asset": [], "action": []}
         with torch.no_grad():
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            tensor = self.transform(image_rgb).unsqueeze(0).to(self.device)
-            outputs = self.action_classifier(tensor)
-            _, predicted = torch.max(outputs, 1)
-            class_idx = predicted.item()
-            tag = self.action_class_map.get(class_idx, "unknown_action")
-            logger.debug(f"Action suggested: {tag}")
-            return tag
+            for batch in self._tensor_batches(images, batch_size):
+                for name, logits in self.shared_classifier(batch).items():
+                    probabilities[name].append(torch.softmax(logits.float(), dim=1).cpu().numpy())
+
+        results = []
+        for name, class_map, unknown_tag in (
+            ("asset", self.asset_class_map, "unknown_asset"),
+            ("action", self.action_class_map, "unknown_action"),
+        ):
+            head_probabilities = (
+                np.concatenate(probabilities[name])
+                if probabilities[name]
+                else np.zeros((0, len(class_map)), dtype=np.float32)
+            )
+            labels = self._labels(head_probabilities, class_map, unknown_tag)
+            results.append((labels, head_probabilities))
+        return tuple(results)
+
+    def suggest_clip_actions(self, clips_frames, batch_size=None):
+        """
+        Suggests one action per clip from several frames of it. clips_frames is a
+        list of frame lists; all frames go through the classifier in shared batches
+        and each clip's softmax probabilities are averaged.
+        Returns one (label, confidence, probabilities) tuple per clip.
+        """
+        frames = [frame for clip_frames in clips_frames for frame in clip_frames]
+        _, probabilities = self.suggest_actions(frames, batch_size)
+        results, start = [], 0
+        for clip_frames in clips_frames:
+            clip_probabilities = probabilities[start : start + len(clip_frames)]
+            start += len(clip_frames)
+            if clip_probabilities.size == 0:
+                # No frames, or no action classifier loaded.
+                results.append(("unknown_action", 0.0, None))
+                continue
+            mean = clip_probabilities.mean(axis=0)
+            best = int(mean.argmax())
+            label = self.action_class_map.get(best, "unknown_action")
+            results.append((label, float(mean[best]), mean))
+        return results
+
+    def _feature_extractor(self):
+        """The classifier backbone (pooled head-input features), or None if it is unavailable."""
+        if self.shared_classifier is not None:
+            return self.shared_classifier.backbone
+        for classifier in (self.asset_classifier, self.action_classifier):
+            # The INT8 TorchScript classifiers do not expose their backbone.
+            if isinstance(classifier, torch.nn.Module) and hasattr(classifier, "architecture"):
+                return feature_extractor(classifier)
+        return None
+
+    def embed(self, images, batch_size=None):
+        """
+        Returns the L2-normalized backbone embeddings of BGR images as an (N, dim)
+        float32 array (dim depends on the classifier architecture), or None if no
+        float classifier is loaded.
+        """
+        if images:
+            remote = self._run_remote("embed", images, batch_size)
+            if remote is not None:
+                return remote
+        backbone = self._feature_extractor()
+        if backbone is None:
+            logger.warning("No classifier backbone loaded, cannot compute embeddings.")
+            return None
+        if not images:
+            return np.zeros((0, 0), dtype=np.float32)
+        features = []
+        with torch.no_grad():
+            for batch in self._tensor_batches(images, batch_size):
+                features.append(backbone(batch).float().cpu().numpy())
+        return normalize(np.concatenate(features))
+
+    def classify_asset(self, image: np.ndarray) -> str:
+        labels, _ = self.classify_assets([image])
+        logger.debug(f"Asset classified as: {labels[0]}")
+        return labels[0]
+
+    def suggest_action(self, image: np.ndarray) -> str:
+        labels, _ = self.suggest_actions([image])
+        logger.debug(f"Action suggested: {labels[0]}")
+        return labels[0]
@@ -0,0 +1,337 @@
+# GameMediaTool/ai/quantization.py
+
+"""
+Offline INT8 post-training quantization of the YOLO detector and the CNN classifiers.
+
+Run once after training (python -m ai.quantization). The INT8 models are written next
+to the float ones and loaded by the Pipeline when ai.precision is "int8".
+"""
+
+import os
+import copy
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+from .cnn.cnn_model import (
+    architecture_of,
+    cnn_int8_path,
+    create_pytorch_model,
+    inference_transform,
+    is_valid_image_file,
+)
+from .yolo.inference_backends import (
+    ONNXRUNTIME_AVAILABLE,
+    ONNXRuntimeDetector,
+    export_model,
+    letterbox,
+    yolo_int8_path,
+)
+from tools.logger import get_logger
+
+logger = get_logger("Quantization")
+
+CNN_CALIBRATION_DIR = "assets/cnn_data_pool"
+YOLO_CALIBRATION_DIR = "assets/yolo_data_pool/images"
+YOLO_VALIDATION_DIR = "assets/yolo_training_data/images/val"
+REPORT_FILE_NAME = "quantization_report.json"
+# Calibration only needs a representative sample; more images mostly cost time.
+CALIBRATION_LIMIT = 200
+MATCH_IOU = 0.5
+
+
+def _image_files(folder, limit: int = None) -> list:
+    """Image files under folder (recursively), evenly sampled down to limit."""
+    if not folder or not os.path.isdir(folder):
+        return []
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(folder)
+        for name in files
+        if is_valid_image_file(name)
+    )
+    if limit and len(paths) > limit:
+        paths = paths[:: len(paths) // limit][:limit]
+    return paths
+
+
+def _read_rgb(path: str):
+    image = cv2.imread(path)
+    if image is None:
+        logger.warning(f"Skipping unreadable image {path}")
+        return None
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+# --- CNN classifiers -------------------------------------------------------------------
+
+
+def _cnn_batches(paths, batch_size: int = 16):
+    transform = inference_transform()
+    batch = []
+    for path in paths:
+        image = _read_rgb(path)
+        if image is None:
+            continue
+        batch.append(transform(image))
+        if len(batch) == batch_size:
+            yield torch.stack(batch)
+            batch = []
+    if batch:
+        yield torch.stack(batch)
+
+
+def quantize_cnn(float_model, calibration_paths):
+    """
+    Statically quantizes a classifier to INT8 (FX graph mode, per-channel weights),
+    calibrating activation ranges on calibration_paths. Returns a frozen TorchScript
+    module that runs on the CPU.
+    """
+    model = copy.deepcopy(float_model).cpu().eval()
+    example = torch.zeros(1, 3, 224, 224)
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    prepared = prepare_fx(model, qconfig_mapping, (example,))
+    with torch.no_grad():
+        for batch in _cnn_batches(calibration_paths):
+            prepared(batch)
+        quantized = convert_fx(prepared)
+        return torch.jit.freeze(torch.jit.trace(quantized, example).eval())
+
+
+def evaluate_cnn(float_model, int8_model, val_dir, class_map: dict) -> dict:
+    """
+    Compares both classifiers on the validation split (class sub-folders of val_dir).
+    Reports top-1 agreement on every image and accuracy on images whose folder is a
+    class of class_map ({index: name}).
+    """
+    class_index = {name: index for index, name in class_map.items()}
+    paths = _image_files(val_dir)
+    labels = [class_index.get(Path(path).parent.name, -1) for path in paths]
+    float_model = float_model.cpu().eval()
+
+    float_preds, int8_preds = [], []
+    with torch.no_grad():
+        for batch in _cnn_batches(paths):
+            float_preds.extend(float_model(batch).argmax(1).tolist())
+            int8_preds.extend(int8_model(batch).argmax(1).tolist())
+
+    float_preds, int8_preds = np.array(float_preds), np.array(int8_preds)
+    labels = np.array(labels[: len(float_preds)])
+    labelled = labels >= 0
+    report = {
+        "images": int(len(float_preds)),
+        "agreement": float(np.mean(float_preds == int8_preds)) if len(float_preds) else None,
+        "accuracy_float": None,
+        "accuracy_int8": None,
+    }
+    if labelled.any():
+        report["accuracy_float"] = float(np.mean(float_preds[labelled] == labels[labelled]))
+        report["accuracy_int8"] = float(np.mean(int8_preds[labelled] == labels[labelled]))
+    return report
+
+
+def quantize_cnn_file(model_path, class_map_path, calibration_paths, val_dir, name) -> dict:
+    """Quantizes a saved classifier, writes <name>_int8.pt and returns its evaluation report."""
+    with open(class_map_path, "r") as f:
+        class_map = {int(v): k for k, v in json.load(f).items()}
+    state = torch.load(model_path, map_location="cpu")
+    float_model = create_pytorch_model(
+        len(class_map), pretrained=False, architecture=architecture_of(state)
+    )
+    float_model.load_state_dict(state)
+    float_model.eval()
+
+    logger.info(f"Quantizing {name} on {len(calibration_paths)} calibration images...")
+    int8_model = quantize_cnn(float_model, calibration_paths)
+    output_path = cnn_int8_path(model_path)
+    torch.jit.save(int8_model, output_path)
+    logger.info(f"INT8 {name} saved to {output_path}")
+
+    report = evaluate_cnn(float_model, int8_model, val_dir, class_map)
+    report["path"] = output_path
+    return report
+
+
+# --- YOLO detector ---------------------------------------------------------------------
+
+
+def _yolo_input(image: np.ndarray, imgsz: int) -> np.ndarray:
+    padded, _, _ = letterbox(image, imgsz)
+    return np.ascontiguousarray(padded.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def quantize_yolo(weights_path, calibration_paths, imgsz: int = 640) -> str:
+    """
+    Exports the detector to ONNX and statically quantizes it to INT8 (QDQ, per-channel
+    weights) with onnxruntime, calibrating on calibration_paths. Returns the INT8 path.
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType
+    from onnxruntime.quantization import quantize_static
+    from ultralytics import YOLO
+
+    float_path = export_model(YOLO(weights_path), weights_path, "onnx", imgsz)
+    session = ort.InferenceSession(float_path, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+
+    class ImageReader(CalibrationDataReader):
+        def __init__(self):
+            images = (_read_rgb(path) for path in calibration_paths)
+            self._inputs = (
+                {input_name: _yolo_input(image, imgsz)} for image in images if image is not None
+            )
+
+        def get_next(self):
+            return next(self._inputs, None)
+
+    output_path = yolo_int8_path(weights_path)
+    logger.info(f"Quantizing YOLO on {len(calibration_paths)} calibration images...")
+    quantize_static(
+        float_path,
+        output_path,
+        ImageReader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+    logger.info(f"INT8 YOLO model saved to {output_path}")
+    return output_path
+
+
+def _box_iou(box, boxes: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
+
+
+def compare_detections(float_boxes, int8_boxes):
+    """
+    Matches float detections to INT8 detections of the same class (IoU >= MATCH_IOU).
+    Returns (matched, float count, int8 count, summed absolute confidence delta).
+    """
+    matched, conf_delta = 0, 0.0
+    used = np.zeros(len(int8_boxes), dtype=bool)
+    for xyxy, conf, cls in zip(float_boxes.xyxy, float_boxes.conf, float_boxes.cls):
+        candidates = np.flatnonzero((int8_boxes.cls == cls) & ~used)
+        if not len(candidates):
+            continue
+        ious = _box_iou(xyxy, int8_boxes.xyxy[candidates])
+        best = int(np.argmax(ious))
+        if ious[best] >= MATCH_IOU:
+            used[candidates[best]] = True
+            matched += 1
+            conf_delta += abs(float(conf) - float(int8_boxes.conf[candidates[best]]))
+    return matched, len(float_boxes), len(int8_boxes), conf_delta
+
+
+def evaluate_yolo(float_detector, int8_detector, val_paths, conf: float = 0.25) -> dict:
+    """
+    Compares both detectors on the validation images: recall and precision of the
+    INT8 detections against the float ones, and the mean confidence shift of matches.
+    """
+    matched = float_total = int8_total = 0
+    conf_delta = 0.0
+    for path in val_paths:
+        image = _read_rgb(path)
+        if image is None:
+            continue
+        (float_result,) = float_detector.predict([image], conf=conf)
+        (int8_result,) = int8_detector.predict([image], conf=conf)
+        image_matched, image_float, image_int8, image_delta = compare_detections(
+            float_result.boxes, int8_result.boxes
+        )
+        matched += image_matched
+        float_total += image_float
+        int8_total += image_int8
+        conf_delta += image_delta
+    return {
+        "images": len(val_paths),
+        "recall_vs_float": matched / float_total if float_total else None,
+        "precision_vs_float": matched / int8_total if int8_total else None,
+        "mean_confidence_delta": conf_delta / matched if matched else None,
+    }
+
+
+# --- Entry point -----------------------------------------------------------------------
+
+
+def quantize_models(config: dict) -> dict:
+    """
+    Quantizes every available model and writes quantization_report.json next to them.
+    Returns the report ({model name: metrics}).
+    """
+    from .pipeline import (
+        ACTION_CLASS_MAP_PATH,
+        ACTION_MODEL_PATH,
+        ASSET_CLASS_MAP_PATH,
+        ASSET_MODEL_PATH,
+        YOLO_MODEL_PATH,
+    )
+
+    report = {}
+    cnn_val_dir = os.path.join(
+        config.get("training", {}).get("cnn_data_dir", "assets/cnn_training_data"), "val"
+    )
+    cnn_calibration = _image_files(CNN_CALIBRATION_DIR, CALIBRATION_LIMIT)
+    for name, model_path, class_map_path in (
+        ("asset_classifier", ASSET_MODEL_PATH, ASSET_CLASS_MAP_PATH),
+        ("action_classifier", ACTION_MODEL_PATH, ACTION_CLASS_MAP_PATH),
+    ):
+        if not (os.path.exists(model_path) and os.path.exists(class_map_path)):
+            logger.warning(f"Skipping {name}: {model_path} or its class map is missing.")
+            continue
+        if not cnn_calibration:
+            logger.warning(f"Skipping {name}: no calibration images in {CNN_CALIBRATION_DIR}.")
+            continue
+        try:
+            report[name] = quantize_cnn_file(
+                model_path, class_map_path, cnn_calibration, cnn_val_dir, name
+            )
+        except Exception as e:
+            logger.error(f"Quantization of {name} failed: {e}", exc_info=True)
+
+    yolo_config = config.get("ai", {}).get("yolo", {})
+    imgsz = yolo_config.get("imgsz", 640)
+    yolo_calibration = _image_files(YOLO_CALIBRATION_DIR, CALIBRATION_LIMIT)
+    if not ONNXRUNTIME_AVAILABLE:
+        logger.warning("Skipping YOLO: onnxruntime is not installed.")
+    elif not os.path.exists(YOLO_MODEL_PATH) or not yolo_calibration:
+        logger.warning(f"Skipping YOLO: no weights or no images in {YOLO_CALIBRATION_DIR}.")
+    else:
+        try:
+            int8_path = quantize_yolo(YOLO_MODEL_PATH, yolo_calibration, imgsz)
+            float_path = str(Path(YOLO_MODEL_PATH).with_suffix(".onnx"))
+            report["yolo"] = evaluate_yolo(
+                ONNXRuntimeDetector(float_path, yolo_config.get("cpu_threads"), imgsz),
+                ONNXRuntimeDetector(int8_path, yolo_config.get("cpu_threads"), imgsz),
+                _image_files(YOLO_VALIDATION_DIR),
+                yolo_config.get("confidence_threshold", 0.25),
+            )
+            report["yolo"]["path"] = int8_path
+        except Exception as e:
+            logger.error(f"Quantization of YOLO failed: {e}", exc_info=True)
+
+    for name, metrics in report.items():
+        logger.info(f"{name}: {metrics}")
+    report_path = os.path.join(os.path.dirname(YOLO_MODEL_PATH), REPORT_FILE_NAME)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    logger.info(f"Quantization report saved to {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    from utils.config_loader import load_config
+
+    quantize_models(load_config())
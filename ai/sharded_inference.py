@@ -0,0 +1,118 @@
+# GameMediaTool/ai/sharded_inference.py
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from tools.logger import get_logger
+from .yolo.inference_backends import to_detection_result
+
+logger = get_logger("ShardedInference")
+
+# The Pipeline of the current worker process, created by _init_worker.
+_worker_pipeline = None
+
+
+def _init_worker(ai_config: dict, threads_per_worker: int):
+    global _worker_pipeline
+    import torch
+    from .pipeline import Pipeline
+
+    # Few threads per process: small per-image workloads scale better across processes.
+    torch.set_num_threads(threads_per_worker)
+    cv2.setNumThreads(1)
+    # The worker holds its own model copies and never shards or writes the embedding index.
+    worker_config = {**ai_config, "sharding": {"workers": 0}, "embeddings": {}}
+    _worker_pipeline = Pipeline(None, worker_config)
+    _worker_pipeline.load_models()
+
+
+def _detect_shard(images, batch_size, conf):
+    yolo_model = _worker_pipeline.yolo_model
+    if yolo_model is None:
+        return [None] * len(images)
+    results = yolo_model.predict_batch(images, batch_size=batch_size, conf=conf)
+    return [to_detection_result(result) for result in results]
+
+
+def _classify_shard(images, batch_size, method: str):
+    return getattr(_worker_pipeline, method)(images, batch_size=batch_size)
+
+
+class ShardedInference:
+    """
+    Spreads inference over num_workers processes, each with its own Pipeline
+    (its own YOLO and classifier copies) using threads_per_worker torch threads.
+    Inputs are split into shards of one batch each, the shards run on whichever
+    worker is free and the results are merged back in input order.
+
+    The processes are started on first use and stopped by close().
+    """
+
+    def __init__(self, ai_config: dict, num_workers: int, threads_per_worker: int = 1):
+        self.ai_config = ai_config
+        self.num_workers = max(1, num_workers)
+        self.threads_per_worker = max(1, threads_per_worker or 1)
+        self._executor = None
+
+    @classmethod
+    def from_config(cls, ai_config: dict):
+        """
+        Creates the pool from ai.sharding (workers, threads_per_worker); workers
+        "auto" uses one worker per threads_per_worker cores. Returns None when
+        sharding is disabled (fewer than two workers).
+        """
+        sharding = ai_config.get("sharding", {})
+        threads = max(1, sharding.get("threads_per_worker", 1) or 1)
+        workers = sharding.get("workers", 0)
+        if workers == "auto":
+            workers = (os.cpu_count() or 1) // threads
+        if not workers or workers < 2:
+            return None
+        return cls(ai_config, workers, threads)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            logger.info(
+                f"Starting {self.num_workers} inference worker processes "
+                f"({self.threads_per_worker} thread(s) each)..."
+            )
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                # spawn: workers must not inherit the Qt / torch state of the GUI process.
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.ai_config, self.threads_per_worker),
+            )
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _map(self, function, images, batch_size, *args):
+        batch_size = max(1, int(batch_size or 1))
+        pool = self._pool()
+        futures = [
+            pool.submit(function, list(images[start : start + batch_size]), batch_size, *args)
+            for start in range(0, len(images), batch_size)
+        ]
+        return [future.result() for future in futures]
+
+    def detect(self, images, batch_size=16, conf=None):
+        """Sharded YOLOModel.predict_batch: one DetectionResult (or None) per image."""
+        shards = self._map(_detect_shard, images, batch_size, conf)
+        return [result for shard in shards for result in shard]
+
+    def classify(self, method: str, images, batch_size=32):
+        """
+        Sharded Pipeline.classify_assets / suggest_actions: returns the merged
+        (labels, probabilities) of method over all images.
+        """
+        shards = self._map(_classify_shard, images, batch_size, method)
+        labels = [label for shard_labels, _ in shards for label in shard_labels]
+        probabilities = [shard_probabilities for _, shard_probabilities in shards]
+        return labels, np.concatenate(probabilities) if probabilities else np.zeros((0, 0))
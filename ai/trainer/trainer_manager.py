@@ -143,11 +143,27 @@ class TrainerManager:
                 logger.info(
                     f"Triggering CNN incremental training with data from '{CNN_TRAINING_DIR}'..."
                 )
+                training_config = self.config.get("training", {})
+                cnn_config = self.config.get("ai", {}).get("cnn", {})
                 train_pytorch_model(
                     data_dir=CNN_TRAINING_DIR,
                     model_save_path=CNN_MODEL_SAVE_PATH,
                     map_save_path=CNN_CLASS_MAP_PATH,
                     num_epochs=15,
+                    precompute_features=training_config.get("cnn_precompute_features", True),
+                    feature_augmentations=training_config.get("cnn_feature_augmentations", 2),
+                    # Outside CNN_TRAINING_DIR, which is rebuilt by every split.
+                    feature_cache_dir=training_config.get(
+                        "cnn_feature_cache_dir", "cache/cnn_features"
+                    ),
+                    architecture=cnn_config.get("architecture", "resnet18"),
+                    cache_images=training_config.get("cnn_cache_images", True),
+                    image_cache_dir=training_config.get("cnn_image_cache_dir", "cache/cnn_images"),
+                    loader_options={
+                        "num_workers": training_config.get("cnn_loader_workers", 2),
+                        "persistent_workers": training_config.get("cnn_persistent_workers", True),
+                        "pin_memory": training_config.get("cnn_pin_memory", True),
+                    },
                 )
                 logger.info("CNN Training completed. Model is now updated.")
             except Exception as e:
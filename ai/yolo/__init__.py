@@ -1,3 +1,5 @@
 ﻿# GameMediaTool/ai/yolo/__init__.py
 from .yolo_model import YOLOModel
 from .yolo_utils import detect_objects, get_class_names
+from .detection_store import DetectionStore
+from .detections import Detections
@@ -0,0 +1,103 @@
+# GameMediaTool/ai/yolo/detection_store.py
+
+import os
+import hashlib
+import threading
+
+import numpy as np
+from tools.logger import get_logger
+from utils.file_ops import ensure_folder
+from .detections import Detections
+
+logger = get_logger("DetectionStore")
+
+# Detections are stored down to this confidence, so any query threshold above it is
+# a filter on the stored columns instead of a new inference.
+DEFAULT_CONF_FLOOR = 0.01
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024):
+    """Returns the SHA-1 hex digest of a file's content, or None if it cannot be read."""
+    digest = hashlib.sha1()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    except OSError as e:
+        logger.error(f"Could not hash {path}: {e}")
+        return None
+    return digest.hexdigest()
+
+
+class DetectionStore:
+    """
+    Persistent YOLO detection store keyed by frame content hash and model weights
+    hash. Each frame's detections are saved as a small .npz of columns under
+    store_dir/<weights hash>/<frame hash>.npz and memoized in memory, so
+    re-analysing a session does not run YOLO again. With store_dir=None the store
+    is in-memory only.
+    """
+
+    def __init__(self, store_dir: str = None, conf_floor: float = DEFAULT_CONF_FLOOR):
+        self.store_dir = store_dir
+        self.conf_floor = conf_floor
+        self._memory = {}
+        self._lock = threading.Lock()
+        if self.store_dir:
+            ensure_folder(self.store_dir)
+
+    @classmethod
+    def from_config(cls, yolo_config: dict):
+        """Creates the store from ai.yolo.detection_store_dir / detection_conf_floor."""
+        return cls(
+            yolo_config.get("detection_store_dir"),
+            yolo_config.get("detection_conf_floor", DEFAULT_CONF_FLOOR),
+        )
+
+    def _entry_path(self, model_id: str, frame_hash: str) -> str:
+        return os.path.join(self.store_dir, model_id[:16], f"{frame_hash}.npz")
+
+    def get(self, model_id: str, frame_hash: str):
+        """Returns the Detections of a frame (unnamed), or None if it was never analysed."""
+        key = (model_id, frame_hash)
+        with self._lock:
+            stored = self._memory.get(key)
+        if stored is not None or not self.store_dir:
+            return stored
+
+        entry_path = self._entry_path(model_id, frame_hash)
+        if not os.path.exists(entry_path):
+            return None
+        try:
+            with np.load(entry_path) as entry:
+                stored = Detections.from_columns(
+                    entry["boxes"], entry["confidences"], entry["class_ids"], entry["image_shape"]
+                )
+        except Exception as e:
+            logger.error(f"Corrupt detection store entry {entry_path}: {e}")
+            return None
+        with self._lock:
+            self._memory[key] = stored
+        return stored
+
+    def put(self, model_id: str, frame_hash: str, stored: Detections):
+        with self._lock:
+            self._memory[(model_id, frame_hash)] = stored
+        if not self.store_dir:
+            return
+        entry_path = self._entry_path(model_id, frame_hash)
+        try:
+            ensure_folder(os.path.dirname(entry_path))
+            # Write to a temporary file first so a crash never leaves a truncated entry.
+            temp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                np.savez(
+                    f,
+                    boxes=stored.xyxy,
+                    confidences=stored.conf,
+                    class_ids=stored.cls,
+                    image_shape=np.array(stored.image_shape, dtype=np.int32),
+                )
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            logger.error(f"Could not write detection store entry {entry_path}: {e}")
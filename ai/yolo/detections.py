@@ -0,0 +1,133 @@
+# GameMediaTool/ai/yolo/detections.py
+
+import numpy as np
+
+# One row per box: xyxy pixels, confidence and class id. 22 bytes, where a detection
+# dict with its tuple and floats takes several hundred.
+DETECTION_DTYPE = np.dtype(
+    [("xyxy", np.float32, (4,)), ("conf", np.float32), ("cls", np.int16)]
+)
+
+
+def _to_numpy(values):
+    # ultralytics returns torch tensors, the CPU backends NumPy arrays.
+    return values.cpu().numpy() if hasattr(values, "cpu") else np.asarray(values)
+
+
+class Detections:
+    """
+    The detections of one frame as a structured NumPy array (fields xyxy, conf, cls),
+    with the (height, width) of the frame and the model's class names.
+
+    Filtering (above(), of_classes()) and label-file serialization are vectorized
+    and return new Detections over the kept rows. GUI code that edits boxes works
+    on dict views: to_dicts() (or iterating) gives {"bbox", "label", "confidence"}
+    dicts, as detect_objects used to return.
+    """
+
+    def __init__(self, data=None, image_shape=None, class_names=()):
+        self.data = np.zeros(0, dtype=DETECTION_DTYPE) if data is None else data
+        self.image_shape = None if image_shape is None else tuple(int(v) for v in image_shape[:2])
+        self.class_names = class_names
+
+    @classmethod
+    def from_columns(cls, boxes, confidences, class_ids, image_shape=None, class_names=()):
+        confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        data = np.empty(len(confidences), dtype=DETECTION_DTYPE)
+        data["xyxy"] = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        data["conf"] = confidences
+        data["cls"] = np.asarray(class_ids).reshape(-1)
+        return cls(data, image_shape, class_names)
+
+    @classmethod
+    def from_result(cls, result, image_shape=None, class_names=()):
+        """Builds the array from an ultralytics Results object (or a DetectionResult)."""
+        boxes = result.boxes
+        if image_shape is None:
+            image_shape = getattr(result, "orig_shape", None)
+        if boxes is None or len(boxes) == 0:
+            return cls(None, image_shape, class_names)
+        return cls.from_columns(
+            _to_numpy(boxes.xyxy),
+            _to_numpy(boxes.conf),
+            _to_numpy(boxes.cls),
+            image_shape,
+            class_names,
+        )
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.to_dicts())
+
+    def __repr__(self):
+        return f"Detections({len(self)} boxes, image_shape={self.image_shape})"
+
+    @property
+    def xyxy(self) -> np.ndarray:
+        return self.data["xyxy"]
+
+    @property
+    def conf(self) -> np.ndarray:
+        return self.data["conf"]
+
+    @property
+    def cls(self) -> np.ndarray:
+        return self.data["cls"]
+
+    @property
+    def labels(self) -> list:
+        return [self.class_names[class_id] for class_id in self.cls.tolist()]
+
+    def _subset(self, mask) -> "Detections":
+        return Detections(self.data[mask], self.image_shape, self.class_names)
+
+    def named(self, class_names) -> "Detections":
+        """The same detections (sharing the array) labelled with class_names."""
+        return Detections(self.data, self.image_shape, class_names)
+
+    def above(self, conf_threshold) -> "Detections":
+        """Detections with a confidence strictly above conf_threshold."""
+        return self._subset(self.conf > conf_threshold)
+
+    def of_classes(self, classes) -> "Detections":
+        """Detections of the given classes, given as class ids or names."""
+        names = list(self.class_names)
+        class_ids = [
+            names.index(c) if isinstance(c, str) else int(c)
+            for c in classes
+            if not isinstance(c, str) or c in names
+        ]
+        return self._subset(np.isin(self.cls, class_ids))
+
+    def to_dicts(self) -> list:
+        """Editable detection dicts, one per box."""
+        return [
+            {"bbox": tuple(bbox), "label": label, "confidence": confidence}
+            for bbox, label, confidence in zip(
+                self.xyxy.tolist(), self.labels, self.conf.tolist()
+            )
+        ]
+
+    def to_yolo_labels(self, class_id=None) -> str:
+        """
+        The boxes as YOLO label lines (class x_center y_center width height, normalized
+        by image_shape). class_id overrides the detected class of every box.
+        """
+        if not len(self):
+            return ""
+        h, w = self.image_shape
+        x1, y1, x2, y2 = self.xyxy.astype(np.float64).T
+        columns = np.stack([(x1 + x2) / 2 / w, (y1 + y2) / 2 / h, (x2 - x1) / w, (y2 - y1) / h], 1)
+        class_ids = self.cls if class_id is None else np.full(len(self), class_id)
+        return "".join(
+            f"{int(c)} {xc:.6f} {yc:.6f} {bw:.6f} {bh:.6f}\n"
+            for c, (xc, yc, bw, bh) in zip(class_ids.tolist(), columns.tolist())
+        )
+
+    def write_labels(self, label_path: str, class_id=None) -> str:
+        """Writes to_yolo_labels() to label_path and returns it."""
+        with open(label_path, "w") as f:
+            f.write(self.to_yolo_labels(class_id))
+        return label_path
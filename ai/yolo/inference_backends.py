@@ -0,0 +1,293 @@
+# GameMediaTool/ai/yolo/inference_backends.py
+
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+from tools.logger import get_logger
+
+logger = get_logger("YOLOBackends")
+
+try:
+    import onnxruntime as ort
+
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ort = None
+    ONNXRUNTIME_AVAILABLE = False
+
+try:
+    import openvino as ov
+
+    OPENVINO_AVAILABLE = True
+except ImportError:
+    ov = None
+    OPENVINO_AVAILABLE = False
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+# Same defaults as ultralytics predict().
+DEFAULT_CONF = 0.25
+DEFAULT_IOU = 0.7
+MAX_DET = 300
+LETTERBOX_COLOR = 114
+
+
+class DetectionBoxes:
+    """NumPy stand-in for ultralytics Boxes: xyxy (N, 4), conf (N,) and cls (N,)."""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.conf)
+
+
+class DetectionResult:
+    """Minimal Results object produced by the CPU backends (only .boxes is provided)."""
+
+    def __init__(self, boxes: DetectionBoxes, orig_shape):
+        self.boxes = boxes
+        self.orig_shape = orig_shape
+
+
+def to_detection_result(result):
+    """
+    Converts an ultralytics Results object to a DetectionResult of NumPy arrays,
+    which can be pickled to other processes. DetectionResults and None pass through.
+    """
+    if result is None or isinstance(result, DetectionResult):
+        return result
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        empty = np.empty(0, dtype=np.float32)
+        return DetectionResult(
+            DetectionBoxes(np.empty((0, 4), dtype=np.float32), empty, empty), result.orig_shape
+        )
+    return DetectionResult(
+        DetectionBoxes(
+            boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy()
+        ),
+        result.orig_shape,
+    )
+
+
+def letterbox(image: np.ndarray, size: int):
+    """
+    Resizes an image to fit a size x size square (keeping its aspect ratio) and pads
+    the rest. Returns (padded image, scale, (pad_x, pad_y)).
+    """
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_width, new_height = round(width * scale), round(height * scale)
+    resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (size - new_width) // 2, (size - new_height) // 2
+    padded = cv2.copyMakeBorder(
+        resized,
+        pad_y,
+        size - new_height - pad_y,
+        pad_x,
+        size - new_width - pad_x,
+        cv2.BORDER_CONSTANT,
+        value=(LETTERBOX_COLOR,) * 3,
+    )
+    return padded, scale, (pad_x, pad_y)
+
+
+def postprocess(
+    output: np.ndarray, scale: float, pad, orig_shape, conf: float, iou: float, max_det=MAX_DET
+):
+    """
+    Decodes one YOLOv8 output of shape (4 + num_classes, num_anchors) into a
+    DetectionResult in original image pixels, with per-class NMS. At most max_det
+    detections are kept, the most confident first.
+    """
+    predictions = output.T
+    class_scores = predictions[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    confidences = class_scores[np.arange(len(class_ids)), class_ids]
+    keep = confidences > conf
+    predictions, class_ids, confidences = predictions[keep], class_ids[keep], confidences[keep]
+
+    cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+    xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    if len(xyxy):
+        nms_boxes = np.stack([xyxy[:, 0], xyxy[:, 1], w, h], axis=1)
+        indices = cv2.dnn.NMSBoxesBatched(
+            nms_boxes.tolist(), confidences.tolist(), class_ids.tolist(), conf, iou
+        )
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        indices = indices[np.argsort(-confidences[indices], kind="stable")][:max_det]
+        xyxy, confidences, class_ids = xyxy[indices], confidences[indices], class_ids[indices]
+
+    xyxy = (xyxy - np.array([pad[0], pad[1], pad[0], pad[1]], dtype=np.float32)) / scale
+    orig_height, orig_width = orig_shape[:2]
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, orig_width)
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, orig_height)
+    return DetectionResult(
+        DetectionBoxes(
+            xyxy.astype(np.float32), confidences.astype(np.float32), class_ids.astype(np.float32)
+        ),
+        orig_shape,
+    )
+
+
+class CPUDetector:
+    """
+    Runs an exported YOLOv8 detector on the CPU. Subclasses provide _infer(batch),
+    which maps a float32 NCHW batch to the raw (N, 4 + num_classes, anchors) output.
+    """
+
+    name = "cpu"
+
+    def __init__(self, imgsz: int = 640):
+        self.imgsz = imgsz
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def predict(self, images, conf: float = None, iou: float = DEFAULT_IOU, max_det=MAX_DET):
+        """
+        Detects objects in a list of images. Returns one DetectionResult per image.
+        Like ultralytics YOLO.predict, NumPy images are taken as BGR and flipped to
+        RGB, so the torch and CPU backends feed the network the same input.
+        """
+        conf = DEFAULT_CONF if conf is None else conf
+        prepared = [letterbox(image, self.imgsz) for image in images]
+        batch = np.stack([padded for padded, _, _ in prepared])[..., ::-1]
+        batch = batch.transpose(0, 3, 1, 2).astype(np.float32) / 255.0
+        outputs = self._infer(np.ascontiguousarray(batch))
+        return [
+            postprocess(output, scale, pad, image.shape, conf, iou, max_det)
+            for output, image, (_, scale, pad) in zip(outputs, images, prepared)
+        ]
+
+
+class ONNXRuntimeDetector(CPUDetector):
+    name = "onnx"
+
+    def __init__(self, onnx_path: str, num_threads: int = None, imgsz: int = 640, name=None):
+        super().__init__(imgsz)
+        self.name = name or self.name
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            onnx_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        logger.info(
+            f"ONNX Runtime detector loaded from {onnx_path} "
+            f"({options.intra_op_num_threads} intra-op threads)."
+        )
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINODetector(CPUDetector):
+    name = "openvino"
+
+    def __init__(self, xml_path: str, num_threads: int = None, imgsz: int = 640):
+        super().__init__(imgsz)
+        config = {"PERFORMANCE_HINT": "THROUGHPUT"}
+        if num_threads:
+            config["INFERENCE_NUM_THREADS"] = num_threads
+        self.compiled = ov.Core().compile_model(xml_path, "CPU", config)
+        logger.info(f"OpenVINO detector loaded from {xml_path}.")
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        return self.compiled(batch)[self.compiled.output(0)]
+
+
+def yolo_int8_path(weights_path: str) -> str:
+    """Path of the INT8 ONNX variant of a detector (see ai.quantization)."""
+    return str(Path(weights_path).with_name(f"{Path(weights_path).stem}_int8.onnx"))
+
+
+def _is_stale(exported_path: Path, weights_path: Path) -> bool:
+    if not exported_path.exists():
+        return True
+    # Weights that are not a local file (e.g. "yolov8n.pt" resolved by ultralytics) cannot
+    # be newer than an export that already exists.
+    if not weights_path.is_file():
+        return False
+    return exported_path.stat().st_mtime < weights_path.stat().st_mtime
+
+
+def export_model(yolo, weights_path: str, backend: str, imgsz: int = 640) -> str:
+    """
+    Exports the ultralytics model to ONNX or OpenVINO IR next to its weights, once.
+    A cached export is reused until the weights file is newer. Returns its path.
+    """
+    # ultralytics resolves (and downloads) bare names like "yolov8n.pt" itself and
+    # exports next to the checkpoint it actually loaded.
+    ckpt_path = getattr(yolo, "ckpt_path", None)
+    weights = Path(ckpt_path if isinstance(ckpt_path, str) else weights_path)
+    if backend == "onnx":
+        exported = weights.with_suffix(".onnx")
+        export_format = "onnx"
+    else:
+        exported = weights.parent / f"{weights.stem}_openvino_model" / f"{weights.stem}.xml"
+        export_format = "openvino"
+
+    if not _is_stale(exported, weights):
+        return str(exported)
+
+    logger.info(f"Exporting {weights_path} to {export_format} (one-off)...")
+    result = yolo.export(format=export_format, imgsz=imgsz, dynamic=True)
+    if backend == "openvino":
+        result = str(Path(result) / f"{weights.stem}.xml")
+    return str(result)
+
+
+def create_cpu_detector(
+    backend: str, yolo, weights_path: str, num_threads=None, imgsz=640, precision="fp32"
+):
+    """
+    Returns a CPUDetector for backend ("onnx" or "openvino"), exporting the model on
+    first use, or None if the backend is "torch" or cannot be used (the caller then
+    keeps the ultralytics PyTorch path).
+
+    With precision "int8", the quantized ONNX model (written by ai.quantization) runs
+    on onnxruntime whatever the backend; without one, the float model is used.
+    """
+    if precision == "int8":
+        int8_path = yolo_int8_path(weights_path)
+        if ONNXRUNTIME_AVAILABLE and os.path.exists(int8_path):
+            try:
+                return ONNXRuntimeDetector(int8_path, num_threads, imgsz, name="onnx-int8")
+            except Exception as e:
+                logger.error(f"Could not load INT8 YOLO model {int8_path}: {e}", exc_info=True)
+        logger.warning(
+            f"INT8 YOLO model {int8_path} is unavailable (run python -m ai.quantization "
+            "with onnxruntime installed); using the float model."
+        )
+
+    if backend == "torch":
+        return None
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown YOLO backend '{backend}', falling back to torch.")
+        return None
+    if backend == "onnx" and not ONNXRUNTIME_AVAILABLE:
+        logger.warning("onnxruntime is not installed, falling back to the torch YOLO backend.")
+        return None
+    if backend == "openvino" and not OPENVINO_AVAILABLE:
+        logger.warning("openvino is not installed, falling back to the torch YOLO backend.")
+        return None
+
+    try:
+        exported_path = export_model(yolo, weights_path, backend, imgsz)
+        if backend == "onnx":
+            return ONNXRuntimeDetector(exported_path, num_threads, imgsz)
+        return OpenVINODetector(exported_path, num_threads, imgsz)
+    except Exception as e:
+        logger.error(
+            f"Could not set up the {backend} YOLO backend, using torch: {e}", exc_info=True
+        )
+        return None
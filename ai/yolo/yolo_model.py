@@ -5,6 +5,8 @@ from tools.logger import get_logger
 from pathlib import Path
 import cv2
 import json
+import hashlib
+from .inference_backends import create_cpu_detector
 
 logger = get_logger("YOLOModel")
 
@@ -13,10 +15,21 @@ YOLO_WEIGHTS_PATH = "ai/models/best.pt"
 
 
 class YOLOModel:
-    def __init__(self, model_path):
+    # ShardedInference set by the Pipeline when ai.sharding is enabled.
+    shards = None
+
+    def __init__(self, model_path, backend="torch", num_threads=None, imgsz=640, precision="fp32"):
         """
         Initializes and loads the YOLO model from the given path.
+
+        backend selects the inference engine: "torch" (ultralytics), or "onnx" /
+        "openvino" for CPU inference on a model exported once next to the weights,
+        using num_threads threads. Unavailable backends fall back to torch. precision
+        "int8" loads the quantized model written by ai.quantization when it exists.
         """
+        self.weights_path = model_path
+        self._weights_id = None
+        self.detector = None
         try:
             # التحقق من وجود ملف الأوزان قبل التحميل
             if not Path(model_path).exists():
@@ -24,13 +37,19 @@ class YOLOModel:
                 logger.warning(
                     f"YOLO weights not found at {model_path}. Initializing with 'yolov8n.pt' and will save the best model to this path after training."
                 )
-                self.model = YOLO("yolov8n.pt")  # نموذج نانو مُدرب مسبقاً للبدء منه
+                self.weights_path = "yolov8n.pt"
+                self.model = YOLO(self.weights_path)  # نموذج نانو مُدرب مسبقاً للبدء منه
             else:
+                self.weights_path = model_path
                 self.model = YOLO(model_path)
 
             self.class_names = list(self.model.names.values())
+            self.detector = create_cpu_detector(
+                backend, self.model, self.weights_path, num_threads, imgsz, precision
+            )
             logger.info(
-                f"YOLO model loaded from {model_path} with {len(self.class_names)} classes."
+                f"YOLO model loaded from {model_path} with {len(self.class_names)} classes "
+                f"(backend: {self.backend})."
             )
             logger.debug(f"Available YOLO classes: {self.class_names}")
         except Exception as e:
@@ -46,11 +65,76 @@ class YOLOModel:
 
         try:
             # هنا نفترض أن image هو NumPy array بترميز RGB
+            if self.detector is not None:
+                return self.detector.predict([image])
             return self.model(image, verbose=False)
         except Exception as e:
             logger.error(f"An error occurred during YOLO prediction: {e}", exc_info=True)
             return None
 
+    @property
+    def backend(self):
+        return self.detector.name if self.detector is not None else "torch"
+
+    @property
+    def weights_id(self):
+        """
+        SHA-1 of the weights file (or of its name for downloaded weights) and the
+        inference backend, computed once. Identifies this model's detections.
+        """
+        if self._weights_id is None:
+            digest = hashlib.sha1()
+            path = Path(self.weights_path)
+            if path.is_file():
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        digest.update(chunk)
+            else:
+                digest.update(str(self.weights_path).encode("utf-8"))
+            digest.update(self.backend.encode("utf-8"))
+            self._weights_id = digest.hexdigest()
+        return self._weights_id
+
+    def predict_batch(self, images, batch_size=16, conf=None):
+        """
+        Runs detection on a list of RGB images, batch_size images per forward pass.
+        conf overrides the model's minimum confidence (0.25 by default in ultralytics).
+
+        Returns:
+            list: One ultralytics Results object per image, in input order. Images of a
+            batch that failed get None.
+        """
+        if self.model is None:
+            logger.error("YOLO model is not loaded, cannot perform prediction.")
+            return [None] * len(images)
+
+        batch_size = max(1, int(batch_size or 1))
+        if self.shards is not None and len(images) > batch_size:
+            try:
+                return self.shards.detect(images, batch_size, conf)
+            except Exception as e:
+                logger.error(
+                    f"Sharded YOLO inference failed, running in-process: {e}", exc_info=True
+                )
+
+        options = {"verbose": False}
+        if conf is not None:
+            options["conf"] = conf
+        results = []
+        for start in range(0, len(images), batch_size):
+            batch = list(images[start : start + batch_size])
+            try:
+                if self.detector is not None:
+                    results.extend(self.detector.predict(batch, conf=conf))
+                else:
+                    results.extend(self.model(batch, **options))
+            except Exception as e:
+                logger.error(
+                    f"An error occurred during batched YOLO prediction: {e}", exc_info=True
+                )
+                results.extend([None] * len(batch))
+        return results
+
     @staticmethod
     def train(data_path: str, model_save_path: str):
         """
@@ -2,21 +2,92 @@
 import json
 from pathlib import Path
 from tools.logger import get_logger
+from .detection_store import file_digest
+from .detections import Detections
 
 logger = get_logger("YOLO Utils")
 
 
+def parse_detections(result, class_names, conf_threshold=0.25):
+    """Converts one ultralytics Results object into Detections above conf_threshold."""
+    return Detections.from_result(result, class_names=class_names).above(conf_threshold)
+
+
+class PreparedFrame:
+    """A frame ready for detection: its content hash and either stored detections or RGB pixels."""
+
+    def __init__(self, frame_hash, stored=None, rgb=None):
+        self.frame_hash = frame_hash
+        self.stored = stored
+        self.rgb = rgb
+
+
+def prepare_frame(frame_path, model, store, frame_loader) -> PreparedFrame:
+    """
+    Does the I/O-bound part of detecting a frame: hashes the file, looks it up in the
+    DetectionStore and, if it is not stored, decodes it via frame_loader and converts
+    it to RGB. Safe to run on loader threads ahead of inference.
+    """
+    frame_hash = file_digest(frame_path)
+    if not frame_hash:
+        return PreparedFrame(None)
+    stored = store.get(model.weights_id, frame_hash)
+    if stored is not None:
+        return PreparedFrame(frame_hash, stored=stored)
+    image = frame_loader.load(frame_path)
+    if image is None:
+        return PreparedFrame(None)
+    # The YOLO model expects RGB, OpenCV decodes to BGR.
+    return PreparedFrame(frame_hash, rgb=cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+
+def detect_prepared(prepared_frames, model, store, conf_threshold=0.25, batch_size=16):
+    """
+    Runs batched detection on the prepared frames that are not stored yet, down to the
+    store's confidence floor, and stores them. conf_threshold is applied at query time.
+
+    Returns:
+        list: One (Detections, image_shape) pair per frame, in input order.
+            image_shape is None (and the Detections empty) for unreadable frames.
+    """
+    missing = [frame for frame in prepared_frames if frame.stored is None and frame.rgb is not None]
+    if missing:
+        try:
+            results = model.predict_batch(
+                [frame.rgb for frame in missing], batch_size=batch_size, conf=store.conf_floor
+            )
+        except Exception as e:
+            logger.error(f"Error during batched YOLO detection: {e}", exc_info=True)
+            results = [None] * len(missing)
+        for frame, result in zip(missing, results):
+            if result is not None:
+                frame.stored = Detections.from_result(result, frame.rgb.shape)
+                store.put(model.weights_id, frame.frame_hash, frame.stored)
+            frame.rgb = None
+        logger.debug(
+            f"Ran YOLO on {len(missing)} frame(s), {len(prepared_frames) - len(missing)} stored."
+        )
+
+    return [
+        (frame.stored.named(model.class_names).above(conf_threshold), frame.stored.image_shape)
+        if frame.stored is not None
+        else (Detections(class_names=model.class_names), None)
+        for frame in prepared_frames
+    ]
+
+
 def detect_objects(image_path, model, conf_threshold=0.25):
+    """Detects objects in an image file. Returns Detections (empty on errors)."""
     if model is None:
         logger.error("YOLO model not provided to detect_objects function.")
-        return []
+        return Detections()
 
-    detections = []
+    detections = Detections()
     try:
         image = cv2.imread(image_path)
         if image is None:
             logger.error(f"Could not read image file: {image_path}")
-            return []
+            return detections
 
         # [CRUCIAL FIX] Convert the image from BGR (OpenCV's default) to RGB
         # (YOLO model typically expects RGB for correct color interpretation)
@@ -24,22 +95,12 @@ def detect_objects(image_path, model, conf_threshold=0.25):
 
         results = model.predict(image_rgb)
 
-        if results is None:
-            return []
-
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                confidence = float(box.conf)
-                if confidence > conf_threshold:
-                    class_id = int(box.cls)
-                    label = model.class_names[class_id]
-                    # box.xyxy[0] يعطي الإحداثيات مباشرة بالبكسل (x1, y1, x2, y2)
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-
-                    detections.append(
-                        {"bbox": (x1, y1, x2, y2), "label": label, "confidence": confidence}
-                    )
+        if not results:
+            return detections
+
+        # predict() returns a one-element list for the single image.
+        detections = Detections.from_result(results[0], image_rgb.shape, model.class_names)
+        detections = detections.above(conf_threshold)
 
     except Exception as e:
         logger.error(f"Error during YOLO detection: {e}", exc_info=True)
@@ -17,4 +17,5 @@ from .workers import (
     FinalProcessorWorker,
     ExportWorker,
     VideoSplitterWorker,
+    ModelLoaderWorker,
 )
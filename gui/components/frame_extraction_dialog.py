@@ -9,12 +9,26 @@ from PySide6.QtWidgets import (
     QDoubleSpinBox,
     QSpinBox,
     QGroupBox,
+    QComboBox,
 )
 from PySide6.QtCore import Qt
 
 
 class FrameExtractionDialog(QDialog):
-    def __init__(self, parent=None, default_interval=2, default_threshold=60.0):
+    SAMPLING_MODES = [
+        ("Fixed Interval", "interval"),
+        ("Scene Changes", "scene"),
+        ("Keyframes Only (fastest)", "keyframes"),
+    ]
+
+    def __init__(
+        self,
+        parent=None,
+        default_interval=2,
+        default_threshold=60.0,
+        default_mode="interval",
+        default_scene_threshold=0.3,
+    ):
         super().__init__(parent)
         self.setWindowTitle("Frame Extraction Settings")
         self.setMinimumWidth(350)
@@ -44,6 +58,31 @@ class FrameExtractionDialog(QDialog):
         )
         grid_layout.addWidget(self.threshold_spinbox, 1, 1)
 
+        # --- Sampling Mode ---
+        grid_layout.addWidget(QLabel("<b>Sampling Mode:</b>"), 2, 0)
+        self.mode_combo = QComboBox()
+        for label, mode in self.SAMPLING_MODES:
+            self.mode_combo.addItem(label, mode)
+        mode_index = self.mode_combo.findData(default_mode)
+        self.mode_combo.setCurrentIndex(mode_index if mode_index >= 0 else 0)
+        self.mode_combo.setToolTip(
+            "Fixed Interval decodes the whole video. Scene Changes grabs a frame on each new shot. "
+            "Keyframes Only skips most decoding and is much faster on long, static videos."
+        )
+        grid_layout.addWidget(self.mode_combo, 2, 1)
+
+        # --- Scene Threshold (Scene Changes mode) ---
+        grid_layout.addWidget(QLabel("<b>Scene Change Threshold:</b>"), 3, 0)
+        self.scene_spinbox = QDoubleSpinBox()
+        self.scene_spinbox.setRange(0.05, 1.0)
+        self.scene_spinbox.setSingleStep(0.05)
+        self.scene_spinbox.setValue(default_scene_threshold)
+        self.scene_spinbox.setToolTip("Smaller number = MORE scene changes detected.")
+        grid_layout.addWidget(self.scene_spinbox, 3, 1)
+
+        self.mode_combo.currentIndexChanged.connect(self._update_mode_controls)
+        self._update_mode_controls()
+
         layout.addWidget(main_group)
 
         button_box = QDialogButtonBox(
@@ -53,9 +92,16 @@ class FrameExtractionDialog(QDialog):
         button_box.rejected.connect(self.reject)
         layout.addWidget(button_box)
 
+    def _update_mode_controls(self):
+        mode = self.mode_combo.currentData()
+        self.interval_spinbox.setEnabled(mode == "interval")
+        self.scene_spinbox.setEnabled(mode == "scene")
+
     def get_settings(self):
         """Returns the selected settings as a dictionary."""
         return {
             "interval_seconds": self.interval_spinbox.value(),
             "blur_threshold": self.threshold_spinbox.value(),
+            "sampling_mode": self.mode_combo.currentData(),
+            "scene_threshold": self.scene_spinbox.value(),
         }
@@ -20,7 +20,7 @@ from PySide6.QtWidgets import (
     QFrame,
     QToolBar,
 )
-from PySide6.QtCore import Qt, Signal, QSize, QRect
+from PySide6.QtCore import Qt, Signal, QSize, QRect, QThread
 from PySide6.QtGui import QPixmap, QPainter, QPen, QColor, QAction
 
 try:
@@ -31,6 +31,7 @@ except ImportError:
     QTAWESOME_LOADED = False
 
 from .image_viewer_widget import ImageViewerWidget
+from .workers import SimilarAssetWorker
 from utils.file_ops import sanitize_filename, ensure_folder
 from tools.logger import get_logger
 
@@ -104,7 +105,8 @@ class ImageWorkshopPanel(QWidget):
     def __init__(self, main_window, parent=None):
         super().__init__(parent)
         self.main_window = main_window
-        self.yolo_labels = self.main_window.pipeline.yolo_model.class_names if self.main_window.pipeline.yolo_model else []
+        # Filled by set_yolo_labels once the models are loaded (see MainWindow.models_ready).
+        self.yolo_labels = []
         self.yolo_results_cache = {}
         # [FIX] تغيير اسم البفر ليعكس أنه يمسك البيانات لكل إطار
         self.frame_tag_buffer = {}  # Key: frame_path, Value: list of tagged_items
@@ -113,6 +115,9 @@ class ImageWorkshopPanel(QWidget):
         self.current_frame_path = None
         self.current_selected_detection = None
         self.current_source_key = "unknown"
+        # Running similar-asset lookups; only the result of the latest request is shown.
+        self._similarity_checks = {}
+        self._similarity_request = 0
 
         self.color_map = {
             "person": QColor(220, 220, 220, 100),
@@ -124,10 +129,20 @@ class ImageWorkshopPanel(QWidget):
             "panty": QColor(155, 89, 182, 200),
             "default": QColor(0, 255, 255, 150),
         }
-        self.init_colors_from_yolo()
 
         self._setup_ui()
         self._connect_signals()
+        if self.main_window.pipeline.models_loaded:
+            self.set_yolo_labels()
+        else:
+            self.main_window.models_ready.connect(lambda _: self.set_yolo_labels())
+
+    def set_yolo_labels(self):
+        yolo_model = self.main_window.pipeline.yolo_model
+        self.yolo_labels = yolo_model.class_names if yolo_model else []
+        self.init_colors_from_yolo()
+        self.yolo_override_combo.clear()
+        self.yolo_override_combo.addItems(sorted(self.yolo_labels))
 
     def init_colors_from_yolo(self):
         for label in self.yolo_labels:
@@ -303,7 +318,7 @@ class ImageWorkshopPanel(QWidget):
 
         if detection_id and new_bbox:
             path = self.current_frame_path
-            detections = self.yolo_results_cache.get(path, {}).get('detections', [])
+            detections = self._frame_detections(path)
 
             for d in detections:
                 if d.get("id") == detection_id:
@@ -322,7 +337,7 @@ class ImageWorkshopPanel(QWidget):
             )
             if reply == QMessageBox.StandardButton.Yes:
                 path = self.current_frame_path
-                detections = self.yolo_results_cache.get(path, {}).get('detections', [])
+                detections = self._frame_detections(path)
                 id_to_delete = detection_to_delete.get("id")
 
                 if id_to_delete:
@@ -365,7 +380,7 @@ class ImageWorkshopPanel(QWidget):
 
         if detection_id:
             path = self.current_frame_path
-            detections = self.yolo_results_cache.get(path, {}).get('detections', [])
+            detections = self._frame_detections(path)
 
             # إزالة من قائمة YOLO الأصلية
             self.yolo_results_cache[path]['detections'] = [d for d in detections if d.get("id") != detection_id]
@@ -404,17 +419,23 @@ class ImageWorkshopPanel(QWidget):
                 "confidence": 1.0,
                 "manual": True,
             }
-            # يجب التأكد من وجود current_frame_path في cache
-            if self.current_frame_path not in self.yolo_results_cache:
-                self.yolo_results_cache[self.current_frame_path] = {'detections': [], 'label_path': None}
-
-            self.yolo_results_cache[self.current_frame_path]['detections'].append(new_detection)
+            self._frame_detections(self.current_frame_path).append(new_detection)
 
             self._display_current_frame()
             self._on_box_clicked(new_detection)
 
         self._on_select_mode_clicked()
 
+    def _frame_detections(self, path) -> list:
+        """
+        The editable detection dicts of a frame. YOLOWorker delivers compact Detections
+        arrays; they are turned into dicts only for the frames that are opened.
+        """
+        entry = self.yolo_results_cache.setdefault(path, {"detections": [], "label_path": None})
+        if not isinstance(entry["detections"], list):
+            entry["detections"] = entry["detections"].to_dicts()
+        return entry["detections"]
+
     def load_data(self, frame_paths, yolo_results, tasks):
         self.yolo_results_cache = yolo_results
         self.frame_tag_buffer = {path: [] for path in frame_paths}  # إعادة تهيئة البفر لكل إطار
@@ -456,7 +477,7 @@ class ImageWorkshopPanel(QWidget):
         self.prev_frame_button.setEnabled(self.current_frame_index > 0)
         self.next_frame_button.setEnabled(self.current_frame_index < len(self.frame_paths) - 1)
 
-        detections = self.yolo_results_cache.get(self.current_frame_path, {}).get('detections', [])
+        detections = self._frame_detections(self.current_frame_path)
         self.image_viewer.clear_boxes()
 
         for det in detections:
@@ -515,12 +536,15 @@ class ImageWorkshopPanel(QWidget):
             cropped_image = full_image[y1:y2, x1:x2]
 
             # التأكد من صحة التنسيق هنا
-            if (
+            if not self.main_window.pipeline.models_loaded:
+                cnn_suggestion = "(models loading)"
+            elif (
                 cropped_image.size > 0
                 and hasattr(self.main_window.pipeline, "classify_asset")
                 and self.main_window.pipeline.classify_asset
             ):
                 cnn_suggestion = self.main_window.pipeline.classify_asset(cropped_image)
+                self._flag_similar_asset(cropped_image)
 
             logger.info(f"CNN suggested: '{cnn_suggestion}' for YOLO label '{current_yolo_label}'")
         except Exception as e:
@@ -532,6 +556,37 @@ class ImageWorkshopPanel(QWidget):
 
         self._load_existing_tags(detection)
 
+    def _flag_similar_asset(self, cropped_image):
+        """
+        Looks the crop up in the embedding index on a worker thread; the status bar
+        warns if it is nearly identical to an asset already collected.
+        """
+        self._similarity_request += 1
+        request_id = self._similarity_request
+        thread = QThread(self)
+        worker = SimilarAssetWorker(self.main_window.pipeline, cropped_image, request_id)
+        worker.moveToThread(thread)
+        self._similarity_checks[request_id] = (thread, worker)
+
+        worker.finished.connect(self._on_similar_asset_checked)
+        worker.finished.connect(thread.quit)
+        worker.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(lambda: self._similarity_checks.pop(request_id, None))
+        thread.started.connect(worker.run)
+        thread.start()
+
+    def _on_similar_asset_checked(self, request_id, match):
+        # A newer selection has started its own lookup.
+        if request_id != self._similarity_request:
+            return
+        if match is not None:
+            key, similarity = match
+            logger.info(f"Selected item looks like collected asset '{key}' ({similarity:.3f})")
+            self.main_window.statusBar().showMessage(
+                f"Possible duplicate of collected asset '{key}' (similarity {similarity:.2f})", 8000
+            )
+
     def _load_existing_tags(self, detection_data: dict):
 
         self._reset_tagging_ui()
@@ -823,6 +878,7 @@ class ImageWorkshopPanel(QWidget):
         missing_tags_count = 0
 
         for path in self.frame_paths:
+            # Unopened frames still hold Detections, whose iteration yields dicts.
             yolo_dets = self.yolo_results_cache.get(path, {}).get('detections', [])
             confirmed_tags = self.frame_tag_buffer.get(path, [])
 
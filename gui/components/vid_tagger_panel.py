@@ -279,9 +279,14 @@ class VidTaggerPanel(QWidget):
     def load_clips(self, clips_data_with_ai: dict):
         self.clips_data = clips_data_with_ai
         self.clips_list_widget.clear()
-        for path in self.clips_data.keys():
+        for path, data in self.clips_data.items():
             item = QListWidgetItem(os.path.basename(path))
             item.setData(Qt.UserRole, path)
+            suggestion = data.get("ai_suggestion", "unknown")
+            if suggestion not in ("unknown", "unknown_action"):
+                confidence = data.get("ai_confidence", 0.0)
+                item.setText(f"{os.path.basename(path)}  [AI: {suggestion} {confidence:.0%}]")
+                item.setToolTip(f"Suggested action: {suggestion} (confidence {confidence:.0%})")
             self.clips_list_widget.addItem(item)
         if self.clips_list_widget.count() > 0:
             self.clips_list_widget.setCurrentRow(0)
@@ -2,81 +2,199 @@
 
 import os
 import shutil
+import threading
 import cv2
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from PySide6.QtCore import QObject, Signal, QProcess, QProcessEnvironment, QTimer
 
 from tools.frame_extractor import extract_frames
-from tools.video_splitter import get_ffmpeg_split_commands
+from tools.video_splitter import get_ffmpeg_split_commands, sample_clip_frames
 from tools.logger import get_logger
+from tools.ffmpeg_runner import FFmpegProgressParser
+from tools.frame_loader import FrameLoader
+from tools.prefetch import PrefetchPipeline
 from utils.file_ops import sanitize_filename, ensure_folder
 from tools import media_exporter
 from tools.background_remover import remove_background
-from ai.yolo.yolo_utils import detect_objects
+from ai.yolo.yolo_utils import prepare_frame, detect_prepared
+from ai.yolo.detection_store import DetectionStore
+from ai.sharded_inference import ShardedInference
 
 logger = get_logger("Workers")
 
+# Size the sampled frames of a split clip are kept at for action suggestion (the classifier input).
+CLIP_FRAME_SIZE = (224, 224)
+# Clips whose sampled frames are classified together, bounding the frames held in memory.
+CLIPS_PER_ACTION_BATCH = 16
+
 
 class FrameExtractorWorker(QObject):
     progress = Signal(int)
+    stats = Signal(dict)
     finished = Signal(list)
 
-    def __init__(self, video_paths, output_folder, blur_threshold=60.0, interval_seconds=2):
+    def __init__(
+        self,
+        video_paths,
+        output_folder,
+        blur_threshold=60.0,
+        interval_seconds=2,
+        streaming=False,
+        score_workers=None,
+        sharpness_proxy_width=None,
+        sampling_mode="interval",
+        scene_threshold=0.3,
+        dedup_distance=None,
+        max_parallel_clips=1,
+        cache_dir=None,
+        cache_score_floor=None,
+        selection_mode="threshold",
+        top_k=3,
+        window_seconds=10.0,
+    ):
         super().__init__()
         self.video_paths = video_paths if isinstance(video_paths, list) else [video_paths]
         self.output_folder = output_folder
         self.blur_threshold = blur_threshold
         self.interval_seconds = interval_seconds
+        self.streaming = streaming
+        self.score_workers = score_workers
+        self.sharpness_proxy_width = sharpness_proxy_width
+        self.sampling_mode = sampling_mode
+        self.scene_threshold = scene_threshold
+        self.dedup_distance = dedup_distance
+        self.max_parallel_clips = max(1, max_parallel_clips or 1)
+        self.cache_dir = cache_dir
+        self.cache_score_floor = cache_score_floor
+        self.selection_mode = selection_mode
+        self.top_k = top_k
+        self.window_seconds = window_seconds
         self.is_running = True
+        self._progress_lock = threading.Lock()
+        self._clip_progress = []
 
     def run(self):
-        all_extracted_frames = []
         total_videos = len(self.video_paths)
         if total_videos == 0:
             if self.is_running:
                 self.finished.emit([])
             return
 
-        for i, video_path in enumerate(self.video_paths):
-            if not self.is_running:
-                break
+        self._clip_progress = [0] * total_videos
+        parallel_clips = min(self.max_parallel_clips, total_videos)
+        # Split the cores between the concurrent clips unless a thread count was configured.
+        score_workers = self.score_workers or max(1, (os.cpu_count() or 1) // parallel_clips)
+        logger.info(
+            f"Extracting frames from {total_videos} clip(s), {parallel_clips} at a time "
+            f"with {score_workers} scoring thread(s) each."
+        )
+
+        with ThreadPoolExecutor(
+            max_workers=parallel_clips, thread_name_prefix="ClipExtractor"
+        ) as executor:
+            futures = [
+                executor.submit(self._extract_clip, i, video_path, score_workers)
+                for i, video_path in enumerate(self.video_paths)
+            ]
+            results = [future.result() for future in futures]
 
-            logger.info(f"Worker starting frame extraction for clip {i + 1}/{total_videos}")
+        all_extracted_frames = [frame for frames in results for frame in frames]
+
+        if self.is_running:
+            self.progress.emit(100)
+            self.finished.emit(all_extracted_frames)
 
-            def progress_handler(sub_progress):
-                overall_progress = int(((i * 100) + sub_progress) / total_videos)
-                self.progress.emit(overall_progress)
+    def _extract_clip(self, index, video_path, score_workers):
+        if not self.is_running:
+            return []
 
-            frames = extract_frames(
+        logger.info(
+            f"Worker starting frame extraction for clip {index + 1}/{len(self.video_paths)}"
+        )
+
+        def progress_handler(sub_progress):
+            self._update_progress(index, sub_progress)
+
+        def stats_handler(stats):
+            self.stats.emit({**stats, "clip_index": index})
+
+        try:
+            return extract_frames(
                 video_path=video_path,
                 output_folder=self.output_folder,
                 progress_callback=progress_handler,
                 blur_threshold=self.blur_threshold,
                 interval_seconds=self.interval_seconds,
+                streaming=self.streaming,
+                score_workers=score_workers,
+                sharpness_proxy_width=self.sharpness_proxy_width,
+                sampling_mode=self.sampling_mode,
+                scene_threshold=self.scene_threshold,
+                dedup_distance=self.dedup_distance,
+                cache_dir=self.cache_dir,
+                cache_score_floor=self.cache_score_floor,
+                stats_callback=stats_handler,
+                selection_mode=self.selection_mode,
+                top_k=self.top_k,
+                window_seconds=self.window_seconds,
             )
-            all_extracted_frames.extend(frames)
-
-        if self.is_running:
-            self.progress.emit(100)
-            self.finished.emit(all_extracted_frames)
+        except Exception as e:
+            logger.error(f"Frame extraction failed for {video_path}: {e}", exc_info=True)
+            return []
+        finally:
+            self._update_progress(index, 100)
+
+    def _update_progress(self, index, sub_progress):
+        """Merges per-clip progress into a single overall percentage."""
+        with self._progress_lock:
+            self._clip_progress[index] = sub_progress
+            overall_progress = int(sum(self._clip_progress) / len(self._clip_progress))
+        self.progress.emit(overall_progress)
 
     def stop(self):
         self.is_running = False
 
 
+def _write_yolo_labels(frame_path, detections):
+    """Writes Detections as a YOLO label file next to the frame and returns its path."""
+    label_path = os.path.splitext(frame_path)[0] + ".txt"
+    # Assume class 0 for detection
+    return detections.write_labels(label_path, class_id=0)
+
+
 class YOLOWorker(QObject):
     progress = Signal(int)
+    stats = Signal(dict)
     finished = Signal(dict)
 
-    def __init__(self, pipeline, frame_paths):
+    def __init__(
+        self,
+        pipeline,
+        frame_paths,
+        batch_size=16,
+        conf_threshold=0.25,
+        frame_loader=None,
+        detection_store=None,
+        decode_workers=None,
+        prefetch_frames=32,
+    ):
         super().__init__()
         self.pipeline = pipeline
         self.frame_paths = frame_paths
+        self.batch_size = max(1, batch_size or 1)
+        # The detections shown; the store keeps them down to its (lower) confidence floor.
+        self.conf_threshold = conf_threshold
+        # Loader threads hash, look up and decode frames ahead of inference.
+        self.decode_workers = decode_workers
+        self.prefetch_frames = max(self.batch_size, prefetch_frames or 0)
+        # Shared with FinalProcessorWorker, so each frame is decoded only once.
+        self.frame_loader = frame_loader or FrameLoader()
+        # Detections are stored below conf_threshold, so re-analysis with any threshold is a lookup.
+        self.detection_store = detection_store or DetectionStore()
         self.is_running = True
 
     def run(self):
-        import cv2
-        import os
         yolo_results = {}
         total_frames = len(self.frame_paths)
         if total_frames == 0:
@@ -92,38 +210,62 @@ class YOLOWorker(QObject):
                 self.finished.emit({})
             return
 
-        for i, frame_path in enumerate(self.frame_paths):
-            if not self.is_running:
-                logger.warning("YOLO worker was stopped prematurely.")
-                break
+        def load(frame_path):
+            return prepare_frame(
+                frame_path, yolo_model_instance, self.detection_store, self.frame_loader
+            )
+
+        # With sharded inference, each call carries one batch per worker process so the
+        # batches run side by side instead of one at a time.
+        shards = getattr(yolo_model_instance, "shards", None)
+        num_shards = shards.num_workers if isinstance(shards, ShardedInference) else 1
+        chunk_size = self.batch_size * num_shards
+        queue_size = max(self.prefetch_frames, chunk_size)
+
+        done = 0
+        with PrefetchPipeline(load, self.decode_workers, queue_size) as prefetch:
+            for batch in prefetch.batches(self.frame_paths, chunk_size):
+                if not self.is_running:
+                    logger.warning("YOLO worker was stopped prematurely.")
+                    break
+
+                chunk = [frame_path for frame_path, _ in batch]
 
-            try:
                 # التأكد من استخدام يولو مودل انستانس وليس البايبلاين كله
-                detections = detect_objects(frame_path, yolo_model_instance, conf_threshold=0.10)
-                
-                # Save YOLO label file
-                image = cv2.imread(frame_path)
-                if image is not None:
-                    h, w = image.shape[:2]
-                    label_path = os.path.splitext(frame_path)[0] + '.txt'
-                    with open(label_path, 'w') as f:
-                        for det in detections:
-                            x1, y1, x2, y2 = det['bbox']
-                            x_center = (x1 + x2) / 2 / w
-                            y_center = (y1 + y2) / 2 / h
-                            width = (x2 - x1) / w
-                            height = (y2 - y1) / h
-                            class_id = 0  # Assume class 0 for detection
-                            f.write(f"{class_id} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}\n")
-                    yolo_results[frame_path] = {'detections': detections, 'label_path': label_path}
-                else:
-                    yolo_results[frame_path] = {'detections': detections, 'label_path': None}
-            except Exception as e:
-                logger.error(f"Error during YOLO detection for {frame_path}: {e}", exc_info=True)
-                yolo_results[frame_path] = {'detections': [], 'label_path': None}
+                with prefetch.timed("infer"):
+                    frame_results = detect_prepared(
+                        [prepared for _, prepared in batch],
+                        yolo_model_instance,
+                        self.detection_store,
+                        self.conf_threshold,
+                        self.batch_size,
+                    )
 
-            progress_percent = int((i + 1) / total_frames * 100)
-            self.progress.emit(progress_percent)
+                with prefetch.timed("labels"):
+                    for frame_path, (detections, image_shape) in zip(chunk, frame_results):
+                        label_path = None
+                        try:
+                            if image_shape is not None:
+                                label_path = _write_yolo_labels(frame_path, detections)
+                        except Exception as e:
+                            logger.error(
+                                f"Error writing YOLO labels for {frame_path}: {e}", exc_info=True
+                            )
+                        yolo_results[frame_path] = {
+                            "detections": detections,
+                            "label_path": label_path,
+                        }
+
+                done += len(chunk)
+                self.progress.emit(int(done / total_frames * 100))
+                self.stats.emit(prefetch.stats())
+
+        stats = prefetch.stats()
+        stage_summary = ", ".join(f"{k} {v:.2f}s" for k, v in stats["stage_seconds"].items())
+        logger.info(
+            f"YOLO analysed {stats['items']} frame(s) with {stats['loader_threads']} loader "
+            f"thread(s), queue {stats['max_queued']}/{stats['queue_size']}: {stage_summary}."
+        )
 
         if self.is_running:
             self.finished.emit(yolo_results)
@@ -136,10 +278,11 @@ class FinalProcessorWorker(QObject):
     progress = Signal(int)
     finished = Signal(list)
 
-    def __init__(self, main_window, instructions):
+    def __init__(self, main_window, instructions, frame_loader=None):
         super().__init__()
         self.main_window = main_window
         self.instructions = instructions
+        self.frame_loader = frame_loader or FrameLoader()
         self.is_running = True
 
     def run(self):
@@ -179,7 +322,7 @@ class FinalProcessorWorker(QObject):
             if not self.is_running:
                 break
             try:
-                source_image = cv2.imread(frame_path)
+                source_image = self.frame_loader.load(frame_path)
                 if source_image is None:
                     continue
 
@@ -307,7 +450,52 @@ class FinalProcessorWorker(QObject):
         self.is_running = False
 
 
+class ModelLoaderWorker(QObject):
+    """Loads the Pipeline models off the GUI thread; finished reports success."""
+
+    finished = Signal(bool)
+
+    def __init__(self, pipeline):
+        super().__init__()
+        self.pipeline = pipeline
+
+    def run(self):
+        try:
+            self.pipeline.load_models()
+            self.finished.emit(True)
+        except Exception as e:
+            logger.error(f"Failed to load the AI models: {e}", exc_info=True)
+            self.finished.emit(False)
+
+
+class SimilarAssetWorker(QObject):
+    """
+    Looks up an image in the Pipeline's embedding index off the GUI thread.
+    finished carries request_id and the (key, similarity) of the closest collected
+    asset at or above the duplicate threshold, or None.
+    """
+
+    finished = Signal(int, object)
+
+    def __init__(self, pipeline, image, request_id: int):
+        super().__init__()
+        self.pipeline = pipeline
+        self.image = image
+        self.request_id = request_id
+
+    def run(self):
+        match = None
+        try:
+            embeddings = self.pipeline.embed([self.image])
+            if embeddings is not None:
+                match = self.pipeline.embedding_index.find_duplicates(embeddings)[0]
+        except Exception as e:
+            logger.error(f"Similar asset lookup failed: {e}", exc_info=True)
+        self.finished.emit(self.request_id, match)
+
+
 class ExportWorker(QObject):
+    stats = Signal(dict)
     finished = Signal(object)
 
     def __init__(self, project, pipeline):
@@ -320,7 +508,7 @@ class ExportWorker(QObject):
         try:
             # تم التأكيد: مسؤولية تصدير كل شيء تقع على media_exporter.export_media_pack
             result_path = media_exporter.export_media_pack(
-                project=self.project, pipeline=self.pipeline
+                project=self.project, pipeline=self.pipeline, stats_callback=self.stats.emit
             )
             self.finished.emit(result_path)
         except Exception as e:
@@ -334,18 +522,23 @@ class ExportWorker(QObject):
 class VideoSplitterWorker(QObject):
     finished = Signal(dict)
     progress = Signal(int)
+    stats = Signal(dict)
 
-    def __init__(self, video_path, output_folder, clips, pipeline):
+    def __init__(self, video_path, output_folder, clips, pipeline, frames_per_clip=8):
         super().__init__()
         self.video_path = video_path
         self.output_folder = output_folder
         self.clips = clips
         self.pipeline = pipeline
+        self.frames_per_clip = max(1, frames_per_clip or 1)
         self.process = None
         self.commands_to_run = []
         self.created_files = {}
+        # Evenly spaced frames of each created clip (downscaled), classified in batches.
+        self.clip_frames = {}
         self.current_clip_index = 0
         self.total_clips = 0
+        self.progress_parser = None
         self._is_running = True
         self.timeout_timer = QTimer(self)
         self.timeout_timer.setSingleShot(True)
@@ -353,6 +546,7 @@ class VideoSplitterWorker(QObject):
 
     def run(self):
         self.created_files = {}
+        self.clip_frames = {}
         self.commands_to_run = get_ffmpeg_split_commands(
             self.video_path, self.output_folder, self.clips
         )
@@ -365,9 +559,11 @@ class VideoSplitterWorker(QObject):
 
     def _start_next_process(self):
         if not self._is_running or self.current_clip_index >= self.total_clips:
+            self._suggest_clip_actions()
             self.finished.emit(self.created_files)
             return
-        command, output_path = self.commands_to_run[self.current_clip_index]
+        command, output_path, clip_duration = self.commands_to_run[self.current_clip_index]
+        self.progress_parser = FFmpegProgressParser(clip_duration)
         executable = command[0]
         args = command[1:]
 
@@ -414,8 +610,11 @@ class VideoSplitterWorker(QObject):
 
     def _on_process_stdout(self):
         stdout = self.process.readAllStandardOutput().data().decode("utf-8", "ignore")  # type: ignore
-        if stdout.strip():
-            logger.debug(f"FFmpeg stdout: {stdout.strip()}")
+        for stats in self.progress_parser.feed(stdout):
+            self.stats.emit({**stats, "clip_index": self.current_clip_index})
+            if stats["percent"] is not None:
+                overall = (self.current_clip_index + stats["percent"] / 100) / self.total_clips
+                self.progress.emit(int(overall * 100))
 
     def _on_process_stderr(self):
         stderr = self.process.readAllStandardError().data().decode("utf-8", "ignore")  # type: ignore
@@ -456,30 +655,24 @@ class VideoSplitterWorker(QObject):
 
             # تم إزالة استدعاء دالة create_thumbnail_from_video الغير معرفة
 
-            # 2. تحليل الذكاء الاصطناعي (AI Analysis)
+            # 2. تحليل الذكاء الاصطناعي (AI Analysis) - sampled frames of several clips are
+            # classified together in _suggest_clip_actions.
+            self.created_files[output_path] = {
+                "ai_suggestion": "unknown",
+                "ai_confidence": 0.0,
+                "source_path": output_path,
+            }
             try:
-                cap = cv2.VideoCapture(output_path)
-                success, frame = cap.read()
-                cap.release()
-                if success and frame is not None:
-                    action_suggestion = self.pipeline.suggest_action(frame)
-                    self.created_files[output_path] = {
-                        "ai_suggestion": action_suggestion,
-                        "source_path": output_path,
-                    }
-                    logger.info(f"AI analysis completed for clip {output_path}: {action_suggestion}")
+                # The classifier input is 224x224, keep only small copies until then.
+                frames = sample_clip_frames(output_path, self.frames_per_clip, CLIP_FRAME_SIZE)
+                if frames:
+                    self.clip_frames[output_path] = frames
                 else:
-                    self.created_files[output_path] = {
-                        "ai_suggestion": "unknown",
-                        "source_path": output_path,
-                    }
-                    logger.warning(f"Could not read frame from clip {output_path}")
+                    logger.warning(f"Could not read frames from clip {output_path}")
             except Exception as e:
-                logger.error(f"AI analysis failed for clip {output_path}: {e}")
-                self.created_files[output_path] = {
-                    "ai_suggestion": "unknown",
-                    "source_path": output_path,
-                }
+                logger.error(f"Could not read frames from clip {output_path}: {e}")
+            if len(self.clip_frames) >= CLIPS_PER_ACTION_BATCH:
+                self._suggest_clip_actions()
         else:
             error_output = self.process.readAllStandardError().data().decode("utf-8", "ignore")  # type: ignore
             logger.error(
@@ -490,6 +683,26 @@ class VideoSplitterWorker(QObject):
         self.current_clip_index += 1
         self._start_next_process()
 
+    def _suggest_clip_actions(self):
+        # A stopped split emits its clips as they are, without running the classifier.
+        if not self._is_running or not self.clip_frames:
+            return
+        clip_paths = list(self.clip_frames)
+        try:
+            suggestions = self.pipeline.suggest_clip_actions(
+                [self.clip_frames[p] for p in clip_paths]
+            )
+        except Exception as e:
+            logger.error(f"AI analysis failed for {len(clip_paths)} clip(s): {e}", exc_info=True)
+            suggestions = []
+        for clip_path, (suggestion, confidence, _) in zip(clip_paths, suggestions):
+            self.created_files[clip_path]["ai_suggestion"] = suggestion
+            self.created_files[clip_path]["ai_confidence"] = confidence
+            logger.info(
+                f"AI analysis completed for clip {clip_path}: {suggestion} ({confidence:.0%})"
+            )
+        self.clip_frames = {}
+
     def stop(self):
         self._is_running = False
         try:
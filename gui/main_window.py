@@ -11,7 +11,7 @@ from PySide6.QtWidgets import (
     QDialog,
     QFileDialog,
 )
-from PySide6.QtCore import QSettings, QThread, Qt, QUrl
+from PySide6.QtCore import QSettings, QThread, Qt, QUrl, Signal
 from PySide6.QtGui import QDesktopServices
 
 from .dashboard_panel import DashboardPanel
@@ -22,9 +22,12 @@ from .photo_maker_panel import PhotoMakerPanel
 from .shoot_maker_panel import ShootMakerPanel
 from .character_setup_panel import CharacterSetupPanel
 from .event_maker_panel import EventMakerPanel  # [NEW] Import the new panel
-from .components import ExportWorker, FrameExtractionDialog
+from .components import ExportWorker, FrameExtractionDialog, ModelLoaderWorker
 from tools.logger import get_logger
 from tools import video_splitter
+from tools.ffmpeg_runner import format_ffmpeg_stats
+from tools.frame_loader import FrameLoader
+from ai.yolo.detection_store import DetectionStore
 from utils.config_loader import load_config
 from utils.tag_manager import TagManager
 from ai.pipeline import Pipeline
@@ -38,6 +41,9 @@ logger = get_logger("MainWindow")
 
 
 class MainWindow(QMainWindow):
+    # Emitted once the AI models finished loading in the background (True on success).
+    models_ready = Signal(bool)
+
     def __init__(self):
         super().__init__()
         logger.info("Initializing MainWindow")
@@ -48,8 +54,13 @@ class MainWindow(QMainWindow):
         logger.info("Project instance created")
         self.tag_manager = TagManager()
         logger.info("TagManager initialized")
-        self.pipeline = Pipeline(self.tag_manager)
-        logger.info("AI Pipeline initialized")
+        # The models are loaded in the background by _start_model_loading.
+        self.pipeline = Pipeline(self.tag_manager, self.config.get("ai", {}))
+        logger.info("AI Pipeline created")
+        self.frame_loader = FrameLoader.from_config(self.config.get("image", {}))
+        self.detection_store = DetectionStore.from_config(
+            self.config.get("ai", {}).get("yolo", {})
+        )
 
         self.photo_maker_workflow = PhotoMakerWorkflow(self)
         self.vid_maker_workflow = VidMakerWorkflow(self)
@@ -58,6 +69,26 @@ class MainWindow(QMainWindow):
         self._setup_ui_panels()
         self.workflow_manager = WorkflowManager(self, self.view_stack)
         self._connect_signals()
+        self._start_model_loading()
+
+    def _start_model_loading(self):
+        self.statusBar().showMessage("Loading AI models...")
+        self.model_loader_thread = QThread()
+        self.model_loader_worker = ModelLoaderWorker(self.pipeline)
+        self.model_loader_worker.moveToThread(self.model_loader_thread)
+        self.model_loader_thread.started.connect(self.model_loader_worker.run)
+        self.model_loader_worker.finished.connect(self._on_models_loaded)
+        self.model_loader_worker.finished.connect(self.model_loader_thread.quit)
+        self.model_loader_worker.finished.connect(self.model_loader_worker.deleteLater)
+        self.model_loader_thread.finished.connect(self.model_loader_thread.deleteLater)
+        self.model_loader_thread.start()
+
+    def _on_models_loaded(self, success):
+        if success:
+            self.statusBar().showMessage("AI models ready.", 5000)
+        else:
+            self.statusBar().showMessage("AI models failed to load, see the log.")
+        self.models_ready.emit(success)
 
     # **********************************************
     # * NEW METHODS FOR EVENTMAKERPANEL INTERFACE *
@@ -163,6 +194,7 @@ class MainWindow(QMainWindow):
             self.photo_maker_workflow.run_final_processing
         )
         self.photo_maker_workflow.extraction_finished.connect(self._on_extraction_finished)
+        self.photo_maker_workflow.stats_updated.connect(self._on_ffmpeg_stats)
         self.photo_maker_workflow.yolo_analysis_finished.connect(self._on_yolo_finished)
         self.photo_maker_workflow.final_processing_finished.connect(
             self.photo_maker_panel.on_final_processing_finished
@@ -171,6 +203,7 @@ class MainWindow(QMainWindow):
 
         self.vids_maker_panel.splitting_requested.connect(self.start_video_splitting)
         self.vid_maker_workflow.splitting_finished.connect(self._on_splitting_finished)
+        self.vid_maker_workflow.stats_updated.connect(self._on_ffmpeg_stats)
         self.vids_maker_panel.export_complete.connect(self._update_dashboard_state)
         self.vids_maker_panel.back_requested.connect(self.go_to_dashboard)
 
@@ -261,6 +294,7 @@ class MainWindow(QMainWindow):
         self.export_worker.moveToThread(self.export_thread)
 
         self.export_thread.started.connect(self.export_worker.run)
+        self.export_worker.stats.connect(self._on_ffmpeg_stats)
         self.progress_dialog.canceled.connect(
             self.export_worker.stop
         )  # Connect cancel to worker's stop
@@ -282,6 +316,15 @@ class MainWindow(QMainWindow):
 
         self.export_thread.start()  # Start the thread
 
+    def _on_ffmpeg_stats(self, stats):
+        """Shows live FFmpeg throughput (fps, x-realtime, ETA) under the current progress label."""
+        if not hasattr(self, "progress_dialog") or not self.progress_dialog.isVisible():
+            return
+        stats_text = format_ffmpeg_stats(stats)
+        if stats_text:
+            title = self.progress_dialog.labelText().split("\n")[0]
+            self.progress_dialog.setLabelText(f"{title}\n{stats_text}")
+
     def _on_export_finished(self, result_path):
         logger.debug("--- _on_export_finished slot has been called ---")
         self.progress_dialog.close()
@@ -332,6 +375,7 @@ class MainWindow(QMainWindow):
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
         )
         if reply == QMessageBox.StandardButton.Yes:
+            self.pipeline.close()
             event.accept()
         else:
             event.ignore()
@@ -356,10 +400,13 @@ class MainWindow(QMainWindow):
                 return
 
         if stype != "folder":
+            image_config = self.config.get("image", {})
             dialog = FrameExtractionDialog(
                 self,
-                self.config.get("image", {}).get("interval_seconds", 2),
-                self.config.get("image", {}).get("blur_threshold", 60.0),
+                image_config.get("interval_seconds", 2),
+                image_config.get("blur_threshold", 60.0),
+                image_config.get("sampling_mode", "interval"),
+                image_config.get("scene_threshold", 0.3),
             )
             if not dialog.exec() == QDialog.DialogCode.Accepted:
                 return
@@ -381,7 +428,12 @@ class MainWindow(QMainWindow):
         self.photo_maker_panel.activate_and_load_frames(source_frames)
 
     def start_yolo_analysis(self, selected_paths):
-        self.progress_dialog = QProgressDialog("AI is analyzing frames...", "Cancel", 0, 100, self)
+        title = (
+            "AI is analyzing frames..."
+            if self.pipeline.models_loaded
+            else "Loading AI models, then analyzing frames..."
+        )
+        self.progress_dialog = QProgressDialog(title, "Cancel", 0, 100, self)
         self.progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
         self.photo_maker_workflow.progress_updated.connect(self.progress_dialog.setValue)
         if hasattr(self.photo_maker_workflow, "stop_current_task"):
@@ -1,4 +1,5 @@
 ﻿import sys
+import multiprocessing
 from pathlib import Path
 from PySide6.QtWidgets import QApplication
 from gui.main_window import MainWindow
@@ -7,6 +8,8 @@ from tools.logger import get_logger
 logger = get_logger("Main")
 
 if __name__ == "__main__":
+    # Needed by the sharded inference worker processes in the frozen executable.
+    multiprocessing.freeze_support()
     logger.info("Starting Girl Packer application")
     # Handle frozen executable paths
     if getattr(sys, 'frozen', False):
@@ -0,0 +1,263 @@
+import io
+import os
+import tempfile
+import cv2
+import numpy as np
+from unittest.mock import patch, MagicMock
+from tools import frame_extractor
+from tools.frame_scorer import SharpnessScorer, FRAME_METRICS_DTYPE
+from tools.extraction_cache import ExtractionCache
+from tools.ffmpeg_runner import FFmpegProgressParser, format_ffmpeg_stats
+from tools.frame_hasher import dhash, PerceptualHashIndex, NearDuplicateGroups
+
+
+def _sharp_frame(h=64, w=64):
+    frame = np.zeros((h, w, 3), dtype=np.uint8)
+    frame[::2, ::2] = 255
+    return frame
+
+
+def _block_frame(h=128, w=256, block=16):
+    yy, xx = np.indices((h, w))
+    pattern = ((yy // block + xx // block) % 2 * 255).astype(np.uint8)
+    return np.dstack([pattern] * 3)
+
+
+def _flat_frame(h=64, w=64):
+    return np.full((h, w, 3), 128, dtype=np.uint8)
+
+
+def _textured_frame(blur=0, seed=0, h=64, w=64):
+    frame = np.random.default_rng(seed).integers(40, 200, (h, w, 3)).astype(np.uint8)
+    return cv2.GaussianBlur(frame, (0, 0), blur) if blur else frame
+
+
+def _fake_ffmpeg(frames):
+    process = MagicMock()
+    process.stdout = io.BytesIO(b"".join(f.tobytes() for f in frames))
+    process.stderr = io.BytesIO(b"frame=3\nout_time_us=6000000\nspeed=12.5x\nprogress=end\n")
+    process.wait.return_value = 0
+    return process
+
+
+class TestFrameExtractor:
+    def test_streaming_keeps_only_sharp_frames(self):
+        frames = [_sharp_frame(), _flat_frame(), _sharp_frame()]
+        process = _fake_ffmpeg(frames)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            video_path = os.path.join(tmpdir, "clip.mp4")
+            ffmpeg_path = os.path.join(tmpdir, "ffmpeg")
+            for path in (video_path, ffmpeg_path):
+                open(path, "w").close()
+            output_folder = os.path.join(tmpdir, "out")
+
+            with patch.object(frame_extractor, "FFMPEG_PATH", ffmpeg_path), patch.object(
+                frame_extractor, "_probe_video", return_value=(64, 64, 6.0)
+            ), patch.object(frame_extractor.subprocess, "Popen", return_value=process):
+                kept = frame_extractor.extract_frames(
+                    video_path, output_folder, blur_threshold=60.0, streaming=True
+                )
+
+            assert [os.path.basename(p) for p in kept] == [
+                "clip_frame_00001.jpg",
+                "clip_frame_00003.jpg",
+            ]
+            assert all(os.path.exists(p) for p in kept)
+            assert sorted(os.listdir(output_folder)) == sorted(os.path.basename(p) for p in kept)
+
+    def test_sharpness_scorer_batches(self):
+        frames = [_sharp_frame(), _flat_frame(), _block_frame()]
+        with SharpnessScorer(max_workers=2) as scorer:
+            scores = scorer.score_frames(frames)
+        with SharpnessScorer(max_workers=2, proxy_width=64) as scorer:
+            proxy_scores = scorer.score_frames(frames)
+
+        assert isinstance(scores, np.ndarray)
+        assert scores.shape == (3,)
+        assert scores[0] > 60.0 and scores[1] == 0.0
+        assert proxy_scores[1] == 0.0 and proxy_scores[2] > 0.0
+
+    def test_sharpness_scorer_unreadable_file_is_nan(self):
+        with SharpnessScorer(max_workers=1) as scorer:
+            scores = scorer.score_files(["/nonexistent/frame.jpg"])
+        assert np.isnan(scores[0])
+        assert not (scores >= 0.0).any()
+
+    def test_sampling_args(self):
+        assert frame_extractor._build_sampling_args("interval", 2, 0.3) == ([], ["-vf", "fps=1/2"])
+        assert frame_extractor._build_sampling_args("scene", 2, 0.4) == (
+            [],
+            ["-vf", "select='gt(scene,0.4)'", "-fps_mode", "vfr"],
+        )
+        assert frame_extractor._build_sampling_args("keyframes", 2, 0.3) == (
+            ["-skip_frame", "nokey"],
+            ["-fps_mode", "vfr"],
+        )
+
+    def test_output_size_is_forced(self):
+        assert frame_extractor._with_output_size(["-vf", "fps=1/2"], 64, 48) == [
+            "-vf",
+            "fps=1/2,scale=64:48,setsar=1",
+        ]
+        assert frame_extractor._with_output_size(["-fps_mode", "vfr"], 64, 48) == [
+            "-vf",
+            "scale=64:48,setsar=1",
+            "-fps_mode",
+            "vfr",
+        ]
+
+    def test_window_selection_requires_interval_sampling(self):
+        assert frame_extractor._selection_mode_for("top_k_window", "interval") == "top_k_window"
+        assert frame_extractor._selection_mode_for("top_k_window", "scene") == "top_n"
+        assert frame_extractor._selection_mode_for("top_k_window", "keyframes") == "top_n"
+        assert frame_extractor._selection_mode_for("threshold", "scene") == "threshold"
+
+    def test_hash_index_hamming_search(self):
+        index = PerceptualHashIndex(capacity=1)
+        index.add(0b0000)
+        index.add(0b1111)
+        assert len(index) == 2
+        assert list(index.distances(0b0011)) == [2, 2]
+        assert index.nearest(0b1110) == (1, 1)
+        assert dhash(_block_frame()) == dhash(_block_frame() // 2 + 10)
+
+    def test_near_duplicate_groups_keep_sharpest(self):
+        groups = NearDuplicateGroups(max_distance=4)
+        assert groups.offer(0b0, 10.0) == -1
+        groups.add(0b0, 10.0, "a.jpg")
+        assert groups.offer(0b1, 5.0) is None
+        assert groups.offer(0b1, 20.0) == 0
+        assert groups.replace(0, 0b1, 20.0, "b.jpg") == "a.jpg"
+        assert groups.offer(np.uint64(0xFFFF), 1.0) == -1
+        assert groups.paths == ["b.jpg"]
+        assert groups.dropped == 2
+
+    def test_cache_serves_repeat_and_refilter_without_decoding(self):
+        frames = [_sharp_frame(), _block_frame(64, 64, 8), _flat_frame()]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            video_path = os.path.join(tmpdir, "clip.mp4")
+            ffmpeg_path = os.path.join(tmpdir, "ffmpeg")
+            for path in (video_path, ffmpeg_path):
+                with open(path, "w") as f:
+                    f.write("video")
+            cache_dir = os.path.join(tmpdir, "cache")
+
+            with patch.object(frame_extractor, "FFMPEG_PATH", ffmpeg_path), patch.object(
+                frame_extractor, "_probe_video", return_value=(64, 64, 6.0)
+            ), patch.object(
+                frame_extractor.subprocess,
+                "Popen",
+                side_effect=lambda *a, **k: _fake_ffmpeg(frames),
+            ) as popen:
+
+                def run(threshold, out):
+                    return frame_extractor.extract_frames(
+                        video_path,
+                        os.path.join(tmpdir, out),
+                        blur_threshold=threshold,
+                        streaming=True,
+                        cache_dir=cache_dir,
+                        cache_score_floor=10.0,
+                    )
+
+                first = run(60.0, "run1")
+                repeat = run(60.0, "run2")
+                stricter = run(100000.0, "run3")
+                looser = run(5.0, "run4")
+
+            assert len(first) == 2 and len(repeat) == 2
+            assert [os.path.basename(p) for p in stricter] == ["clip_frame_00001.jpg"]
+            assert len(looser) == 2
+            # Only the first run and the run below the cached score floor decoded the video.
+            assert popen.call_count == 2
+
+    def test_cache_concurrent_extractions_publish_one_entry(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ExtractionCache(os.path.join(tmpdir, "cache"))
+            first, second = cache.prepare("key"), cache.prepare("key")
+            assert first != second
+            for folder in (first, second):
+                cv2.imwrite(os.path.join(folder, "clip_frame_00001.jpg"), _sharp_frame())
+            metrics = np.zeros(1, dtype=FRAME_METRICS_DTYPE)
+            paths = [os.path.join(first, "clip_frame_00001.jpg")]
+            stored = cache.store("key", first, paths, [1], metrics, 10.0, {})
+            again = cache.store("key", second, paths, [1], metrics, 10.0, {})
+
+            assert stored.folder == again.folder == cache.entry_folder("key")
+            assert os.path.exists(again.path(0))
+            assert os.listdir(cache.cache_dir) == ["key"]
+
+    def test_progress_parser(self):
+        parser = FFmpegProgressParser(duration=10.0)
+        chunk = "frame=120\nfps=240.0\nout_time_us=4000000\nspeed=8.0x\nprogress=contin"
+        assert parser.feed(chunk) == []
+        (stats,) = parser.feed("ue\nframe=130\n")
+        assert stats["frame"] == 120 and stats["fps"] == 240.0
+        assert stats["percent"] == 40 and stats["eta_seconds"] == 0.75
+        assert not stats["finished"]
+        assert "240 fps" in format_ffmpeg_stats(stats)
+        assert parser.feed_line("progress=end")["finished"]
+
+    def test_quality_metrics_penalize_blur_and_clipping(self):
+        frames = [_textured_frame(), _textured_frame(blur=2), _block_frame(64, 64, 8)]
+        with SharpnessScorer(max_workers=2) as scorer:
+            metrics = scorer.analyze_frames(frames)
+        assert metrics["clipped"][0] == 0.0 and metrics["clipped"][2] == 1.0
+        assert metrics["quality"][0] > metrics["quality"][1] > metrics["quality"][2] == 0.0
+        assert metrics["dhash"][2] == dhash(frames[2])
+
+    def test_top_k_window_selection(self):
+        # Two 4-second windows of 2-second candidates; the sharpest of each window wins.
+        frames = [
+            _textured_frame(blur=3, seed=1),
+            _textured_frame(seed=2),
+            _textured_frame(seed=3),
+            _textured_frame(blur=1, seed=4),
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            video_path = os.path.join(tmpdir, "clip.mp4")
+            ffmpeg_path = os.path.join(tmpdir, "ffmpeg")
+            for path in (video_path, ffmpeg_path):
+                open(path, "w").close()
+            output_folder = os.path.join(tmpdir, "out")
+
+            with patch.object(frame_extractor, "FFMPEG_PATH", ffmpeg_path), patch.object(
+                frame_extractor, "_probe_video", return_value=(64, 64, 8.0)
+            ), patch.object(frame_extractor.subprocess, "Popen", return_value=_fake_ffmpeg(frames)):
+                kept = frame_extractor.extract_frames(
+                    video_path,
+                    output_folder,
+                    blur_threshold=1e9,
+                    streaming=True,
+                    score_workers=1,
+                    selection_mode="top_k_window",
+                    top_k=1,
+                    window_seconds=4.0,
+                )
+
+            assert [os.path.basename(p) for p in kept] == [
+                "clip_frame_00002.jpg",
+                "clip_frame_00003.jpg",
+            ]
+            assert sorted(os.listdir(output_folder)) == sorted(os.path.basename(p) for p in kept)
+
+    def test_near_duplicate_in_a_later_window_keeps_the_earlier_frame(self):
+        from tools.frame_selector import QualityWindowSelector
+
+        groups = NearDuplicateGroups(max_distance=4)
+        selector = QualityWindowSelector(groups, top_k=1, window_seconds=4.0)
+
+        def select(candidate_index, quality):
+            metrics = {"dhash": np.uint64(0xF0F0), "quality": quality, "sharpness": quality}
+            with patch.object(frame_extractor, "_remove_file") as remove:
+                kept = frame_extractor._select_frame(
+                    groups, selector, candidate_index, 2.0, metrics, lambda: f"f{candidate_index}"
+                )
+            return kept, [call.args[0] for call in remove.call_args_list]
+
+        # Candidates 1-2 fall in the first window (0-4 s), candidate 3 in the second.
+        assert select(1, 1.0) == (True, [])
+        assert select(2, 2.0) == (True, ["f1"])
+        assert select(3, 3.0) == (True, [])
+        assert groups.kept_paths() == ["f2", "f3"]
@@ -0,0 +1,102 @@
+import time
+import cv2
+import numpy as np
+from unittest.mock import patch
+import threading
+from tools.frame_loader import FrameLoader
+from tools.prefetch import PrefetchPipeline
+
+
+def _write_frames(tmp_path, count, shape=(10, 10, 3)):
+    paths = []
+    for i in range(count):
+        path = str(tmp_path / f"frame_{i}.png")
+        cv2.imwrite(path, np.full(shape, i * 10, dtype=np.uint8))
+        paths.append(path)
+    return paths
+
+
+class TestFrameLoader:
+    def test_decodes_each_frame_once(self, tmp_path):
+        (path,) = _write_frames(tmp_path, 1)
+        loader = FrameLoader()
+        with patch("tools.frame_loader.cv2.imread", wraps=cv2.imread) as imread:
+            first = loader.load(path)
+            assert loader.shape(path) == (10, 10, 3)
+            assert loader.load(path) is first
+        assert imread.call_count == 1
+        assert loader.hits == 2 and loader.misses == 1
+        assert not first.flags.writeable
+
+    def test_lru_eviction_respects_memory_budget(self, tmp_path):
+        paths = _write_frames(tmp_path, 3)
+        loader = FrameLoader(max_bytes=2 * 300)
+        loader.load(paths[0])
+        loader.load(paths[1])
+        loader.load(paths[0])  # paths[1] is now least recently used
+        loader.load(paths[2])
+
+        assert len(loader) == 2 and loader.cached_bytes == 600
+        loader.load(paths[0])
+        loader.load(paths[1])
+        assert loader.misses == 4
+
+    def test_rewritten_frame_is_decoded_again(self, tmp_path):
+        (path,) = _write_frames(tmp_path, 1)
+        loader = FrameLoader()
+        assert loader.load(path)[0, 0, 0] == 0
+
+        # A new extraction writes a different frame under the same name.
+        cv2.imwrite(path, np.full((12, 10, 3), 200, dtype=np.uint8))
+        reloaded = loader.load(path)
+        assert reloaded.shape == (12, 10, 3) and reloaded[0, 0, 0] == 200
+        assert loader.misses == 2 and len(loader) == 1
+        assert loader.cached_bytes == reloaded.nbytes
+
+    def test_unreadable_frame_is_none(self, tmp_path):
+        loader = FrameLoader()
+        assert loader.load(str(tmp_path / "missing.jpg")) is None
+        assert loader.shape(str(tmp_path / "missing.jpg")) is None
+        assert len(loader) == 0
+
+
+class TestPrefetchPipeline:
+    def test_batches_keep_input_order(self):
+        def load(i):
+            # Later items finish first, the output order must not change.
+            time.sleep(0.001 * (10 - i))
+            return i * i
+
+        with PrefetchPipeline(load, num_workers=4, queue_size=6) as prefetch:
+            batches = list(prefetch.batches(range(10), 4))
+            with prefetch.timed("infer"):
+                pass
+        assert [len(batch) for batch in batches] == [4, 4, 2]
+        assert [pair for batch in batches for pair in batch] == [(i, i * i) for i in range(10)]
+        stats = prefetch.stats()
+        assert stats["items"] == 10
+        assert stats["loader_threads"] == 4
+        assert stats["max_queued"] <= stats["queue_size"] == 6
+        assert {"load", "wait", "infer"} <= set(stats["stage_seconds"])
+
+    def test_max_queued_counts_short_inputs(self):
+        # Fewer items than queue_size: the source runs dry on the first fill.
+        with PrefetchPipeline(lambda i: i, num_workers=2, queue_size=8) as prefetch:
+            list(prefetch.batches(range(3), 2))
+        assert prefetch.stats()["max_queued"] == 3
+
+    def test_queue_bounds_loaded_items(self):
+        started = []
+        lock = threading.Lock()
+
+        def load(i):
+            with lock:
+                started.append(i)
+            return i
+
+        with PrefetchPipeline(load, num_workers=2, queue_size=3) as prefetch:
+            batches = prefetch.batches(range(100), 1)
+            next(batches)
+            time.sleep(0.05)
+            # One item consumed, at most queue_size more loading or loaded.
+            assert len(started) <= 4
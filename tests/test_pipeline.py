@@ -1,3 +1,6 @@
+import os
+import time
+import tempfile
 import pytest
 import numpy as np
 from unittest.mock import patch, MagicMock
@@ -22,6 +25,21 @@ class TestPipeline:
         assert pipeline.asset_classifier is not None
         assert pipeline.action_classifier is not None
 
+    @patch("ai.pipeline.YOLOModel")
+    @patch("ai.pipeline.create_pytorch_model")
+    @patch("ai.pipeline.torch.load")
+    def test_models_load_lazily_once(self, mock_torch_load, mock_create_model, mock_yolo):
+        pipeline = Pipeline(MagicMock(), {"cnn": {"shared_backbone": False}})
+        assert not pipeline.models_loaded
+        mock_yolo.assert_not_called()
+
+        assert pipeline.yolo_model is mock_yolo.return_value
+        assert pipeline.models_loaded
+        pipeline.load_models()
+        mock_yolo.assert_called_once()
+        assert mock_create_model.call_count == 2
+        assert all(call.kwargs["pretrained"] is False for call in mock_create_model.call_args_list)
+
     def test_classify_asset_no_model(self):
         tag_manager = MagicMock()
         pipeline = Pipeline(tag_manager)
@@ -37,3 +55,568 @@ class TestPipeline:
 
         result = pipeline.suggest_action(np.zeros((224, 224, 3), dtype=np.uint8))
         assert result == "unknown_action"
+
+    def test_batched_classification_matches_single_images(self):
+        import torch
+        from ai.cnn.cnn_model import inference_transform
+
+        torch.manual_seed(0)
+        pipeline = Pipeline.__new__(Pipeline)
+        pipeline.cnn_device = torch.device("cpu")
+        pipeline.cnn_batch_size = 2
+        pipeline.transform = inference_transform()
+        pipeline.asset_class_map = {0: "hat", 1: "shirt", 2: "shoes"}
+        pipeline.asset_classifier = torch.nn.Sequential(
+            torch.nn.AdaptiveAvgPool2d(4), torch.nn.Flatten(), torch.nn.Linear(48, 3)
+        ).eval()
+        pipeline.asset_classifier = MagicMock(wraps=pipeline.asset_classifier)
+
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 255, (32, 48, 3), dtype=np.uint8) for _ in range(5)]
+        labels, probabilities = pipeline.classify_assets(images)
+
+        assert pipeline.asset_classifier.call_count == 3
+        assert probabilities.shape == (5, 3)
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1.0, rtol=1e-5)
+        assert labels == [pipeline.classify_asset(image) for image in images]
+
+
+class TestYOLOBackends:
+    def test_cpu_detector_decodes_letterboxed_output(self):
+        from ai.yolo.inference_backends import CPUDetector
+
+        class FakeDetector(CPUDetector):
+            def _infer(self, batch):
+                assert batch.shape == (1, 3, 64, 64)
+                # Anchors: two overlapping class-1 boxes (NMS keeps the best), one weak box.
+                output = np.zeros((1, 6, 3), dtype=np.float32)
+                output[0, :4, 0] = [32, 32, 20, 10]
+                output[0, :4, 1] = [33, 32, 20, 10]
+                output[0, :4, 2] = [10, 20, 4, 4]
+                output[0, 5, :] = [0.9, 0.8, 0.1]
+                return output
+
+        image = np.zeros((64, 128, 3), dtype=np.uint8)  # letterboxed at scale 0.5, pad_y 16
+        (result,) = FakeDetector(imgsz=64).predict([image], conf=0.25)
+
+        assert len(result.boxes) == 1
+        assert result.boxes.cls.tolist() == [1.0]
+        np.testing.assert_allclose(result.boxes.xyxy[0], [44, 22, 84, 42])
+        np.testing.assert_allclose(result.boxes.conf, [0.9])
+
+    def test_cpu_detector_matches_the_torch_backend(self):
+        import cv2
+        import torch
+        from ultralytics import YOLO
+        from ai.yolo.inference_backends import CPUDetector, MAX_DET
+
+        def network(x, *args, **kwargs):
+            # One anchor per 32x32 cell of the (RGB) input: class c scores the mean of
+            # channel c, red sets the box size.
+            pooled = torch.nn.functional.avg_pool2d(x.float(), 32)
+            n, _, rows, cols = pooled.shape
+            ys, xs = torch.meshgrid(torch.arange(rows), torch.arange(cols), indexing="ij")
+            centers = (torch.stack([xs, ys]).flatten(1).float() + 0.5) * 32
+            size = 40 + 40 * pooled[:, :1].flatten(2)
+            boxes = torch.cat([centers.expand(n, -1, -1), size, size], 1)
+            scores = torch.zeros(n, 80, rows * cols)
+            scores[:, :3] = pooled.flatten(2)
+            return torch.cat([boxes, scores], 1)
+
+        class NetworkDetector(CPUDetector):
+            def _infer(self, batch):
+                return network(torch.from_numpy(batch)).numpy()
+
+        rng = np.random.default_rng(0)
+        image = cv2.GaussianBlur(rng.integers(0, 255, (320, 320, 3), dtype=np.uint8), (0, 0), 6)
+        image[..., 2] //= 3  # the channels must not be interchangeable
+
+        yolo = YOLO("yolov8n.yaml")
+        yolo.model.forward = network
+        (expected,) = yolo.predict([image], conf=0.25, imgsz=640, verbose=False)
+        (result,) = NetworkDetector(imgsz=640).predict([image], conf=0.25)
+
+        assert len(result.boxes) == len(expected.boxes) == MAX_DET
+        order = np.lexsort((-result.boxes.conf, result.boxes.cls))
+        expected_order = np.lexsort((-expected.boxes.conf.numpy(), expected.boxes.cls.numpy()))
+        np.testing.assert_array_equal(
+            result.boxes.cls[order], expected.boxes.cls.numpy()[expected_order]
+        )
+        np.testing.assert_allclose(
+            result.boxes.conf[order], expected.boxes.conf.numpy()[expected_order], rtol=1e-5
+        )
+        np.testing.assert_allclose(
+            result.boxes.xyxy[order], expected.boxes.xyxy.numpy()[expected_order], atol=1e-3
+        )
+
+    def test_existing_export_of_downloaded_weights_is_reused(self, tmp_path):
+        from ai.yolo.inference_backends import export_model
+
+        exported = tmp_path / "yolov8n.onnx"
+        exported.write_bytes(b"onnx")
+        yolo = MagicMock(ckpt_path=str(tmp_path / "yolov8n.pt"))  # resolved, but not on disk
+        assert export_model(yolo, "yolov8n.pt", "onnx") == str(exported)
+        yolo.export.assert_not_called()
+
+        (tmp_path / "yolov8n.pt").write_bytes(b"weights")
+        os.utime(exported, (0, 0))  # the weights are newer now
+        export_model(yolo, "yolov8n.pt", "onnx")
+        yolo.export.assert_called_once()
+
+    def test_unavailable_backend_falls_back_to_torch(self):
+        from ai.yolo import inference_backends
+
+        with patch.object(inference_backends, "ONNXRUNTIME_AVAILABLE", False):
+            assert inference_backends.create_cpu_detector("onnx", MagicMock(), "best.pt") is None
+        assert inference_backends.create_cpu_detector("torch", MagicMock(), "best.pt") is None
+
+
+class TestQuantization:
+    def test_quantized_classifier_matches_float_model(self, tmp_path):
+        import cv2
+        import torch
+        from torchvision import models
+        from ai import quantization
+
+        rng = np.random.default_rng(0)
+        for class_name in ("hat", "shoe"):
+            (tmp_path / "val" / class_name).mkdir(parents=True)
+            for i in range(3):
+                image = rng.integers(0, 255, (40, 40, 3)).astype(np.uint8)
+                cv2.imwrite(str(tmp_path / "val" / class_name / f"{i}.png"), image)
+        paths = quantization._image_files(str(tmp_path / "val"))
+        assert len(paths) == 6
+
+        torch.manual_seed(0)
+        float_model = models.resnet18(weights=None, num_classes=2).eval()
+        int8_model = quantization.quantize_cnn(float_model, paths)
+        report = quantization.evaluate_cnn(
+            float_model, int8_model, str(tmp_path / "val"), {0: "hat", 1: "shoe"}
+        )
+
+        assert report["images"] == 6
+        assert 0.0 <= report["agreement"] <= 1.0
+        assert report["accuracy_float"] is not None and report["accuracy_int8"] is not None
+
+    def test_compare_detections_matches_by_class_and_iou(self):
+        from ai.quantization import compare_detections
+        from ai.yolo.inference_backends import DetectionBoxes
+
+        float_boxes = DetectionBoxes(
+            np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float32),
+            np.array([0.9, 0.8], dtype=np.float32),
+            np.array([0.0, 1.0], dtype=np.float32),
+        )
+        int8_boxes = DetectionBoxes(
+            np.array([[1, 1, 10, 10], [20, 20, 30, 30]], dtype=np.float32),
+            np.array([0.85, 0.7], dtype=np.float32),
+            np.array([0.0, 0.0], dtype=np.float32),
+        )
+        matched, float_count, int8_count, conf_delta = compare_detections(float_boxes, int8_boxes)
+        assert (matched, float_count, int8_count) == (1, 2, 2)
+        assert abs(conf_delta - 0.05) < 1e-6
+
+
+class TestMultiHeadClassifier:
+    def _save_classifier(self, path, backbone_state, num_classes):
+        import torch
+        from torchvision import models
+
+        model = models.resnet18(weights=None)
+        model.load_state_dict(backbone_state)
+        model.fc = torch.nn.Linear(model.fc.in_features, num_classes)
+        torch.save(model.state_dict(), path)
+        return model.eval()
+
+    def test_heads_match_separate_models(self, tmp_path):
+        import torch
+        from torchvision import models
+        from ai.cnn.cnn_model import MultiHeadClassifier
+
+        torch.manual_seed(0)
+        backbone_state = models.resnet18(weights=None).state_dict()
+        asset = self._save_classifier(tmp_path / "asset.pth", backbone_state, 3)
+        action = self._save_classifier(tmp_path / "action.pth", backbone_state, 5)
+
+        shared = MultiHeadClassifier.from_checkpoints(
+            {"asset": (tmp_path / "asset.pth", 3), "action": (tmp_path / "action.pth", 5)}
+        ).eval()
+        batch = torch.rand(2, 3, 64, 64)
+        with torch.no_grad():
+            outputs = shared(batch)
+            torch.testing.assert_close(outputs["asset"], asset(batch))
+            torch.testing.assert_close(outputs["action"], action(batch))
+            torch.testing.assert_close(shared.head_model("action")(batch), action(batch))
+
+    def test_checkpoints_with_drifted_batchnorm_are_rejected(self, tmp_path):
+        import torch
+        from torchvision import models
+        from ai.cnn.cnn_model import MultiHeadClassifier
+
+        torch.manual_seed(0)
+        backbone_state = models.resnet18(weights=None).state_dict()
+        # Trained with BatchNorm in train mode: the running statistics moved.
+        drifted_state = {
+            k: v + 0.5 if "running_mean" in k else v for k, v in backbone_state.items()
+        }
+        self._save_classifier(tmp_path / "asset.pth", drifted_state, 3)
+        self._save_classifier(tmp_path / "action.pth", backbone_state, 5)
+        with pytest.raises(ValueError, match="different backbone"):
+            MultiHeadClassifier.from_checkpoints(
+                {"asset": (tmp_path / "asset.pth", 3), "action": (tmp_path / "action.pth", 5)}
+            )
+
+    def test_different_architectures_are_rejected(self, tmp_path):
+        import torch
+        from torchvision import models
+        from ai.cnn.cnn_model import MultiHeadClassifier, create_pytorch_model
+
+        backbone_state = models.resnet18(weights=None).state_dict()
+        self._save_classifier(tmp_path / "asset.pth", backbone_state, 3)
+        mobilenet = create_pytorch_model(5, pretrained=False, architecture="mobilenet_v3_small")
+        torch.save(mobilenet.state_dict(), tmp_path / "action.pth")
+        with pytest.raises(ValueError):
+            MultiHeadClassifier.from_checkpoints(
+                {"asset": (tmp_path / "asset.pth", 3), "action": (tmp_path / "action.pth", 5)}
+            )
+
+
+class TestModelTiers:
+    def test_mobilenet_tier_round_trips_through_a_checkpoint(self, tmp_path):
+        import torch
+        from ai.cnn.cnn_model import (
+            MultiHeadClassifier,
+            architecture_of,
+            classifier_head,
+            create_pytorch_model,
+            feature_extractor,
+        )
+
+        torch.manual_seed(0)
+        model = create_pytorch_model(3, pretrained=False, architecture="mobilenet_v3_small").eval()
+        assert classifier_head(model).out_features == 3
+        assert all(not param.requires_grad for param in model.features.parameters())
+        torch.save(model.state_dict(), tmp_path / "asset.pth")
+
+        state = torch.load(tmp_path / "asset.pth")
+        assert architecture_of(state) == "mobilenet_v3_small"
+        loaded = create_pytorch_model(3, pretrained=False, architecture=architecture_of(state))
+        loaded.load_state_dict(state)
+        loaded.eval()
+
+        batch = torch.rand(2, 3, 64, 64)
+        with torch.no_grad():
+            torch.testing.assert_close(loaded(batch), model(batch))
+            features = feature_extractor(loaded)(batch)
+            assert features.shape == (2, classifier_head(loaded).in_features)
+            torch.testing.assert_close(classifier_head(loaded)(features), model(batch))
+            # The extractor shares the weights and leaves the classifier intact.
+            assert loaded(batch).shape == (2, 3)
+
+            shared = MultiHeadClassifier.from_checkpoints({"asset": (tmp_path / "asset.pth", 3)})
+            torch.testing.assert_close(shared.eval()(batch)["asset"], model(batch))
+
+    def test_latency_report_without_data(self):
+        from ai.model_tiers import compare_tiers
+
+        report = compare_tiers(None, architectures=["mobilenet_v3_small"], runs=1)
+        metrics = report["mobilenet_v3_small"]
+        assert metrics["latency_ms"] > 0 and metrics["images_per_second"] > 0
+        assert metrics["val_accuracy"] is None
+
+
+class TestFeatureCache:
+    def test_features_are_cached_and_reused(self, tmp_path):
+        import cv2
+        import torch
+        from torchvision import datasets, transforms
+        from ai.cnn.cnn_model import extract_feature_cache, is_valid_image_file
+
+        for label in ("hat", "shoes"):
+            (tmp_path / "train" / label).mkdir(parents=True)
+            for i in range(3):
+                cv2.imwrite(
+                    str(tmp_path / "train" / label / f"{i}.png"),
+                    np.full((16, 16, 3), i * 40, dtype=np.uint8),
+                )
+        dataset = datasets.ImageFolder(str(tmp_path / "train"), is_valid_file=is_valid_image_file)
+        backbone = MagicMock(
+            wraps=torch.nn.Sequential(torch.nn.AdaptiveAvgPool2d(1), torch.nn.Flatten())
+        )
+        views = [(transforms.ToTensor(), 1), (transforms.ToTensor(), 2)]
+        prefix = str(tmp_path / "cache" / "train")
+
+        features, labels = extract_feature_cache(backbone, dataset, views, prefix, "cpu")
+        assert isinstance(features, np.memmap)
+        assert features.shape == (18, 3)
+        assert labels.tolist() == [0, 0, 0, 1, 1, 1] * 3
+        np.testing.assert_allclose(features[1], 40 / 255, rtol=1e-5)
+
+        calls = backbone.call_count
+        cached, cached_labels = extract_feature_cache(backbone, dataset, views, prefix, "cpu")
+        assert backbone.call_count == calls
+        np.testing.assert_array_equal(cached, features)
+        np.testing.assert_array_equal(cached_labels, labels)
+
+        # A different augmentation or seed changes the features, so the cache is rebuilt.
+        flipped = transforms.Compose([transforms.RandomHorizontalFlip(), transforms.ToTensor()])
+        augmented = [(transforms.ToTensor(), 1), (flipped, 2)]
+        extract_feature_cache(backbone, dataset, augmented, prefix, "cpu")
+        assert backbone.call_count > calls
+        calls = backbone.call_count
+        extract_feature_cache(backbone, dataset, augmented, prefix, "cpu", seed=1)
+        assert backbone.call_count > calls
+
+
+class TestImageCache:
+    def test_images_are_decoded_once_into_a_memmap(self, tmp_path):
+        import pickle
+        import cv2
+        from torchvision import datasets, transforms
+        from ai.cnn import cnn_model
+        from ai.cnn.cnn_model import CachedImageFolder, is_valid_image_file
+
+        for label in ("hat", "shoes"):
+            (tmp_path / "train" / label).mkdir(parents=True)
+            for i in range(2):
+                cv2.imwrite(
+                    str(tmp_path / "train" / label / f"{i}.png"),
+                    np.full((40, 80, 3), i * 100, dtype=np.uint8),
+                )
+        # Portrait, and wider than the cache keeps whole.
+        cv2.imwrite(str(tmp_path / "train" / "hat" / "tall.png"), np.zeros((48, 24, 3), np.uint8))
+        cv2.imwrite(str(tmp_path / "train" / "hat" / "wide.png"), np.zeros((10, 50, 3), np.uint8))
+        folder = datasets.ImageFolder(str(tmp_path / "train"), is_valid_file=is_valid_image_file)
+        prefix = str(tmp_path / "cache" / "train")
+
+        dataset = CachedImageFolder(folder, prefix, transforms.ToTensor(), size=32)
+        images = np.load(dataset.images_path, mmap_mode="r")
+        assert images.shape == (6, 32, 64, 3) and images.dtype == np.uint8
+        image, label = dataset[5]
+        # The whole 2:1 image, not a center square.
+        assert image.shape == (3, 32, 64) and label == 1
+        np.testing.assert_allclose(image.numpy(), 100 / 255, rtol=1e-5)
+        names = [os.path.basename(path) for path, _ in dataset.samples]
+        assert dataset[names.index("tall.png")][0].shape == (3, 64, 32)
+        assert dataset[names.index("wide.png")][0].shape == (3, 32, 64)
+        # DataLoader workers get the path, not a copy of the array.
+        assert pickle.loads(pickle.dumps(dataset))._images is None
+
+        with patch.object(cnn_model, "_decode_landscape") as decode:
+            CachedImageFolder(folder, prefix, size=32)
+        decode.assert_not_called()
+
+
+class TestEmbeddingIndex:
+    def test_search_persists_and_grows(self, tmp_path):
+        from ai.embedding_index import EmbeddingIndex
+
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(1500, 8)).astype(np.float32)
+        index = EmbeddingIndex(str(tmp_path / "index"), duplicate_threshold=0.99)
+        index.add([f"img_{i}" for i in range(1000)], vectors[:1000])
+        index.add([f"img_{i}" for i in range(1000, 1500)], vectors[1000:])  # grows the memmap
+
+        reopened = EmbeddingIndex(str(tmp_path / "index"), duplicate_threshold=0.99)
+        assert len(reopened) == 1500
+        results = reopened.search(vectors[[3, 1200]] * 5.0, k=3)
+        assert [matches[0][0] for matches in results] == ["img_3", "img_1200"]
+        assert results[0][0][1] == pytest.approx(1.0, abs=1e-5)
+        assert results[0][0][1] >= results[0][1][1] >= results[0][2][1]
+
+        near_copy = vectors[7] + 0.001
+        unrelated = -vectors[7]
+        duplicates = reopened.find_duplicates(np.stack([near_copy, unrelated]))
+        assert duplicates[0][0] == "img_7"
+        assert duplicates[1] is None
+
+    def test_prune_drops_stale_keys(self, tmp_path):
+        from ai.embedding_index import EmbeddingIndex
+
+        index = EmbeddingIndex(str(tmp_path / "index"))
+        index.add(["a", "b", "c"], np.eye(3, 4, dtype=np.float32))
+        assert index.prune(lambda key: key != "b") == 1
+
+        reopened = EmbeddingIndex(str(tmp_path / "index"))
+        assert reopened.keys == ["a", "c"]
+        assert [m[0][0] for m in reopened.search(np.eye(3, 4)[[0, 2]], k=1)] == ["a", "c"]
+
+    def test_backbone_change_resets_the_index(self, tmp_path):
+        from ai.embedding_index import EmbeddingIndex
+
+        index = EmbeddingIndex(str(tmp_path / "index"))
+        index.add(["a", "b"], np.eye(2, 8, dtype=np.float32))
+        assert index.find_duplicates(np.ones((1, 16), dtype=np.float32)) == [None]
+
+        index.add(["c"], np.ones((1, 16), dtype=np.float32))
+        reopened = EmbeddingIndex(str(tmp_path / "index"))
+        assert reopened.keys == ["c"]
+        assert reopened.vectors.shape == (1, 16)
+
+    def test_relative_index_dir_is_under_the_app_root(self, tmp_path, monkeypatch):
+        from ai import embedding_index
+        from ai.embedding_index import EmbeddingIndex
+
+        monkeypatch.chdir(tmp_path)
+        with patch.object(embedding_index, "app_root", return_value=str(tmp_path / "app")):
+            index = EmbeddingIndex.from_config({"index_dir": "cache/embeddings"})
+        assert index.index_dir == os.path.join(str(tmp_path / "app"), "cache/embeddings")
+        assert EmbeddingIndex.from_config({}).index_dir is None
+
+
+class TestClipActions:
+    def test_clip_probabilities_are_averaged(self):
+        pipeline = Pipeline.__new__(Pipeline)
+        pipeline.action_class_map = {0: "walk", 1: "dance"}
+        frame_probabilities = np.array(
+            [[0.9, 0.1], [0.2, 0.8], [0.3, 0.7], [0.6, 0.4]], dtype=np.float32
+        )
+        pipeline.suggest_actions = MagicMock(return_value=(None, frame_probabilities))
+
+        clips = [[np.zeros((4, 4, 3), np.uint8)] * 3, [], [np.zeros((4, 4, 3), np.uint8)]]
+        results = pipeline.suggest_clip_actions(clips)
+
+        assert len(pipeline.suggest_actions.call_args.args[0]) == 4
+        assert results[0][0] == "dance"
+        assert results[0][1] == pytest.approx(1.6 / 3)
+        assert results[1] == ("unknown_action", 0.0, None)
+        assert results[2][:2] == ("walk", pytest.approx(0.6))
+
+    def test_sample_clip_frames_spreads_over_the_clip(self, tmp_path):
+        import cv2
+        from tools.video_splitter import sample_clip_frames
+
+        path = str(tmp_path / "clip.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 32))
+        for i in range(40):
+            writer.write(np.full((32, 32, 3), i * 6, dtype=np.uint8))
+        writer.release()
+
+        frames = sample_clip_frames(path, num_frames=4, size=(16, 16))
+        assert [frame.shape for frame in frames] == [(16, 16, 3)] * 4
+        # Middles of four 10-frame segments: frames 5, 15, 25 and 35.
+        assert [int(round(frame.mean() / 6)) for frame in frames] == [5, 15, 25, 35]
+
+
+class TestShardedInference:
+    def test_from_config(self):
+        from ai.sharded_inference import ShardedInference
+
+        assert ShardedInference.from_config({}) is None
+        assert ShardedInference.from_config({"sharding": {"workers": 1}}) is None
+        shards = ShardedInference.from_config({"sharding": {"workers": 4, "threads_per_worker": 2}})
+        assert (shards.num_workers, shards.threads_per_worker) == (4, 2)
+
+    def test_shards_are_merged_in_input_order(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from ai import sharded_inference
+        from ai.sharded_inference import ShardedInference
+
+        worker_pipeline = MagicMock()
+        worker_pipeline.suggest_actions.side_effect = lambda images, batch_size: (
+            [f"a{int(image[0])}" for image in images],
+            np.array([[image[0]] for image in images], dtype=np.float32),
+        )
+        shards = ShardedInference({}, num_workers=3)
+        shards._executor = ThreadPoolExecutor(3)
+        images = [np.array([i]) for i in range(10)]
+        with patch.object(sharded_inference, "_worker_pipeline", worker_pipeline):
+            labels, probabilities = shards.classify("suggest_actions", images, batch_size=3)
+        shards.close()
+
+        assert worker_pipeline.suggest_actions.call_count == 4
+        assert labels == [f"a{i}" for i in range(10)]
+        assert probabilities[:, 0].tolist() == list(range(10))
+
+
+class TestInferenceService:
+    def test_requests_round_trip_over_the_socket(self):
+        import threading
+        from multiprocessing.connection import Listener
+        from ai.inference_service import InferenceClient, InferenceServer
+
+        server = InferenceServer.__new__(InferenceServer)
+        server.pipeline = MagicMock()
+        server.pipeline.classify_assets.side_effect = lambda images, batch_size: (
+            [f"a{int(image[0])}" for image in images],
+            np.array([[image[0]] for image in images], dtype=np.float32),
+        )
+        server._lock = threading.Lock()
+        server._clients_lock = threading.Lock()
+        server._clients, server._idle_since, server.idle_timeout = 0, 0.0, 0.05
+        server.authkey = b"test"
+        server.address = ("127.0.0.1", 0)
+        server._listener = Listener(server.address, authkey=server.authkey)
+        host, port = server._listener.address
+        thread = threading.Thread(
+            target=lambda: server._serve_client(server._listener.accept()), daemon=True
+        )
+        thread.start()
+
+        client = InferenceClient(b"test", f"{host}:{port}")
+        labels, probabilities = client.request("classify_assets", [np.array([i]) for i in range(3)])
+        assert labels == ["a0", "a1", "a2"]
+        assert probabilities[:, 0].tolist() == [0, 1, 2]
+        with pytest.raises(RuntimeError, match="Unknown inference op"):
+            client.request("train")
+        # A connected client keeps the service alive however long it is idle.
+        assert server.clients == 1 and not server.idle_expired()
+        client.close()
+        thread.join(timeout=5)
+        assert server.clients == 0
+        time.sleep(0.1)
+        assert server.idle_expired()
+        server.close()
+
+    def test_crashed_autostart_is_reported_at_once(self, tmp_path):
+        import socket
+        from ai import inference_service
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]  # nothing listens here afterwards
+        process = MagicMock(pid=1)
+        process.poll.return_value = 1
+        service_config = {
+            "address": f"127.0.0.1:{port}",
+            "authkey_file": str(tmp_path / "service.key"),
+            "startup_timeout": 120,
+        }
+        with patch.object(inference_service.subprocess, "Popen", return_value=process) as popen:
+            start = time.monotonic()
+            assert inference_service.connect_to_service(service_config) == (None, None)
+        assert time.monotonic() - start < 10
+        assert popen.call_args.kwargs["stderr"] is not inference_service.subprocess.DEVNULL
+        process.terminate.assert_not_called()
+
+    def test_authkey_is_created_once_for_the_owner(self):
+        from ai.inference_service import load_authkey
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "service", "inference_service.key")
+            assert load_authkey(path) is None
+            key = load_authkey(path, create=True)
+            assert len(key) == 64
+            assert load_authkey(path, create=True) == key
+            if os.name == "posix":
+                assert os.stat(path).st_mode & 0o777 == 0o600
+
+    def test_pipeline_falls_back_to_local_models(self):
+        pipeline = Pipeline(MagicMock(), {"service": {"enabled": True}})
+        service = MagicMock()
+        service.request.side_effect = ConnectionError("service stopped")
+        info = {"pid": 1, "yolo": None, "asset_class_map": {0: "hat"}, "action_class_map": {}}
+
+        with patch("ai.pipeline.connect_to_service", return_value=(service, info)):
+            pipeline.load_models()
+        assert pipeline.service is service
+
+        with patch.object(Pipeline, "_load_yolo_model", return_value=None), patch.object(
+            Pipeline, "_load_shared_classifiers", return_value=None
+        ), patch.object(Pipeline, "_load_cnn_model", return_value=(None, {})):
+            assert pipeline.classify_asset(np.zeros((8, 8, 3), dtype=np.uint8)) == "unknown_asset"
+
+        assert pipeline.service is None
+        # Only disconnects: other app instances may still be using the service.
+        service.close.assert_called_once()
+        service.stop_server.assert_not_called()
@@ -0,0 +1,184 @@
+import cv2
+import numpy as np
+import torch
+from unittest.mock import patch, MagicMock
+from ai.yolo.yolo_model import YOLOModel
+from ai.yolo.detection_store import DetectionStore
+from gui.components.workers import FrameExtractorWorker, YOLOWorker, SimilarAssetWorker
+
+
+class TestFrameExtractorWorker:
+    @patch("gui.components.workers.extract_frames")
+    def test_parallel_clips_keep_clip_order(self, mock_extract):
+        def fake_extract(video_path, progress_callback=None, **kwargs):
+            progress_callback(50)
+            return [f"{video_path}_frame_1.jpg", f"{video_path}_frame_2.jpg"]
+
+        mock_extract.side_effect = fake_extract
+        clips = [f"clip{i}" for i in range(6)]
+        worker = FrameExtractorWorker(clips, "out", max_parallel_clips=3, score_workers=1)
+
+        finished, progress = [], []
+        worker.finished.connect(finished.append)
+        worker.progress.connect(progress.append)
+        worker.run()
+
+        assert mock_extract.call_count == 6
+        assert finished[0] == [f"clip{i}_frame_{n}.jpg" for i in range(6) for n in (1, 2)]
+        assert progress[-1] == 100
+
+
+def _fake_result(boxes):
+    result = MagicMock()
+    result.boxes.conf = torch.tensor([conf for conf, _, _ in boxes])
+    result.boxes.cls = torch.tensor([float(cls) for _, cls, _ in boxes])
+    result.boxes.xyxy = torch.tensor([bbox for _, _, bbox in boxes], dtype=torch.float32)
+    result.boxes.__len__.return_value = len(boxes)
+    return result
+
+
+class TestYOLOWorker:
+    def test_predict_batch_chunks_images(self):
+        yolo = YOLOModel.__new__(YOLOModel)
+        yolo.detector = None
+        yolo.model = MagicMock(side_effect=lambda batch, verbose: [len(batch)] * len(batch))
+        assert yolo.predict_batch([object()] * 5, batch_size=2) == [2, 2, 2, 2, 1]
+        assert yolo.model.call_count == 3
+
+    def test_batched_detection_keeps_per_frame_results(self, tmp_path):
+        paths = []
+        for i in range(3):
+            path = str(tmp_path / f"frame_{i}.jpg")
+            cv2.imwrite(path, np.full((100, 200, 3), i, dtype=np.uint8))
+            paths.append(path)
+        paths.append(str(tmp_path / "missing.jpg"))
+
+        model = MagicMock(weights_id="w1")
+        model.class_names = ["person", "hat"]
+        model.predict_batch.side_effect = lambda images, batch_size, conf: [
+            _fake_result([(0.9, 1, [20.0, 10.0, 60.0, 50.0]), (0.05, 0, [0.0, 0.0, 1.0, 1.0])])
+            for _ in images
+        ]
+        pipeline = MagicMock(yolo_model=model)
+        store = DetectionStore(str(tmp_path / "store"))
+
+        def analyze(conf_threshold):
+            worker = YOLOWorker(
+                pipeline, paths, batch_size=2, conf_threshold=conf_threshold, detection_store=store
+            )
+            finished = []
+            worker.finished.connect(finished.append)
+            worker.run()
+            return finished[0]
+
+        results = analyze(0.10)
+        assert list(results) == paths
+        assert model.predict_batch.call_count == 2
+        assert model.predict_batch.call_args.kwargs["conf"] == store.conf_floor
+        detections = results[paths[0]]["detections"]
+        assert [d["label"] for d in detections] == ["hat"]
+        with open(results[paths[0]]["label_path"]) as f:
+            assert f.read() == "0 0.200000 0.300000 0.200000 0.400000\n"
+        assert len(results[paths[3]]["detections"]) == 0
+        assert results[paths[3]]["label_path"] is None
+
+        # A lower threshold is answered from the store (here a fresh one reading from disk).
+        store = DetectionStore(str(tmp_path / "store"))
+        results = analyze(0.01)
+        assert model.predict_batch.call_count == 2
+        assert [d["label"] for d in results[paths[2]]["detections"]] == ["hat", "person"]
+
+    def test_sharded_model_gets_one_batch_per_worker(self, tmp_path):
+        from concurrent.futures import ThreadPoolExecutor
+        from ai import sharded_inference
+        from ai.sharded_inference import ShardedInference
+
+        paths = []
+        for i in range(8):
+            path = str(tmp_path / f"frame_{i}.jpg")
+            cv2.imwrite(path, np.full((32, 32, 3), i * 20, dtype=np.uint8))
+            paths.append(path)
+
+        yolo = YOLOModel.__new__(YOLOModel)
+        yolo.model, yolo.detector, yolo.class_names = MagicMock(), None, ["person", "hat"]
+        yolo._weights_id = "w1"
+        yolo.shards = ShardedInference({}, num_workers=2)
+        yolo.shards._executor = ThreadPoolExecutor(2)
+        worker_pipeline = MagicMock()
+        worker_pipeline.yolo_model.predict_batch.side_effect = lambda images, batch_size, conf: [
+            _fake_result([(0.9, 1, [1.0, 1.0, 8.0, 8.0])]) for _ in images
+        ]
+        worker = YOLOWorker(
+            MagicMock(yolo_model=yolo),
+            paths,
+            batch_size=2,
+            detection_store=DetectionStore(str(tmp_path / "store")),
+        )
+        finished = []
+        worker.finished.connect(finished.append)
+        with patch.object(sharded_inference, "_worker_pipeline", worker_pipeline):
+            worker.run()
+        yolo.shards.close()
+
+        # Two calls of two worker batches each; the in-process model is never used.
+        assert worker_pipeline.yolo_model.predict_batch.call_count == 4
+        yolo.model.assert_not_called()
+        assert [d["label"] for d in finished[0][paths[7]]["detections"]] == ["hat"]
+
+
+class TestSimilarAssetWorker:
+    def test_reports_the_closest_collected_asset(self):
+        from ai.embedding_index import EmbeddingIndex
+
+        pipeline = MagicMock()
+        pipeline.embedding_index = EmbeddingIndex(None, duplicate_threshold=0.9)
+        pipeline.embedding_index.add(["pool/a.png"], np.array([[1.0, 0.0]]))
+        pipeline.embed.return_value = np.array([[1.0, 0.01]], dtype=np.float32)
+        results = []
+
+        worker = SimilarAssetWorker(pipeline, np.zeros((8, 8, 3), np.uint8), request_id=3)
+        worker.finished.connect(lambda *args: results.append(args))
+        worker.run()
+        pipeline.embed.side_effect = RuntimeError("no classifier")
+        worker.run()
+
+        assert results[0][0] == 3 and results[0][1][0] == "pool/a.png"
+        assert results[1] == (3, None)
+
+
+class TestDetections:
+    def test_filters_serialize_and_dict_views(self, tmp_path):
+        from ai.yolo.detections import Detections
+
+        detections = Detections.from_result(
+            _fake_result(
+                [
+                    (0.9, 1, [20.0, 10.0, 60.0, 50.0]),
+                    (0.05, 0, [0.0, 0.0, 1.0, 1.0]),
+                    (0.6, 0, [100.0, 0.0, 200.0, 100.0]),
+                ]
+            ),
+            (100, 200),
+            ["person", "hat"],
+        )
+        assert detections.data.dtype.itemsize == 22
+
+        confident = detections.above(0.10)
+        assert confident.labels == ["hat", "person"]
+        assert len(confident.of_classes(["person"])) == 1
+        assert len(detections.of_classes([1, "dog"])) == 1
+
+        assert confident.to_dicts()[0] == {
+            "bbox": (20.0, 10.0, 60.0, 50.0),
+            "label": "hat",
+            "confidence": confident.conf[0].item(),
+        }
+        assert [d["label"] for d in confident] == ["hat", "person"]
+
+        label_path = confident.write_labels(str(tmp_path / "frame.txt"))
+        with open(label_path) as f:
+            assert f.read().splitlines() == [
+                "1 0.200000 0.300000 0.200000 0.400000",
+                "0 0.750000 0.500000 0.500000 1.000000",
+            ]
+        assert confident.to_yolo_labels(class_id=0).startswith("0 0.200000")
@@ -0,0 +1,154 @@
+# GameMediaTool/tools/extraction_cache.py
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from .logger import get_logger
+from .frame_scorer import FRAME_METRICS_DTYPE
+from utils.file_ops import ensure_folder
+
+logger = get_logger("ExtractionCache")
+
+# Bytes hashed from the start and the end of a video for its fingerprint.
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+STAGING_SUFFIX = ".tmp"
+
+
+def app_root() -> str:
+    """The folder relative cache paths live in: next to the executable when frozen."""
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def video_fingerprint(video_path: str) -> str:
+    """
+    Fingerprints a video by size, modification time and a hash of its first and
+    last megabyte. Cheap even for multi-gigabyte files.
+    """
+    stat = os.stat(video_path)
+    digest = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    with open(video_path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_CHUNK_SIZE))
+        if stat.st_size > FINGERPRINT_CHUNK_SIZE:
+            f.seek(max(FINGERPRINT_CHUNK_SIZE, stat.st_size - FINGERPRINT_CHUNK_SIZE))
+            digest.update(f.read(FINGERPRINT_CHUNK_SIZE))
+    return digest.hexdigest()
+
+
+class CachedExtraction:
+    """
+    A completed cache entry: the stored candidate frames with their candidate numbers
+    and quality metrics (FRAME_METRICS_DTYPE records, including sharpness and dHash).
+    """
+
+    def __init__(self, folder: str, names, indices, metrics, score_floor: float):
+        self.folder = folder
+        self.names = names
+        self.indices = indices
+        self.metrics = metrics
+        self.score_floor = score_floor
+
+    def __len__(self):
+        return len(self.names)
+
+    def path(self, i: int) -> str:
+        return os.path.join(self.folder, str(self.names[i]))
+
+
+class ExtractionCache:
+    """
+    Persistent, content-addressed cache of frame extractions.
+
+    An entry is keyed by the video fingerprint plus the parameters that decide which
+    candidates FFmpeg produces and how they are scored. The blur threshold and the
+    dedup distance are not part of the key: every candidate scoring at least
+    score_floor is stored with its metrics and hash, so those filters (and top-K
+    selection) are re-applied from the cache without decoding the video again.
+    """
+
+    INDEX_FILE = "index.npz"
+    META_FILE = "meta.json"
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.join(app_root(), cache_dir)
+        ensure_folder(self.cache_dir)
+
+    def key_for(self, video_path: str, params: dict) -> str:
+        payload = json.dumps(
+            {"video": video_fingerprint(video_path), "params": params}, sort_keys=True
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def entry_folder(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key: str):
+        """Returns the CachedExtraction for key, or None if there is no complete entry."""
+        folder = self.entry_folder(key)
+        index_path = os.path.join(folder, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with np.load(index_path) as index:
+                return CachedExtraction(
+                    folder,
+                    index["names"],
+                    index["indices"],
+                    index["metrics"],
+                    float(index["score_floor"]),
+                )
+        except Exception as e:
+            logger.error(f"Corrupt extraction cache entry {folder}: {e}")
+            return None
+
+    def prepare(self, key: str) -> str:
+        """
+        Returns a new, private staging folder to extract the entry of key into.
+        Concurrent extractions of the same clip each get their own folder; store()
+        publishes one of them.
+        """
+        return tempfile.mkdtemp(prefix=f"{key}.", suffix=STAGING_SUFFIX, dir=self.cache_dir)
+
+    def discard(self, staging_folder: str):
+        shutil.rmtree(staging_folder, ignore_errors=True)
+
+    def store(
+        self, key: str, staging_folder: str, paths, indices, metrics, score_floor: float, meta: dict
+    ):
+        """
+        Writes the index of a finished extraction into its staging folder and moves
+        the folder into place with os.replace, so an entry folder is either complete
+        or absent. If another extraction of the same key published first, its entry
+        is kept and this one is discarded.
+        """
+        with open(os.path.join(staging_folder, self.META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=4)
+        np.savez(
+            os.path.join(staging_folder, self.INDEX_FILE),
+            names=np.array([os.path.basename(p) for p in paths], dtype=str),
+            indices=np.asarray(indices, dtype=np.int64),
+            metrics=np.asarray(metrics, dtype=FRAME_METRICS_DTYPE),
+            score_floor=np.float64(score_floor),
+        )
+        folder = self.entry_folder(key)
+        published = self.load(key)
+        if published is not None and published.score_floor <= score_floor:
+            self.discard(staging_folder)
+            return published
+        # Make way for an entry kept at a higher floor, or one left without an index.
+        if os.path.isdir(folder):
+            shutil.rmtree(folder, ignore_errors=True)
+        try:
+            os.replace(staging_folder, folder)
+        except OSError as e:
+            # Lost the race to a concurrent extraction of the same clip: use its entry.
+            logger.info(f"Extraction cache entry {key} was published concurrently: {e}")
+            self.discard(staging_folder)
+            return self.load(key)
+        logger.info(f"Stored {len(paths)} frames in extraction cache entry {key}.")
+        return self.load(key)
@@ -0,0 +1,184 @@
+# GameMediaTool/tools/ffmpeg_runner.py
+
+import os
+import subprocess
+import threading
+from collections import deque
+from .logger import get_logger
+
+logger = get_logger("FFmpegRunner")
+
+
+def get_startupinfo():
+    """Hides the console window of child processes on Windows."""
+    startupinfo = None
+    if os.name == "nt":
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        startupinfo.wShowWindow = subprocess.SW_HIDE
+    return startupinfo
+
+
+def with_progress_args(command, target="pipe:1"):
+    """
+    Inserts the global options that make FFmpeg write machine-readable progress
+    blocks to target right after the FFmpeg executable.
+    """
+    return [command[0], "-progress", target, "-nostats", *command[1:]]
+
+
+def _parse_float(value):
+    try:
+        return float(value.rstrip("x"))
+    except (AttributeError, ValueError):
+        return None
+
+
+class FFmpegProgressParser:
+    """
+    Parses the key=value blocks FFmpeg writes with -progress. Every block ends with
+    a progress=continue|end line, at which point a stats snapshot is produced:
+    out_time (s), frame, fps, speed (x realtime), percent and eta_seconds (when the
+    media duration is known) and finished.
+    """
+
+    def __init__(self, duration: float = None):
+        self.duration = duration if duration and duration > 0 else None
+        self._fields = {}
+        self._buffer = ""
+
+    def feed_line(self, line: str):
+        """Consumes one line. Returns a stats snapshot when a block is complete, else None."""
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return None
+        self._fields[key] = value
+        if key != "progress":
+            return None
+        snapshot = self._snapshot(finished=value == "end")
+        self._fields = {}
+        return snapshot
+
+    def feed(self, text: str):
+        """
+        Consumes an arbitrary chunk of output (e.g. read from a QProcess).
+        Returns the snapshots of all blocks completed by this chunk.
+        """
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        snapshots = [self.feed_line(line) for line in lines]
+        return [s for s in snapshots if s is not None]
+
+    def _snapshot(self, finished: bool) -> dict:
+        # out_time_us and (despite its name) out_time_ms are both in microseconds.
+        out_time_us = _parse_float(self._fields.get("out_time_us", self._fields.get("out_time_ms")))
+        out_time = out_time_us / 1_000_000 if out_time_us and out_time_us > 0 else 0.0
+        frame = _parse_float(self._fields.get("frame"))
+        speed = _parse_float(self._fields.get("speed"))
+
+        percent = None
+        eta_seconds = None
+        if self.duration:
+            percent = 100 if finished else min(100, int(out_time / self.duration * 100))
+            if speed:
+                eta_seconds = max(0.0, (self.duration - out_time) / speed)
+
+        return {
+            "out_time": out_time,
+            "frame": int(frame) if frame is not None else None,
+            "fps": _parse_float(self._fields.get("fps")),
+            "speed": speed,
+            "percent": percent,
+            "eta_seconds": eta_seconds,
+            "finished": finished,
+        }
+
+
+def format_ffmpeg_stats(stats: dict) -> str:
+    """Formats a stats snapshot for display, e.g. '142 fps | 4.7x realtime | ETA 0:35'."""
+    parts = []
+    if stats.get("fps"):
+        parts.append(f"{stats['fps']:.0f} fps")
+    if stats.get("speed"):
+        parts.append(f"{stats['speed']:.1f}x realtime")
+    if stats.get("eta_seconds") is not None:
+        minutes, seconds = divmod(int(stats["eta_seconds"]), 60)
+        parts.append(f"ETA {minutes}:{seconds:02d}")
+    return " | ".join(parts)
+
+
+def read_progress(stream, parser: FFmpegProgressParser, on_stats, tail: deque = None):
+    """
+    Reads a text stream line by line on a daemon thread, passing every stats snapshot to
+    on_stats. Lines that are not progress output are kept in tail (for error reporting).
+    Returns the thread.
+    """
+
+    def reader():
+        for line in stream:
+            snapshot = parser.feed_line(line)
+            if snapshot is not None:
+                on_stats(snapshot)
+            elif tail is not None and "=" not in line:
+                tail.append(line.rstrip())
+
+    thread = threading.Thread(target=reader, name="FFmpegProgressReader", daemon=True)
+    thread.start()
+    return thread
+
+
+def run_ffmpeg(command, duration: float = None, progress_callback=None, stats_callback=None):
+    """
+    Runs an FFmpeg command with -progress pipe:1 and reports progress while it runs.
+
+    Args:
+        command (list): The FFmpeg command; command[0] is the executable.
+        duration (float): Media duration in seconds, used for percent and ETA.
+        progress_callback: Called with an int percentage (0-100) when the duration is known.
+        stats_callback: Called with every stats snapshot (see FFmpegProgressParser).
+
+    Returns:
+        tuple: (success, error_output)
+    """
+    full_command = with_progress_args(command)
+    parser = FFmpegProgressParser(duration)
+    stderr_tail = deque(maxlen=50)
+
+    def on_stats(stats):
+        if progress_callback and stats["percent"] is not None:
+            progress_callback(stats["percent"])
+        if stats_callback:
+            stats_callback(stats)
+
+    try:
+        process = subprocess.Popen(
+            full_command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+            startupinfo=get_startupinfo(),
+        )
+    except (OSError, ValueError) as e:
+        logger.error(f"FFmpeg command failed: {' '.join(command)}. Error: {e}")
+        return False, str(e)
+
+    stderr_thread = threading.Thread(
+        target=lambda: stderr_tail.extend(line.rstrip() for line in process.stderr),
+        name="FFmpegStderrReader",
+        daemon=True,
+    )
+    stderr_thread.start()
+    read_progress(process.stdout, parser, on_stats).join()
+    return_code = process.wait()
+    stderr_thread.join()
+
+    error_output = "\n".join(stderr_tail)
+    if return_code != 0:
+        logger.error(
+            f"FFmpeg command failed with exit code {return_code}: {' '.join(command)}\n"
+            f"Stderr: {error_output}"
+        )
+        return False, error_output
+    return True, ""
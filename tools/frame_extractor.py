@@ -1,13 +1,26 @@
 ﻿# GameMediaTool/tools/frame_extractor.py (Corrected - cleanup logic removed)
 
+import io
 import os
 import sys
 import shutil
 import subprocess
 import cv2
 import numpy as np
+from collections import deque
 from pathlib import Path
 from .logger import get_logger
+from .ffmpeg_runner import (
+    FFmpegProgressParser,
+    get_startupinfo,
+    read_progress,
+    run_ffmpeg,
+    with_progress_args,
+)
+from .frame_scorer import FRAME_METRICS_DTYPE, SharpnessScorer
+from .frame_hasher import NearDuplicateGroups
+from .frame_selector import QualityWindowSelector, create_selector
+from .extraction_cache import ExtractionCache
 from utils.file_ops import ensure_folder
 
 logger = get_logger("FFmpegFrameExtractor")
@@ -19,36 +32,317 @@ else:
     FFMPEG_PATH = "F:/ffmpeg-8.0-essentials_build/bin/ffmpeg.exe"
 
 
-def _run_ffmpeg_command(command):
+def _build_sampling_args(sampling_mode: str, interval_seconds, scene_threshold: float):
+    """
+    Returns (input_args, output_args) for the FFmpeg frame sampler.
+
+    - interval: one frame every interval_seconds (decodes the whole stream).
+    - scene: frames whose scene-change score exceeds scene_threshold.
+    - keyframes: I-frames only; -skip_frame nokey lets the decoder skip everything else.
+    """
+    if sampling_mode == "scene":
+        return [], ["-vf", f"select='gt(scene,{scene_threshold})'", "-fps_mode", "vfr"]
+    if sampling_mode == "keyframes":
+        return ["-skip_frame", "nokey"], ["-fps_mode", "vfr"]
+    if sampling_mode != "interval":
+        logger.warning(f"Unknown sampling mode '{sampling_mode}', falling back to 'interval'.")
+    return [], ["-vf", f"fps=1/{interval_seconds}"]
+
+
+def _with_output_size(sampler_args: list, width: int, height: int) -> list:
+    """
+    Appends scale=width:height,setsar=1 to the sampler's -vf chain (or adds one), so
+    every frame FFmpeg emits has exactly the probed size whatever the stream's sample
+    aspect ratio.
+    """
+    size_filter = f"scale={width}:{height},setsar=1"
+    args = list(sampler_args)
+    if "-vf" in args:
+        index = args.index("-vf") + 1
+        args[index] = f"{args[index]},{size_filter}"
+        return args
+    return ["-vf", size_filter, *args]
+
+
+def _probe_video(video_path: str):
+    """
+    Returns (width, height, duration_seconds) of a video using OpenCV, or None if
+    the video cannot be opened. width and height are the displayed size: FFmpeg
+    autorotates, so they are swapped when the display matrix turns the frame by
+    90 or 270 degrees.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    rotation = 0
+    if hasattr(cv2, "CAP_PROP_ORIENTATION_META"):
+        # Read the coded size and apply the rotation ourselves, whatever the OpenCV default.
+        cap.set(cv2.CAP_PROP_ORIENTATION_AUTO, 0)
+        rotation = int(cap.get(cv2.CAP_PROP_ORIENTATION_META)) % 180
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if rotation:
+        width, height = height, width
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    cap.release()
+    if width <= 0 or height <= 0:
+        return None
+    duration = frame_count / fps if fps > 0 else 0.0
+    return width, height, duration
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.error(f"Could not delete frame {path}: {e}")
+
+
+def _keep_sharp_frame(
+    groups: NearDuplicateGroups, frame_hash, score: float, store, record=None, can_replace=None
+):
+    """
+    Routes a sharp candidate through near-duplicate grouping. store() saves the
+    candidate and returns its final path, or None on failure. If can_replace(group)
+    is False, a better near-duplicate starts a new group instead of replacing that
+    group's frame. Returns the group the candidate now represents, or None if it was
+    not kept.
+    """
+    group = groups.offer(frame_hash, score)
+    if group is None:
+        return None
+    if group >= 0 and can_replace is not None and not can_replace(group):
+        group = -1
+    final_path = store()
+    if final_path is None:
+        return None
+    if group < 0:
+        return groups.add(frame_hash, score, final_path, record)
+    old_path = groups.replace(group, frame_hash, score, final_path, record)
+    if old_path is not None:
+        _remove_file(old_path)
+    return group
+
+
+def _candidate_time(candidate_index: int, interval_seconds) -> float:
+    """
+    Timestamp of a candidate under interval sampling. Scene and keyframe candidates
+    are not evenly spaced, so windowed selection is not offered for them (see
+    _selection_mode_for).
+    """
+    return (candidate_index - 1) * float(interval_seconds)
+
+
+def _selection_mode_for(selection_mode: str, sampling_mode: str) -> str:
+    """
+    "top_k_window" needs candidate timestamps, which are only known for interval
+    sampling; with scene or keyframe sampling it falls back to "top_n".
+    """
+    if selection_mode == "top_k_window" and sampling_mode in ("scene", "keyframes"):
+        logger.warning(
+            f"'top_k_window' selection needs interval sampling, not '{sampling_mode}'; "
+            "using 'top_n' instead."
+        )
+        return "top_n"
+    return selection_mode
+
+
+def _select_frame(
+    groups: NearDuplicateGroups,
+    selector: QualityWindowSelector,
+    candidate_index: int,
+    interval_seconds,
+    metrics,
+    store,
+) -> bool:
+    """
+    Keeps a candidate that passed the sharpness filter. Candidates are ranked by
+    sharpness, or by the combined quality score when a top-K selector is active.
+    Returns True if the candidate was kept.
+    """
+    record = (candidate_index, metrics)
+    if selector is None:
+        group = _keep_sharp_frame(groups, metrics["dhash"], metrics["sharpness"], store, record)
+        return group is not None
+
+    timestamp = _candidate_time(candidate_index, interval_seconds)
+    score = metrics["quality"]
+    if not selector.admit(timestamp, score):
+        return False
+    group = _keep_sharp_frame(
+        groups,
+        metrics["dhash"],
+        score,
+        store,
+        record,
+        can_replace=lambda group: selector.can_replace(group, timestamp),
+    )
+    if group is None:
+        return False
+    selector.add(group, timestamp)
+    return True
+
+
+def _score_batch(scorer: SharpnessScorer, batch, full: bool, from_files: bool) -> np.ndarray:
+    """
+    Returns FRAME_METRICS_DTYPE records for a batch of frames or image files.
+    Without full, only the sharpness is measured.
+    """
+    if full:
+        return scorer.analyze_files(batch) if from_files else scorer.analyze_frames(batch)
+    metrics = np.zeros(len(batch), dtype=FRAME_METRICS_DTYPE)
+    metrics["sharpness"] = scorer.score_files(batch) if from_files else scorer.score_frames(batch)
+    return metrics
+
+
+def _extract_frames_streaming(
+    video_path: str,
+    output_folder: str,
+    progress_callback,
+    blur_threshold: float,
+    interval_seconds,
+    scorer: SharpnessScorer,
+    groups: NearDuplicateGroups,
+    sampling_mode: str = "interval",
+    scene_threshold: float = 0.3,
+    stats_callback=None,
+    selector: QualityWindowSelector = None,
+):
+    """
+    Streams raw BGR frames from FFmpeg over a pipe and scores them in memory.
+    Frames are scored in batches on the scorer's thread pool; only the frames that
+    pass the sharpness filter (and are the best of their near-duplicate group and,
+    with a selector, of their time window) are encoded to disk.
+    """
+    probe = _probe_video(video_path)
+    if probe is None:
+        logger.error(f"Could not read video dimensions for streaming extraction: {video_path}")
+        return []
+    width, height, duration = probe
+    frame_size = width * height * 3
+    ensure_folder(output_folder)
+    video_name = Path(video_path).stem
+    input_args, sampler_args = _build_sampling_args(
+        sampling_mode, interval_seconds, scene_threshold
+    )
+    # stdout carries the raw frames, so FFmpeg reports its progress on stderr instead.
+    command = with_progress_args(
+        [
+            FFMPEG_PATH,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            *input_args,
+            "-i",
+            video_path,
+            *_with_output_size(sampler_args, width, height),
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "bgr24",
+            "pipe:1",
+        ],
+        target="pipe:2",
+    )
+
+    logger.info("Starting streaming extraction (FFmpeg rawvideo pipe + in-memory filtering)...")
+    if progress_callback:
+        progress_callback(10)
+
     try:
-        startupinfo = None
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        subprocess.run(
+        process = subprocess.Popen(
             command,
-            check=True,
-            startupinfo=startupinfo,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            startupinfo=get_startupinfo(),
+            bufsize=frame_size,
         )
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+    except (OSError, ValueError) as e:
         logger.error(f"FFmpeg command failed: {' '.join(command)}. Error: {e}")
-        return False
+        return []
+
+    def on_stats(stats):
+        if progress_callback and stats["percent"] is not None:
+            progress_callback(10 + int(stats["percent"] * 0.9))
+        if stats_callback:
+            stats_callback(stats)
+
+    stderr_tail = deque(maxlen=50)
+    progress_thread = read_progress(
+        io.TextIOWrapper(process.stderr, encoding="utf-8", errors="ignore"),
+        FFmpegProgressParser(duration),
+        on_stats,
+        stderr_tail,
+    )
+
+    candidate_index = 0
+    batch = []
+
+    def write_frame(index, frame):
+        final_path = os.path.join(output_folder, f"{video_name}_frame_{index:05d}.jpg")
+        if cv2.imwrite(final_path, frame, [cv2.IMWRITE_JPEG_QUALITY, 95]):
+            return final_path
+        logger.error(f"Could not write sharp frame {final_path}")
+        return None
 
+    full_metrics = groups.needs_hashes or selector is not None
+
+    def flush_batch():
+        frames = [frame for _, frame in batch]
+        metrics = _score_batch(scorer, frames, full_metrics, from_files=False)
+        for (index, frame), frame_metrics in zip(batch, metrics):
+            if frame_metrics["sharpness"] >= blur_threshold:
+                _select_frame(
+                    groups,
+                    selector,
+                    index,
+                    interval_seconds,
+                    frame_metrics,
+                    lambda: write_frame(index, frame),
+                )
+        batch.clear()
 
-def _calculate_blurriness(image_path: str, threshold: float) -> bool:
     try:
-        image = cv2.imread(image_path)
-        if image is None:
-            return False
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        variance = cv2.Laplacian(gray, cv2.CV_64F).var()
-        return variance >= threshold
-    except Exception as e:
-        logger.error(f"Failed to calculate blurriness for {image_path}: {e}")
-        return False
+        while True:
+            raw = process.stdout.read(frame_size)
+            if len(raw) < frame_size:
+                break
+            candidate_index += 1
+            batch.append(
+                (candidate_index, np.frombuffer(raw, dtype=np.uint8).reshape((height, width, 3)))
+            )
+            if len(batch) >= scorer.max_workers:
+                flush_batch()
+        if batch:
+            flush_batch()
+    finally:
+        process.stdout.close()
+        return_code = process.wait()
+        progress_thread.join()
+
+    final_frames = groups.kept_paths()
+    if return_code != 0:
+        logger.error(
+            f"FFmpeg streaming extraction exited with code {return_code}. "
+            f"Stderr: {' '.join(stderr_tail)}"
+        )
+        if not final_frames:
+            return []
+
+    logger.info(
+        f"Streaming extraction complete. Scored {candidate_index} candidates, "
+        f"kept {len(final_frames)} high-quality frames "
+        f"({_dropped_summary(groups, selector)})."
+    )
+    return final_frames
+
+
+def _dropped_summary(groups: NearDuplicateGroups, selector: QualityWindowSelector) -> str:
+    summary = f"{groups.dropped} near-duplicates dropped"
+    if selector is not None:
+        summary += f", {selector.evicted} dropped by top-{selector.top_k} selection"
+    return summary
 
 
 def extract_frames(
@@ -57,7 +351,51 @@ def extract_frames(
     progress_callback=None,
     blur_threshold=60.0,
     interval_seconds=2,
+    streaming=False,
+    score_workers=None,
+    sharpness_proxy_width=None,
+    sampling_mode="interval",
+    scene_threshold=0.3,
+    dedup_distance=None,
+    cache_dir=None,
+    cache_score_floor=None,
+    stats_callback=None,
+    selection_mode="threshold",
+    top_k=3,
+    window_seconds=10.0,
 ):
+    """
+    Extracts sharp frames from a video.
+
+    sampling_mode selects the candidate sampler: "interval" (one frame every
+    interval_seconds), "scene" (frames after a scene change above scene_threshold)
+    or "keyframes" (I-frames only, skipping most of the decoding).
+
+    With streaming=True, FFmpeg pipes raw frames that are scored in memory and only
+    the kept frames are written. Otherwise every candidate is written as a JPEG to a
+    temporary folder first and then filtered.
+
+    Sharpness is scored in parallel on score_workers threads (all cores by default).
+    If sharpness_proxy_width is set, scoring runs on a downscaled grayscale proxy.
+
+    If dedup_distance is set, frames whose 64-bit dHash is within that Hamming
+    distance of an already kept frame are grouped and only the sharpest is kept.
+
+    If cache_dir is set, extractions are cached per video fingerprint and sampler
+    settings. Candidates scoring at least cache_score_floor are kept in the cache,
+    so a repeat run, or a run with a different blur threshold or dedup distance,
+    is served without decoding the video.
+
+    stats_callback receives FFmpeg throughput snapshots (fps, x-realtime speed,
+    ETA) parsed from -progress output while the video is decoded.
+
+    selection_mode replaces the absolute blur threshold with relative ranking:
+    "top_k_window" keeps the top_k frames of every window_seconds-long window and
+    "top_n" the top_k frames overall, ranked by a combined sharpness, exposure,
+    clipping and contrast score. "top_k_window" requires interval sampling and
+    falls back to "top_n" otherwise. "threshold" (the default) keeps every frame at
+    or above blur_threshold.
+    """
     if not os.path.exists(video_path):
         logger.error(f"Video file not found: {video_path}")
         return []
@@ -67,18 +405,118 @@ def extract_frames(
 
     # The cleanup logic has been removed from this file.
 
+    selection_mode = _selection_mode_for(selection_mode, sampling_mode)
+    if selection_mode in ("top_k_window", "top_n"):
+        # Ranking replaces the absolute threshold; only unreadable (NaN) frames are rejected.
+        blur_threshold = 0.0
+    selection_options = {
+        "selection_mode": selection_mode,
+        "top_k": top_k,
+        "window_seconds": window_seconds,
+    }
+
+    sampler_options = {
+        "interval_seconds": interval_seconds,
+        "sampling_mode": sampling_mode,
+        "scene_threshold": scene_threshold,
+        "sharpness_proxy_width": sharpness_proxy_width,
+    }
+    if cache_dir:
+        return _extract_frames_cached(
+            video_path,
+            output_folder,
+            progress_callback,
+            blur_threshold,
+            dedup_distance,
+            ExtractionCache(cache_dir),
+            cache_score_floor,
+            streaming,
+            score_workers,
+            sampler_options,
+            stats_callback,
+            selection_options,
+        )
+
+    groups = NearDuplicateGroups(dedup_distance)
+    return _run_extraction(
+        video_path,
+        output_folder,
+        progress_callback,
+        stats_callback,
+        blur_threshold,
+        groups,
+        streaming,
+        score_workers,
+        selector=_create_selector(groups, selection_options),
+        **sampler_options,
+    )
+
+
+def _create_selector(groups: NearDuplicateGroups, selection_options: dict):
+    return create_selector(
+        selection_options["selection_mode"],
+        groups,
+        selection_options["top_k"],
+        selection_options["window_seconds"],
+        discard=_remove_file,
+    )
+
+
+def _run_extraction(
+    video_path: str,
+    output_folder: str,
+    progress_callback,
+    stats_callback,
+    blur_threshold: float,
+    groups: NearDuplicateGroups,
+    streaming: bool,
+    score_workers,
+    interval_seconds,
+    sampling_mode: str,
+    scene_threshold: float,
+    sharpness_proxy_width,
+    selector: QualityWindowSelector = None,
+):
+    """
+    Samples candidates with FFmpeg and keeps the sharp ones in output_folder via
+    groups (and selector, if set).
+    """
+    if streaming:
+        with SharpnessScorer(score_workers, sharpness_proxy_width) as scorer:
+            final_frames = _extract_frames_streaming(
+                video_path,
+                output_folder,
+                progress_callback,
+                blur_threshold,
+                interval_seconds,
+                scorer,
+                groups,
+                sampling_mode,
+                scene_threshold,
+                stats_callback,
+                selector,
+            )
+        if progress_callback:
+            progress_callback(100)
+        return final_frames
+
     temp_extraction_folder = os.path.join(output_folder, f"temp_candidates_{Path(video_path).stem}")
     ensure_folder(temp_extraction_folder)
 
     video_name = Path(video_path).stem
 
-    logger.info("Phase 1: Starting fast frame extraction with FFmpeg...")
+    logger.info(
+        f"Phase 1: Starting fast frame extraction with FFmpeg ({sampling_mode} sampling)..."
+    )
+    input_args, sampler_args = _build_sampling_args(
+        sampling_mode, interval_seconds, scene_threshold
+    )
     command = [
         FFMPEG_PATH,
+        *input_args,
         "-i",
         video_path,
-        "-vf",
-        f"fps=1/{interval_seconds}",
+        *sampler_args,
         "-q:v",
         "2",
         os.path.join(temp_extraction_folder, f"{video_name}_frame_%05d.jpg"),
@@ -87,7 +525,17 @@ def extract_frames(
     if progress_callback:
         progress_callback(10)
 
-    success = _run_ffmpeg_command(command)
+    probe = _probe_video(video_path)
+    success, _ = run_ffmpeg(
+        command,
+        duration=probe[2] if probe else None,
+        progress_callback=(
+            (lambda percent: progress_callback(10 + int(percent * 0.4)))
+            if progress_callback
+            else None
+        ),
+        stats_callback=stats_callback,
+    )
     if not success:
         logger.error("FFmpeg frame extraction failed. Aborting.")
         return []
@@ -99,31 +547,149 @@ def extract_frames(
     candidate_files = sorted(
         [os.path.join(temp_extraction_folder, f) for f in os.listdir(temp_extraction_folder)]
     )
-    final_frames = []
     total_candidates = len(candidate_files)
 
-    for i, file_path in enumerate(candidate_files):
-        if _calculate_blurriness(file_path, blur_threshold):
-            final_path = os.path.join(output_folder, os.path.basename(file_path))
-            try:
-                os.rename(file_path, final_path)
-                final_frames.append(final_path)
-            except OSError as e:
-                logger.error(f"Could not move sharp frame {file_path}: {e}")
-        else:
-            try:
-                os.remove(file_path)
-            except OSError as e:
-                logger.error(f"Could not delete blurry frame {file_path}: {e}")
-
-        if progress_callback and total_candidates > 0:
-            progress_percent = 50 + int(((i + 1) / total_candidates) * 50)
-            progress_callback(progress_percent)
+    def move_frame(file_path):
+        final_path = os.path.join(output_folder, os.path.basename(file_path))
+        try:
+            os.rename(file_path, final_path)
+            return final_path
+        except OSError as e:
+            logger.error(f"Could not move sharp frame {file_path}: {e}")
+            return None
+
+    full_metrics = groups.needs_hashes or selector is not None
+    with SharpnessScorer(score_workers, sharpness_proxy_width) as scorer:
+        batch_size = scorer.max_workers * 4
+        for start in range(0, total_candidates, batch_size):
+            batch_files = candidate_files[start : start + batch_size]
+            metrics = _score_batch(scorer, batch_files, full_metrics, from_files=True)
+
+            for offset, (file_path, frame_metrics) in enumerate(zip(batch_files, metrics)):
+                kept = frame_metrics["sharpness"] >= blur_threshold and _select_frame(
+                    groups,
+                    selector,
+                    start + offset + 1,
+                    interval_seconds,
+                    frame_metrics,
+                    lambda: move_frame(file_path),
+                )
+                if not kept:
+                    _remove_file(file_path)
+
+            if progress_callback:
+                done = start + len(batch_files)
+                progress_percent = 50 + int((done / total_candidates) * 50)
+                progress_callback(progress_percent)
 
     try:
         shutil.rmtree(temp_extraction_folder)
     except OSError:
         pass
 
-    logger.info(f"Smart extraction complete. Kept {len(final_frames)} high-quality frames.")
+    final_frames = groups.kept_paths()
+    logger.info(
+        f"Smart extraction complete. Kept {len(final_frames)} high-quality frames "
+        f"({_dropped_summary(groups, selector)})."
+    )
+    return final_frames
+
+
+def _link_or_copy(source_path: str, output_folder: str):
+    final_path = os.path.join(output_folder, os.path.basename(source_path))
+    try:
+        if os.path.exists(final_path):
+            os.remove(final_path)
+        try:
+            os.link(source_path, final_path)
+        except OSError:
+            shutil.copy2(source_path, final_path)
+        return final_path
+    except OSError as e:
+        logger.error(f"Could not copy cached frame {source_path}: {e}")
+        return None
+
+
+def _extract_frames_cached(
+    video_path: str,
+    output_folder: str,
+    progress_callback,
+    blur_threshold: float,
+    dedup_distance,
+    cache: ExtractionCache,
+    cache_score_floor,
+    streaming: bool,
+    score_workers,
+    sampler_options: dict,
+    stats_callback=None,
+    selection_options: dict = None,
+):
+    """
+    Serves an extraction from the cache, extracting into the cache first on a miss or
+    when the requested blur threshold is below what the cached entry kept.
+    """
+    key = cache.key_for(video_path, sampler_options)
+    entry = cache.load(key)
+
+    if entry is not None and entry.score_floor <= blur_threshold:
+        logger.info(f"Extraction cache hit for {video_path} ({len(entry)} cached frames).")
+    else:
+        score_floor = blur_threshold
+        if cache_score_floor is not None:
+            score_floor = min(blur_threshold, cache_score_floor)
+        logger.info(
+            f"Extraction cache miss for {video_path}. Extracting with score floor {score_floor}."
+        )
+        cache_groups = NearDuplicateGroups(track_hashes=True)
+        staging_folder = cache.prepare(key)
+        try:
+            _run_extraction(
+                video_path,
+                staging_folder,
+                progress_callback,
+                stats_callback,
+                score_floor,
+                cache_groups,
+                streaming,
+                score_workers,
+                **sampler_options,
+            )
+        except BaseException:
+            cache.discard(staging_folder)
+            raise
+        records = cache_groups.kept_records()
+        entry = cache.store(
+            key,
+            staging_folder,
+            cache_groups.kept_paths(),
+            [index for index, _ in records],
+            np.array([metrics for _, metrics in records], dtype=FRAME_METRICS_DTYPE),
+            score_floor,
+            {"video_path": os.path.abspath(video_path), **sampler_options},
+        )
+        if entry is None:
+            return []
+
+    ensure_folder(output_folder)
+    groups = NearDuplicateGroups(dedup_distance)
+    selector = _create_selector(groups, selection_options) if selection_options else None
+    interval_seconds = sampler_options["interval_seconds"]
+    for i in np.flatnonzero(entry.metrics["sharpness"] >= blur_threshold):
+        _select_frame(
+            groups,
+            selector,
+            int(entry.indices[i]),
+            interval_seconds,
+            entry.metrics[i],
+            lambda: _link_or_copy(entry.path(i), output_folder),
+        )
+
+    if progress_callback:
+        progress_callback(100)
+
+    final_frames = groups.kept_paths()
+    logger.info(
+        f"Served {len(final_frames)} frames from the extraction cache "
+        f"({_dropped_summary(groups, selector)})."
+    )
     return final_frames
@@ -0,0 +1,134 @@
+# GameMediaTool/tools/frame_hasher.py
+
+import cv2
+import numpy as np
+
+# Number of set bits for every byte value, used to popcount XOR-ed hashes.
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def dhash(image: np.ndarray) -> np.uint64:
+    """
+    Computes a 64-bit difference hash (dHash) of a BGR or grayscale image.
+    Visually similar images get hashes with a small Hamming distance.
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return np.packbits(bits.ravel()).view(">u8")[0].astype(np.uint64)
+
+
+class PerceptualHashIndex:
+    """Compact array of 64-bit perceptual hashes with a vectorized Hamming-distance search."""
+
+    def __init__(self, capacity: int = 256):
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, frame_hash) -> int:
+        """Appends a hash and returns its position in the index."""
+        if self._count == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+        self._hashes[self._count] = frame_hash
+        self._count += 1
+        return self._count - 1
+
+    def replace(self, position: int, frame_hash):
+        self._hashes[position] = frame_hash
+
+    def hashes(self) -> np.ndarray:
+        return self._hashes[: self._count].copy()
+
+    def distances(self, frame_hash) -> np.ndarray:
+        """Returns the Hamming distance from frame_hash to every hash in the index."""
+        xor = self._hashes[: self._count] ^ np.uint64(frame_hash)
+        return _POPCOUNT_TABLE[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+    def nearest(self, frame_hash):
+        """Returns (position, distance) of the closest hash, or (-1, None) if the index is empty."""
+        if self._count == 0:
+            return -1, None
+        distances = self.distances(frame_hash)
+        position = int(np.argmin(distances))
+        return position, int(distances[position])
+
+
+class NearDuplicateGroups:
+    """
+    Groups near-duplicate frames and keeps the best-scoring frame of each group.
+    With max_distance=None, every frame is its own group; hashes are then only
+    needed (and recorded) if track_hashes is True. Every representative can carry
+    an arbitrary record (e.g. its candidate number and metrics).
+    """
+
+    def __init__(self, max_distance: int = None, track_hashes: bool = False):
+        self.max_distance = max_distance
+        self.track_hashes = track_hashes
+        self.index = PerceptualHashIndex()
+        self.scores = []
+        self.paths = []
+        self.records = []
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_distance is not None and self.max_distance >= 0
+
+    @property
+    def needs_hashes(self) -> bool:
+        return self.enabled or self.track_hashes
+
+    def offer(self, frame_hash, score: float):
+        """
+        Decides what to do with a new frame. Returns -1 if it starts a new group,
+        the group index if it is sharper than that group's current frame, or None
+        if it is a near-duplicate that should be dropped.
+        """
+        if not self.enabled:
+            return -1
+        position, distance = self.index.nearest(frame_hash)
+        if position < 0 or distance > self.max_distance:
+            return -1
+        if score > self.scores[position]:
+            return position
+        self.dropped += 1
+        return None
+
+    def add(self, frame_hash, score: float, path: str, record=None) -> int:
+        """Starts a new group with path as its representative and returns the group index."""
+        self.index.add(frame_hash if self.needs_hashes else 0)
+        self.scores.append(score)
+        self.paths.append(path)
+        self.records.append(record)
+        return len(self.paths) - 1
+
+    def replace(self, group: int, frame_hash, score: float, path: str, record=None) -> str:
+        """Makes path the representative of group and returns the path it replaced (or None)."""
+        old_path = self.paths[group]
+        self.index.replace(group, frame_hash)
+        self.scores[group] = score
+        self.paths[group] = path
+        self.records[group] = record
+        if old_path is not None:
+            self.dropped += 1
+        return old_path
+
+    def remove(self, group: int) -> str:
+        """
+        Drops the representative of group and returns its path. The group's hash stays
+        in the index, so a later, better near-duplicate can still take its place.
+        """
+        old_path = self.paths[group]
+        self.scores[group] = -np.inf
+        self.paths[group] = None
+        self.records[group] = None
+        return old_path
+
+    def kept_paths(self) -> list:
+        return [path for path in self.paths if path is not None]
+
+    def kept_records(self) -> list:
+        return [record for path, record in zip(self.paths, self.records) if path is not None]
@@ -0,0 +1,116 @@
+# GameMediaTool/tools/frame_loader.py
+
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from .logger import get_logger
+
+logger = get_logger("FrameLoader")
+
+DEFAULT_CACHE_MB = 512
+
+
+class FrameLoader:
+    """
+    Decodes frame images once and shares the BGR arrays between detection, label
+    writing and cropping. Decoded frames are kept in an LRU cache bounded by
+    max_bytes; the least recently used frames are dropped when it is exceeded.
+
+    Cached arrays are marked read-only, so callers must copy before modifying
+    a frame in place. Each frame is cached with the file's modification time and
+    size, so a frame rewritten under the same name (e.g. by a new extraction) is
+    decoded again. Safe to use from several worker threads.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max(0, int(max_bytes))
+        self._frames = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, image_config: dict):
+        """Creates a loader sized by image.frame_cache_mb in config.yaml."""
+        cache_mb = image_config.get("frame_cache_mb", DEFAULT_CACHE_MB)
+        return cls(max_bytes=(cache_mb or 0) * 1024 * 1024)
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def _stamp(path: str):
+        """Returns the (mtime_ns, size) of the file at path, or None if it is missing."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @property
+    def cached_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self):
+        return len(self._frames)
+
+    def load(self, path: str):
+        """Returns the decoded BGR frame at path, or None if it cannot be read."""
+        key = self._key(path)
+        stamp = self._stamp(path)
+        with self._lock:
+            cached = self._frames.get(key)
+            if cached is not None and cached[0] == stamp:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        image = cv2.imread(path)
+        if image is None:
+            logger.error(f"Could not read image file: {path}")
+            self.invalidate(path)
+            return None
+        image.flags.writeable = False
+        self._put(key, stamp, image)
+        return image
+
+    def load_many(self, paths) -> list:
+        """Loads several frames, in input order (None for unreadable files)."""
+        return [self.load(path) for path in paths]
+
+    def shape(self, path: str):
+        """Returns the (height, width, channels) of the frame at path, or None."""
+        image = self.load(path)
+        return image.shape if image is not None else None
+
+    def _put(self, key: str, stamp, image: np.ndarray):
+        if image.nbytes > self.max_bytes:
+            self.invalidate(key)
+            return
+        with self._lock:
+            previous = self._frames.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1].nbytes
+            self._frames[key] = (stamp, image)
+            self._bytes += image.nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._frames.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def invalidate(self, path: str):
+        """Drops the cached frame of path (e.g. after the file was deleted)."""
+        with self._lock:
+            cached = self._frames.pop(self._key(path), None)
+            if cached is not None:
+                self._bytes -= cached[1].nbytes
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
@@ -0,0 +1,159 @@
+# GameMediaTool/tools/frame_scorer.py
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from .logger import get_logger
+from .frame_hasher import dhash
+
+logger = get_logger("FrameScorer")
+
+# Pixels at or below CLIP_LOW / at or above CLIP_HIGH count as crushed / blown out.
+CLIP_LOW = 5
+CLIP_HIGH = 250
+
+# Per-frame quality metrics. quality combines the others into one ranking score.
+FRAME_METRICS_DTYPE = np.dtype(
+    [
+        ("sharpness", np.float64),
+        ("brightness", np.float64),
+        ("clipped", np.float64),
+        ("contrast", np.float64),
+        ("quality", np.float64),
+        ("dhash", np.uint64),
+    ]
+)
+
+_LEVELS = np.arange(256, dtype=np.float64)
+_UNREADABLE = (np.nan, np.nan, np.nan, np.nan, np.nan, 0)
+
+
+def quality_score(sharpness, brightness, clipped, contrast):
+    """
+    Combines the metrics of one frame (or arrays of them) into a ranking score:
+    log sharpness, scaled down by the fraction of clipped pixels, by exposure
+    away from mid-grey (to at most half) and by low contrast (to at most half).
+    Unlike the raw Laplacian variance it needs no per-source threshold tuning
+    for ranking frames of the same video.
+    """
+    exposure = 1.0 - 0.5 * np.abs(brightness - 127.5) / 127.5
+    contrast_weight = 0.5 + 0.5 * np.minimum(contrast / 64.0, 1.0)
+    return np.log1p(sharpness) * (1.0 - clipped) * exposure * contrast_weight
+
+
+class SharpnessScorer:
+    """
+    Scores frame sharpness (variance of the Laplacian) in batches on a thread pool.
+    OpenCV releases the GIL, so the work spreads over all cores. analyze_frames and
+    analyze_files additionally measure exposure, clipping, contrast and the dHash.
+
+    If proxy_width is set, frames are scored on a downscaled grayscale proxy of that
+    width. Proxy scores are not on the same scale as full-resolution scores, so the
+    blur threshold has to be tuned for the chosen proxy width.
+    """
+
+    def __init__(self, max_workers: int = None, proxy_width: int = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.proxy_width = proxy_width or None
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="SharpnessScorer"
+        )
+        logger.debug(
+            f"SharpnessScorer started with {self.max_workers} threads "
+            f"(proxy width: {self.proxy_width or 'full resolution'})."
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _to_proxy(self, gray: np.ndarray) -> np.ndarray:
+        height, width = gray.shape[:2]
+        if not self.proxy_width or width <= self.proxy_width:
+            return gray
+        proxy_height = max(1, round(height * self.proxy_width / width))
+        return cv2.resize(gray, (self.proxy_width, proxy_height), interpolation=cv2.INTER_AREA)
+
+    def score_frame(self, image: np.ndarray) -> float:
+        """Scores a single BGR or grayscale frame. Higher = sharper."""
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return float(cv2.Laplacian(self._to_proxy(gray), cv2.CV_64F).var())
+
+    def _measure(self, image: np.ndarray):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        proxy = self._to_proxy(gray)
+        sharpness = cv2.Laplacian(proxy, cv2.CV_64F).var()
+        # Exposure, clipping and contrast all come from one 256-bin histogram.
+        hist = cv2.calcHist([proxy], [0], None, [256], [0, 256]).ravel()
+        total = hist.sum()
+        brightness = hist @ _LEVELS / total
+        contrast = np.sqrt(hist @ (_LEVELS - brightness) ** 2 / total)
+        clipped = (hist[: CLIP_LOW + 1].sum() + hist[CLIP_HIGH:].sum()) / total
+        return sharpness, brightness, clipped, contrast, 0.0, dhash(gray)
+
+    def _measure_file(self, image_path: str):
+        try:
+            gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                logger.error(f"Could not read image for quality scoring: {image_path}")
+                return _UNREADABLE
+            return self._measure(gray)
+        except Exception as e:
+            logger.error(f"Failed to calculate quality metrics for {image_path}: {e}")
+            return _UNREADABLE
+
+    def _score_file(self, image_path: str):
+        try:
+            gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                logger.error(f"Could not read image for sharpness scoring: {image_path}")
+                return np.nan
+            return self.score_frame(gray)
+        except Exception as e:
+            logger.error(f"Failed to calculate sharpness for {image_path}: {e}")
+            return np.nan
+
+    @staticmethod
+    def _to_metrics(results, count: int) -> np.ndarray:
+        metrics = np.fromiter(results, dtype=FRAME_METRICS_DTYPE, count=count)
+        metrics["quality"] = quality_score(
+            metrics["sharpness"], metrics["brightness"], metrics["clipped"], metrics["contrast"]
+        )
+        return metrics
+
+    def score_frames(self, frames) -> np.ndarray:
+        """Scores a batch of in-memory frames. Returns a float64 array in input order."""
+        return np.fromiter(
+            self._executor.map(self.score_frame, frames), dtype=np.float64, count=len(frames)
+        )
+
+    def score_files(self, image_paths) -> np.ndarray:
+        """
+        Decodes and scores a batch of image files. Unreadable files get NaN,
+        which never passes a threshold comparison.
+        """
+        return np.fromiter(
+            self._executor.map(self._score_file, image_paths),
+            dtype=np.float64,
+            count=len(image_paths),
+        )
+
+    def analyze_frames(self, frames) -> np.ndarray:
+        """
+        Measures a batch of in-memory frames in a single pass each. Returns a
+        FRAME_METRICS_DTYPE record array in input order.
+        """
+        return self._to_metrics(self._executor.map(self._measure, frames), len(frames))
+
+    def analyze_files(self, image_paths) -> np.ndarray:
+        """Like analyze_frames for image files. Unreadable files get NaN metrics."""
+        return self._to_metrics(
+            self._executor.map(self._measure_file, image_paths), len(image_paths)
+        )
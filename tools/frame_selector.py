@@ -0,0 +1,92 @@
+# GameMediaTool/tools/frame_selector.py
+
+from .frame_hasher import NearDuplicateGroups
+from .logger import get_logger
+
+logger = get_logger("FrameSelector")
+
+SELECTION_MODES = ("threshold", "top_k_window", "top_n")
+
+
+class QualityWindowSelector:
+    """
+    Keeps the top_k best-scoring frames of every window_seconds-long time window,
+    or the top_k best overall if window_seconds is None, on top of the groups of a
+    NearDuplicateGroups (whose scores are the ranking scores).
+
+    Frames must be added in time order. A window never holds more than top_k frames:
+    when a better frame arrives, the worst one is removed from its group and passed
+    to discard (e.g. to delete its file), so the number of kept frames stays bounded
+    however long the video is.
+    """
+
+    def __init__(self, groups: NearDuplicateGroups, top_k: int, window_seconds=None, discard=None):
+        self.groups = groups
+        self.top_k = max(1, int(top_k))
+        self.window_seconds = window_seconds if window_seconds and window_seconds > 0 else None
+        self.discard = discard
+        self.evicted = 0
+        self._window = None
+        self._members = set()
+
+    def _window_of(self, timestamp: float) -> int:
+        return int(timestamp // self.window_seconds) if self.window_seconds else 0
+
+    def _worst_member(self) -> int:
+        return min(self._members, key=lambda group: self.groups.scores[group])
+
+    def can_replace(self, group: int, timestamp: float) -> bool:
+        """
+        Returns True if a near-duplicate at timestamp may take the place of group's
+        representative: only frames of the current window (or groups without a
+        representative) can be replaced, so a later window never empties an earlier one.
+        """
+        if self.groups.paths[group] is None:
+            return True
+        return self._window_of(timestamp) == self._window and group in self._members
+
+    def admit(self, timestamp: float, score: float) -> bool:
+        """
+        Returns True if a frame with this score at timestamp would currently be kept,
+        so rejected frames are never written. Rejections count as evicted.
+        """
+        if self._window_of(timestamp) != self._window or len(self._members) < self.top_k:
+            return True
+        if score > self.groups.scores[self._worst_member()]:
+            return True
+        self.evicted += 1
+        return False
+
+    def add(self, group: int, timestamp: float):
+        """
+        Registers the (new or replaced) representative of group, evicting the worst
+        frame if over budget.
+        """
+        window = self._window_of(timestamp)
+        if window != self._window:
+            self._window = window
+            self._members = set()
+        self._members.add(group)
+        if len(self._members) > self.top_k:
+            worst = self._worst_member()
+            self._members.discard(worst)
+            path = self.groups.remove(worst)
+            self.evicted += 1
+            if self.discard and path is not None:
+                self.discard(path)
+
+
+def create_selector(
+    selection_mode: str, groups: NearDuplicateGroups, top_k: int, window_seconds, discard=None
+):
+    """
+    Returns the QualityWindowSelector for selection_mode, or None for plain
+    threshold filtering.
+    """
+    if selection_mode == "top_k_window":
+        return QualityWindowSelector(groups, top_k, window_seconds, discard)
+    if selection_mode == "top_n":
+        return QualityWindowSelector(groups, top_k, None, discard)
+    if selection_mode != "threshold":
+        logger.warning(f"Unknown selection mode '{selection_mode}', falling back to 'threshold'.")
+    return None
@@ -1,10 +1,12 @@
 ﻿# GameMediaTool/media_exporter.py
 
-import os, sys, shutil, json, subprocess
+import os, sys, shutil, json
 from typing import Dict, Any, List
 from PIL import Image
 import cv2
 from tools.logger import get_logger
+from tools.ffmpeg_runner import run_ffmpeg
+from tools.video_splitter import get_video_duration
 import re
 from tools.rpy_generator import generate_custom_traits_rpy, generate_event_rpy
 from utils.file_ops import ensure_folder, sanitize_filename
@@ -29,25 +31,16 @@ CNN_POOL_JSON = os.path.join(CNN_POOL_DIR, "cnn_pool_data.json")
 YOLO_POOL_DIR = "assets/yolo_data_pool"
 YOLO_IMAGES_POOL = os.path.join(YOLO_POOL_DIR, "images")
 YOLO_LABELS_POOL = os.path.join(YOLO_POOL_DIR, "labels")
+# Images decoded and embedded at a time by the pool duplicate check.
+DUPLICATE_CHECK_BATCH = 64
 
 
 # --- Helper functions ---
-def _run_ffmpeg_command(command):
-    """Runs an FFmpeg command in a subprocess."""
-    try:
-        startupinfo = None
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        subprocess.run(command, check=True, capture_output=True, text=True, startupinfo=startupinfo)
-        return True, ""
-    except Exception as e:
-        logger.error(f"FFmpeg command failed: {e}")
-        return False, str(e)
-
-
-def _convert_to_webm(input_path, output_path, size_limit_mb=4):
-    """Converts a video file to WebM (VP9/Opus) format with a size limit."""
+def _convert_to_webm(input_path, output_path, size_limit_mb=4, stats_callback=None):
+    """
+    Converts a video file to WebM (VP9/Opus) format with a size limit.
+    stats_callback receives live FFmpeg progress/throughput snapshots.
+    """
     size_limit_bytes = size_limit_mb * 1024 * 1024
     command = [
         FFMPEG_PATH,
@@ -68,7 +61,9 @@ def _convert_to_webm(input_path, output_path, size_limit_mb=4):
         str(output_path),
         "-y",
     ]
-    success, error = _run_ffmpeg_command(command)
+    success, error = run_ffmpeg(
+        command, duration=get_video_duration(input_path), stats_callback=stats_callback
+    )
     if success:
         logger.info(f"  - Converted: {os.path.basename(output_path)}")
     return success
@@ -76,7 +71,7 @@ def _convert_to_webm(input_path, output_path, size_limit_mb=4):
 
 def _create_thumbnail(video_path, thumb_path):
     """Creates a thumbnail image (first frame) from a video file."""
-    if not _run_ffmpeg_command(
+    if not run_ffmpeg(
         [
             FFMPEG_PATH,
             "-ss",
@@ -137,6 +132,76 @@ def _resize_and_convert_shoot_image(source_path, dest_path):
 # --- Export functions ---
 
 
+def _goes_to_training_pool(asset: Dict[str, Any]) -> bool:
+    """Whether _collect_training_data copies the asset to the CNN or the YOLO pool."""
+    is_cnn_asset = asset.get("asset_category") == "clothing" and asset.get("cover_type")
+    yolo_label = asset.get("yolo_label_path")
+    return bool(is_cnn_asset or (yolo_label and os.path.exists(yolo_label)))
+
+
+def _pool_path(asset: Dict[str, Any], pool_filename: str) -> str:
+    """Absolute path of the asset's image in the pools (the CNN copy if it has one)."""
+    is_cnn_asset = asset.get("asset_category") == "clothing" and asset.get("cover_type")
+    return os.path.abspath(
+        os.path.join(CNN_POOL_DIR if is_cnn_asset else YOLO_IMAGES_POOL, pool_filename)
+    )
+
+
+def _find_pool_duplicates(image_paths: List[str], pool_keys: List[str], pipeline: Any) -> set:
+    """
+    Returns the indices of images that are already in the training pools, or repeat
+    an earlier image of this batch, by backbone-embedding similarity. The other
+    images are added to the pipeline's embedding index under their pool keys (the
+    absolute paths of their pool copies). Images are decoded and embedded
+    DUPLICATE_CHECK_BATCH at a time.
+    """
+    index = getattr(pipeline, "embedding_index", None)
+    if index is None or not image_paths:
+        return set()
+    duplicates = set()
+    try:
+        # Pool images that were deleted, or are about to be overwritten, no longer count.
+        new_keys = set(pool_keys)
+        index.prune(lambda key: key not in new_keys and os.path.exists(key))
+        for start in range(0, len(image_paths), DUPLICATE_CHECK_BATCH):
+            batch = range(start, min(start + DUPLICATE_CHECK_BATCH, len(image_paths)))
+            duplicates |= _find_batch_duplicates(image_paths, pool_keys, batch, index, pipeline)
+    except Exception as e:
+        # The pack is exported either way, only the duplicate check is skipped.
+        logger.error(f"Duplicate detection failed, collecting without it: {e}", exc_info=True)
+    return duplicates
+
+
+def _find_batch_duplicates(
+    image_paths: List[str], pool_keys: List[str], batch: range, index: Any, pipeline: Any
+) -> set:
+    """_find_pool_duplicates for the images of one batch (indices into image_paths)."""
+    images = {i: cv2.imread(image_paths[i]) for i in batch}
+    readable = [i for i in batch if images[i] is not None]
+    embeddings = pipeline.embed([images[i] for i in readable]) if readable else None
+    if embeddings is None or len(embeddings) == 0:
+        return set()
+    matches = index.find_duplicates(embeddings)
+    # Duplicates within the batch: compare each image with the earlier ones it keeps.
+    # Earlier batches are already in the index.
+    similarities = embeddings @ embeddings.T
+    duplicates, kept = set(), []
+    for row, i in enumerate(readable):
+        if matches[row] is not None:
+            logger.info(
+                f"Skipping {image_paths[i]}: duplicate of pool image {matches[row][0]} "
+                f"(similarity {matches[row][1]:.3f})."
+            )
+            duplicates.add(i)
+        elif kept and similarities[row, kept].max() >= index.duplicate_threshold:
+            logger.info(f"Skipping {image_paths[i]}: duplicate of an image in this export.")
+            duplicates.add(i)
+        else:
+            kept.append(row)
+    index.add([pool_keys[readable[row]] for row in kept], embeddings[kept])
+    return duplicates
+
+
 def _collect_training_data(approved_images: List[Dict[str, Any]], pipeline: Any):
     """
     يجمع الأصول المعتمدة في مجلدات CNN و YOLO Pool لتدريب النماذج.
@@ -153,19 +218,30 @@ def _collect_training_data(approved_images: List[Dict[str, Any]], pipeline: Any)
     cnn_collected = 0
     yolo_collected = 0
 
-    for asset in approved_images:
+    assets = [
+        asset
+        for asset in approved_images
+        if all([asset.get("path"), asset.get("final_name"), asset.get("asset_category")])
+        and os.path.exists(asset.get("path"))
+        and _goes_to_training_pool(asset)
+    ]
+    # حفظ بصيغة PNG في الـ Pool لضمان الجودة
+    pool_filenames = [f"{os.path.splitext(asset['final_name'])[0]}.png" for asset in assets]
+    # Near-identical images (re-tagged crops, repeated frames) would only bloat the pools.
+    asset_paths = [asset["path"] for asset in assets]
+    pool_keys = [_pool_path(asset, name) for asset, name in zip(assets, pool_filenames)]
+    duplicates = _find_pool_duplicates(asset_paths, pool_keys, pipeline)
+
+    for i, asset in enumerate(assets):
+        if i in duplicates:
+            continue
         src_path = asset.get("path")
-        final_name = asset.get("final_name")  # e.g. 'plain_bra_001.png'
         cat = asset.get("asset_category")  # e.g. 'clothing'
         clothing_type = asset.get("cover_type")  # e.g. 'bra' (لـ CNN)
         yolo_label = asset.get("yolo_label_path")  # مسار ملف YOLO .txt (لـ YOLO)
 
-        if not all([src_path, final_name, cat]) or not os.path.exists(src_path):
-            continue
-
-        base_name, ext = os.path.splitext(final_name)
-        # حفظ بصيغة PNG في الـ Pool لضمان الجودة
-        pool_filename = f"{base_name}.png"
+        pool_filename = pool_filenames[i]
+        base_name = os.path.splitext(pool_filename)[0]
 
         # 1. تجميع بيانات CNN (لتصنيف الملابس - clothing/bodypart)
         if cat == "clothing" and clothing_type:
@@ -198,7 +274,7 @@ def _collect_training_data(approved_images: List[Dict[str, Any]], pipeline: Any)
     logger.info(f"YOLO Pool Data collected: {yolo_collected} images/labels pairs.")
 
 
-def _export_vids(vid_dict: Dict[str, Any], pack_root: str):
+def _export_vids(vid_dict: Dict[str, Any], pack_root: str, stats_callback=None):
     """Exports and converts loose video files (non-shoot)."""
     if not vid_dict:
         return
@@ -209,7 +285,11 @@ def _export_vids(vid_dict: Dict[str, Any], pack_root: str):
         # Uses 'final_filename' which is assumed to be correctly tagged (using underscores)
         if "final_filename" in data:
             # Note: _convert_to_webm handles conversion and logging internally
-            _convert_to_webm(data["source_path"], os.path.join(vids_dir, data["final_filename"]))
+            _convert_to_webm(
+                data["source_path"],
+                os.path.join(vids_dir, data["final_filename"]),
+                stats_callback=stats_callback,
+            )
 
 
 def _export_assets(approved_images: List[Dict[str, Any]], pack_root: str):
@@ -473,8 +553,11 @@ def _create_main_config(pack_root, project):
     logger.info(f"Main config created: {config_filename}")
 
 
-def export_media_pack(project, pipeline):
-    """Main entry point for exporting the complete media pack."""
+def export_media_pack(project, pipeline, stats_callback=None):
+    """
+    Main entry point for exporting the complete media pack.
+    stats_callback receives live FFmpeg progress snapshots of the video conversions.
+    """
     char_name = project.character_name
     pack_root = os.path.join(project.final_output_path, sanitize_filename(char_name))
     # Ensure event definitions are pulled from the project export_data (only saved events)
@@ -490,7 +573,7 @@ def export_media_pack(project, pipeline):
     logger.info(f"--- Starting Final Export for '{char_name}' to '{pack_root}' ---")
 
     # 2. التصدير الفعلي
-    _export_vids(kwargs.get("tagged_videos", {}), pack_root)
+    _export_vids(kwargs.get("tagged_videos", {}), pack_root, stats_callback)
     _export_assets(kwargs.get("approved_images", []), pack_root)
 
     # [FIX] Added _export_shoots function calls
@@ -0,0 +1,113 @@
+# GameMediaTool/tools/prefetch.py
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from .logger import get_logger
+
+logger = get_logger("Prefetch")
+
+_DONE = object()
+
+
+class PrefetchPipeline:
+    """
+    Producer/consumer pipeline: a pool of loader threads runs load(item) ahead of the
+    consumer (disk reads, decoding, preprocessing) while the consumer works on ready
+    batches. At most queue_size loaded-or-loading items are held, which bounds memory;
+    results come out in input order.
+
+    stats() reports the configuration and per-stage timings: "load" (summed over the
+    loader threads), "wait" (consumer blocked on a not yet loaded item) and any stage
+    the consumer times with timed(name).
+    """
+
+    def __init__(self, load, num_workers: int = None, queue_size: int = 32):
+        self.load = load
+        self.num_workers = max(1, num_workers or min(8, os.cpu_count() or 1))
+        self.queue_size = max(self.num_workers, queue_size or 1)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.num_workers, thread_name_prefix="PrefetchLoader"
+        )
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._stage_seconds = {"load": 0.0, "wait": 0.0}
+        self._items = 0
+        self._max_queued = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Cancels items that were not loaded yet and stops the loader threads."""
+        for _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=True)
+
+    def _timed_load(self, item):
+        start = time.perf_counter()
+        try:
+            return self.load(item)
+        finally:
+            self._add_time("load", time.perf_counter() - start)
+
+    def _add_time(self, stage: str, seconds: float):
+        with self._lock:
+            self._stage_seconds[stage] = self._stage_seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Adds the duration of the with-block to the timings of stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_time(stage, time.perf_counter() - start)
+
+    def batches(self, items, batch_size: int):
+        """Yields lists of (item, loaded) pairs of up to batch_size, in input order."""
+        items = iter(items)
+
+        def fill():
+            while len(self._pending) < self.queue_size:
+                item = next(items, _DONE)
+                if item is _DONE:
+                    break
+                self._pending.append((item, self._executor.submit(self._timed_load, item)))
+            self._max_queued = max(self._max_queued, len(self._pending))
+
+        batch = []
+        fill()
+        while self._pending:
+            item, future = self._pending.popleft()
+            start = time.perf_counter()
+            loaded = future.result()
+            self._add_time("wait", time.perf_counter() - start)
+            self._items += 1
+            batch.append((item, loaded))
+            fill()
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def stats(self) -> dict:
+        with self._lock:
+            stage_seconds = dict(self._stage_seconds)
+        return {
+            "loader_threads": self.num_workers,
+            "queue_size": self.queue_size,
+            "max_queued": self._max_queued,
+            "items": self._items,
+            "stage_seconds": stage_seconds,
+        }
+
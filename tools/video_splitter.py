@@ -4,7 +4,9 @@ import os
 import sys
 import subprocess
 from pathlib import Path
+import cv2
 from .logger import get_logger
+from .ffmpeg_runner import with_progress_args
 
 logger = get_logger("VideoSplitter")
 
@@ -86,10 +88,40 @@ def get_video_duration(video_path):
         return 0
 
 
+def sample_clip_frames(video_path, num_frames=8, size=None):
+    """
+    Reads num_frames evenly spaced frames of a clip (the middle of num_frames equal
+    segments) by seeking, optionally resized to size (width, height). Falls back to
+    the first frame when the frame count is unknown. Returns a list of BGR frames.
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    frames = []
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if frame_count > 0:
+            num_frames = max(1, min(num_frames, frame_count))
+            positions = [int((i + 0.5) * frame_count / num_frames) for i in range(num_frames)]
+        else:
+            positions = [None]
+        for position in positions:
+            if position is not None:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            success, frame = cap.read()
+            if success and frame is not None:
+                if size:
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                frames.append(frame)
+    finally:
+        cap.release()
+    return frames
+
+
 def get_ffmpeg_split_commands(video_path, output_folder, clips):
     """
     [NEW] Generates a list of ffmpeg command arrays to be executed later.
-    Returns a list of tuples, where each tuple is (command_list, expected_output_path).
+    Returns a list of tuples, where each tuple is
+    (command_list, expected_output_path, clip_duration_seconds).
+    The commands write -progress output to stdout.
     """
     if not os.path.exists(FFMPEG_PATH):
         logger.error(f"FFmpeg not found at: {FFMPEG_PATH}.")
@@ -123,22 +155,24 @@ def get_ffmpeg_split_commands(video_path, output_folder, clips):
             continue
 
         output_path = os.path.join(output_folder, f"{base_name}_clip_{i:03d}{extension}")
-        command = [
-            FFMPEG_PATH,
-            "-i",
-            str(video_path),
-            "-ss",
-            str(start_time),
-            "-to",
-            str(end_time),
-            "-c",
-            "copy",
-            "-avoid_negative_ts",
-            "1",
-            str(output_path),
-            "-y",
-        ]
-        command_list.append((command, output_path))
+        command = with_progress_args(
+            [
+                FFMPEG_PATH,
+                "-i",
+                str(video_path),
+                "-ss",
+                str(start_time),
+                "-to",
+                str(end_time),
+                "-c",
+                "copy",
+                "-avoid_negative_ts",
+                "1",
+                str(output_path),
+                "-y",
+            ]
+        )
+        command_list.append((command, output_path, end_time - start_time))
 
     return command_list
 
@@ -15,6 +15,7 @@ class PhotoMakerWorkflow(QObject):
     yolo_analysis_finished = Signal(dict, list, set)
     final_processing_finished = Signal(list)
     progress_updated = Signal(int)
+    stats_updated = Signal(dict)
 
     def __init__(self, main_window):
         super().__init__()
@@ -55,21 +56,54 @@ class PhotoMakerWorkflow(QObject):
         settings = settings or {}
         blur_thresh = settings.get("blur_threshold", 60.0)
         interval = settings.get("interval_seconds", 1)
+        image_config = self.main_window.config.get("image", {})
+        streaming = settings.get("streaming", image_config.get("streaming_extraction", False))
+        sampling_mode = settings.get("sampling_mode", image_config.get("sampling_mode", "interval"))
+        scene_threshold = settings.get("scene_threshold", image_config.get("scene_threshold", 0.3))
+        selection_mode = settings.get(
+            "selection_mode", image_config.get("selection_mode", "threshold")
+        )
 
         logger.info(
             f"Starting frame extraction with blur threshold: {blur_thresh} and interval: {interval}s"
+            f" (sampling: {sampling_mode}, selection: {selection_mode}, streaming: {streaming})"
         )
         logger.debug(f"Video paths: {video_paths}, output: {output_folder}")
 
         worker = FrameExtractorWorker(
-            video_paths, output_folder, blur_threshold=blur_thresh, interval_seconds=interval
+            video_paths,
+            output_folder,
+            blur_threshold=blur_thresh,
+            interval_seconds=interval,
+            streaming=streaming,
+            score_workers=image_config.get("sharpness_workers"),
+            sharpness_proxy_width=image_config.get("sharpness_proxy_width"),
+            sampling_mode=sampling_mode,
+            scene_threshold=scene_threshold,
+            dedup_distance=settings.get("dedup_distance", image_config.get("dedup_distance")),
+            max_parallel_clips=image_config.get("parallel_clip_extractions", 1),
+            cache_dir=image_config.get("extraction_cache_dir"),
+            cache_score_floor=image_config.get("cache_score_floor"),
+            selection_mode=selection_mode,
+            top_k=settings.get("selection_top_k", image_config.get("selection_top_k", 3)),
+            window_seconds=image_config.get("selection_window_seconds", 10.0),
         )
         self._run_worker(worker, self.extraction_finished)
 
     def run_yolo_analysis(self, selected_paths: list):
         logger.info(f"Starting YOLO analysis on {len(selected_paths)} paths")
         tasks = {"body_assets", "clothing_assets"}
-        worker = YOLOWorker(self.pipeline, selected_paths)
+        yolo_config = self.main_window.config.get("ai", {}).get("yolo", {})
+        worker = YOLOWorker(
+            self.pipeline,
+            selected_paths,
+            batch_size=yolo_config.get("batch_size", 16),
+            conf_threshold=yolo_config.get("confidence_threshold", 0.25),
+            frame_loader=self.main_window.frame_loader,
+            detection_store=self.main_window.detection_store,
+            decode_workers=yolo_config.get("decode_workers"),
+            prefetch_frames=yolo_config.get("prefetch_frames", 32),
+        )
         worker.finished.connect(
             lambda results: self.yolo_analysis_finished.emit(results, selected_paths, tasks)
         )
@@ -77,7 +111,9 @@ class PhotoMakerWorkflow(QObject):
 
     def run_final_processing(self, instructions: dict):
         logger.info(f"Starting final processing with instructions: {list(instructions.keys())}")
-        worker = FinalProcessorWorker(self.main_window, instructions)
+        worker = FinalProcessorWorker(
+            self.main_window, instructions, frame_loader=self.main_window.frame_loader
+        )
         self._run_worker(worker, self.final_processing_finished)
 
     def _run_worker(self, worker_instance, finished_signal):
@@ -89,6 +125,8 @@ class PhotoMakerWorkflow(QObject):
             self.worker.finished.connect(finished_signal)
         if hasattr(self.worker, "progress"):
             self.worker.progress.connect(self.progress_updated)
+        if hasattr(self.worker, "stats"):
+            self.worker.stats.connect(self.stats_updated)
 
         self.worker.finished.connect(self.thread.quit)
         self.worker.finished.connect(self.worker.deleteLater)
@@ -42,15 +42,15 @@ class AIAnalysisWorker(QObject):
             if frame is not None:
                 detections = detect_objects(path, self.pipeline.yolo_model)
 
-                person_count = sum(1 for d in detections if d["label"] == "person")
+                person_count = len(detections.of_classes(["person"]))
                 if person_count > highest_person_count:
                     highest_person_count = person_count
 
                 # [MODIFIED] Use the corrected self.shoots_tags variable
                 if self.shoots_tags:
-                    for det in detections:
-                        if det["label"] in self.shoots_tags.get("location_tags", {}).values():
-                            location_counts[det["label"]] = location_counts.get(det["label"], 0) + 1
+                    location_tags = list(self.shoots_tags.get("location_tags", {}).values())
+                    for label in detections.of_classes(location_tags).labels:
+                        location_counts[label] = location_counts.get(label, 0) + 1
 
         participant_map = {0: "Solo", 1: "Solo", 2: "Duo", 3: "Threesome"}
         participant_suggestion = participant_map.get(highest_person_count, "Orgy / Group")
@@ -13,6 +13,7 @@ logger = get_logger("VidMakerWorkflow")
 class VidMakerWorkflow(QObject):
     splitting_finished = Signal(dict)
     progress_updated = Signal(int)
+    stats_updated = Signal(dict)
 
     def __init__(self, main_window):
         super().__init__()
@@ -42,8 +43,13 @@ class VidMakerWorkflow(QObject):
         temp_clips_folder = self._get_temp_folder("vids_clips")
 
         # [THE FIX] Pass the required 'self.pipeline' object to the worker's constructor.
+        splitter_config = self.main_window.config.get("video", {}).get("splitter", {})
         self.current_worker = VideoSplitterWorker(
-            self.project.source_video_path, temp_clips_folder, clips_timestamps, self.pipeline
+            self.project.source_video_path,
+            temp_clips_folder,
+            clips_timestamps,
+            self.pipeline,
+            frames_per_clip=splitter_config.get("action_frames", 8),
         )
 
         self.current_worker.finished.connect(self.splitting_finished)
@@ -56,6 +62,8 @@ class VidMakerWorkflow(QObject):
 
         if hasattr(worker_instance, "progress"):
             worker_instance.progress.connect(self.progress_updated)
+        if hasattr(worker_instance, "stats"):
+            worker_instance.stats.connect(self.stats_updated)
 
         worker_instance.finished.connect(self.thread.quit)
         worker_instance.finished.connect(worker_instance.deleteLater)